@@ -0,0 +1,95 @@
+# Compare a block generator parsed into a tree of `CLVMObject` and into an
+# `Arena`, by the memory the parsed object keeps alive and the time to
+# parse it, serialize it and compute its tree hash. The arena is measured
+# both with its own methods and through `ArenaNode` views.
+#
+#   $ python benchmarks/arena_bench.py
+
+import gzip
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Tuple
+
+from clvm.CLVMObject import CLVMStorage
+from clvm.arena import Arena
+from clvm.object_cache import ObjectCache, treehash
+from clvm.serialize import sexp_from_buffer, sexp_to_bytearray, to_clvm_object
+
+GENERATOR = "tests/generator.bin.gz"
+
+
+def parse_objects(blob: bytes) -> CLVMStorage:
+    return sexp_from_buffer(blob, to_clvm_object)[0]
+
+
+def parse_arena(blob: bytes) -> Arena:
+    arena = Arena()
+    arena.parse(blob)
+    return arena
+
+
+def retained(f: Callable[[], object]) -> int:
+    # the memory still allocated while the result of `f` is alive
+    tracemalloc.start()
+    r = f()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del r
+    return size
+
+
+def measure(f: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    blob = gzip.GzipFile(GENERATOR).read()
+    tree = parse_objects(blob)
+    arena = Arena()
+    root = arena.node(arena.parse(blob)[0])
+    assert sexp_to_bytearray(root) == blob
+
+    print("generator: %d bytes, %d nodes" % (len(blob), len(arena)))
+    print("%-16s %14s %14s" % ("retained KiB", "CLVMObject", "Arena"))
+    print(
+        "%-16s %14.1f %14.1f"
+        % ("", retained(lambda: parse_objects(blob)) / 1024, retained(lambda: parse_arena(blob)) / 1024)
+    )
+
+    index = root.index
+    cases: List[Tuple[str, Callable[[], object], Callable[[], object], Optional[Callable[[], object]]]] = [
+        ("parse", lambda: parse_objects(blob), lambda: parse_arena(blob), None),
+        (
+            "serialize",
+            lambda: sexp_to_bytearray(tree),
+            lambda: arena.serialize(index),
+            lambda: sexp_to_bytearray(arena.node(index)),
+        ),
+        (
+            "tree hash",
+            lambda: ObjectCache(treehash).get(tree),
+            lambda: arena.tree_hash(index),
+            lambda: ObjectCache(treehash).get(arena.node(index)),
+        ),
+    ]
+    print()
+    print("%-16s %14s %14s %14s" % ("ms", "CLVMObject", "Arena", "ArenaNode"))
+    for name, objects, in_arena, through_views in cases:
+        print(
+            "%-16s %14.2f %14.2f %14s"
+            % (
+                name,
+                measure(objects, 5) * 1e3,
+                measure(in_arena, 5) * 1e3,
+                "-" if through_views is None else "%.2f" % (measure(through_views, 5) * 1e3),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Compare the python and rust backends of `run_program`, and check that they
+# agree on cost and result.
+#
+#   $ python benchmarks/backend_bench.py
+
+import time
+from typing import List, Tuple
+
+from clvm.SExp import SExp
+from clvm.operators import OPERATOR_LOOKUP
+from clvm.run_program import run_program
+
+from clvm_tools.binutils import assemble
+
+# (sum LIST) as a recursive function
+SUM_LIST = (
+    "(a (q . (a 2 (c 2 (c 5 ()))))"
+    " (c (q . (a (i 5 (q . (+ 9 (a 2 (c 2 (c 13 ()))))) (q . ())) 1)) 1))"
+)
+
+# (sha256 of each element of LIST), built as a new list
+HASH_LIST = (
+    "(a (q . (a 2 (c 2 (c 5 ()))))"
+    " (c (q . (a (i 5 (q . (c (sha256 9) (a 2 (c 2 (c 13 ()))))) (q . ())) 1)) 1))"
+)
+
+BENCHMARKS: List[Tuple[str, str, SExp]] = [
+    ("(+ 2 5)", "(+ 2 5)", SExp.to([100, 200])),
+    ("sum 100", SUM_LIST, SExp.to([list(range(100))])),
+    ("sum 1000", SUM_LIST, SExp.to([list(range(1000))])),
+    ("hash 200", HASH_LIST, SExp.to([list(range(200))])),
+]
+
+
+def main() -> None:
+    print("%-12s %12s %12s %8s" % ("program", "python ms", "rust ms", "speedup"))
+    for name, program_text, args in BENCHMARKS:
+        program = assemble(program_text)
+        timings = []
+        results = []
+        for backend in ("python", "rust"):
+            start = time.perf_counter()
+            results.append(run_program(program, args, OPERATOR_LOOKUP, backend=backend))
+            timings.append(time.perf_counter() - start)
+        assert results[0] == results[1], name
+        print(
+            "%-12s %12.2f %12.2f %7.1fx"
+            % (name, timings[0] * 1000, timings[1] * 1000, timings[0] / timings[1])
+        )
+
+
+if __name__ == "__main__":
+    main()
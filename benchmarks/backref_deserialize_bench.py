@@ -0,0 +1,97 @@
+# Compare parsing serialized objects with back references by resolving
+# them against the parse stack as a cons list (as `sexp_from_stream` used to),
+# and with the list based `sexp_from_stream` and `sexp_from_buffer`. The
+# inputs are the block generator in `tests` and a synthetic generator with
+# many long back references.
+#
+#   $ python benchmarks/backref_deserialize_bench.py
+
+import gzip
+import io
+import time
+from typing import Callable, List, Tuple
+
+from clvm.CLVMObject import CLVMObject, CLVMStorage
+from clvm.SExp import SExp
+from clvm.serialize import (
+    BACK_REFERENCE,
+    CONS_BOX_MARKER,
+    _atom_from_stream,
+    sexp_from_buffer,
+    sexp_from_stream,
+    to_clvm_object,
+    traverse_path,
+)
+
+GENERATOR = "tests/generator.bin.gz"
+
+
+def parse_with_cons_stack(blob: bytes) -> CLVMStorage:
+    # the old decoder: the parse stack is a cons list, and `traverse_path`
+    # walks it for each back reference
+    f = io.BytesIO(blob)
+    stack: CLVMStorage = CLVMObject(b"")
+    todo = [0]
+    while todo:
+        if todo.pop():
+            assert stack.pair is not None
+            right, stack = stack.pair
+            assert stack.pair is not None
+            left, stack = stack.pair
+            stack = CLVMObject((CLVMObject((left, right)), stack))
+            continue
+        b = f.read(1)[0]
+        if b == CONS_BOX_MARKER:
+            todo.extend([1, 0, 0])
+            continue
+        if b == BACK_REFERENCE:
+            obj = traverse_path(stack, _atom_from_stream(f, f.read(1)[0]), to_clvm_object)
+        else:
+            obj = CLVMObject(_atom_from_stream(f, b))
+        stack = CLVMObject((obj, stack))
+    assert stack.pair is not None
+    return stack.pair[0]
+
+
+def many_long_backrefs() -> bytes:
+    # a list of spends between two copies of a list of big atoms, so the
+    # second copy is back references with paths thousands of bits long
+    big = [bytes([i]) * 500 for i in range(200)]
+    spends = [[i, b"puzzle", b"%d" % i] for i in range(3000)]
+    return SExp.to(big + spends + big).as_bin(allow_backrefs=True, max_size=1 << 30)
+
+
+def measure(f: Callable[[], object], repeat: int) -> float:
+    # the best of `repeat` runs, as garbage collections make single runs
+    # noisy
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    generator = SExp(sexp_from_buffer(gzip.GzipFile(GENERATOR).read(), to_clvm_object)[0])
+    inputs = [
+        ("generator", generator.as_bin(allow_backrefs=True)),
+        ("long backrefs", many_long_backrefs()),
+    ]
+    print("%-16s %8s %12s %12s %12s" % ("", "bytes", "cons ms", "stream ms", "buffer ms"))
+    for name, blob in inputs:
+        expected = SExp(parse_with_cons_stack(blob)).as_bin(max_size=1 << 30)
+        cases: List[Tuple[str, Callable[[], CLVMStorage]]] = [
+            ("cons", lambda: parse_with_cons_stack(blob)),
+            ("stream", lambda: sexp_from_stream(io.BytesIO(blob), to_clvm_object, allow_backrefs=True)),
+            ("buffer", lambda: sexp_from_buffer(blob, to_clvm_object, allow_backrefs=True)[0]),
+        ]
+        timings: List[float] = []
+        for _, f in cases:
+            assert SExp(f()).as_bin(max_size=1 << 30) == expected
+            timings.append(measure(f, 5) * 1000)
+        print("%-16s %8d %12.2f %12.2f %12.2f" % (name, len(blob), timings[0], timings[1], timings[2]))
+
+
+if __name__ == "__main__":
+    main()
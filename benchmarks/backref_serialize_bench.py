@@ -0,0 +1,101 @@
+# Compare serializing with back references using `ReadCacheLookup` and the
+# indexed `ReadStackIndex`, on wide and deep trees of growing size, and on
+# the block generator in `tests`. Both give encodings of the same length.
+#
+#   $ python benchmarks/backref_serialize_bench.py
+
+import gzip
+import time
+from typing import Callable, List, Tuple, Union
+
+from clvm.CLVMObject import CLVMObject, CLVMStorage
+from clvm.read_cache_lookup import ReadCacheLookup, ReadStackIndex
+from clvm.serialize import _write_sexp_with_backrefs, sexp_from_buffer, to_clvm_object
+
+GENERATOR = "tests/generator.bin.gz"
+SIZES = [1000, 2000, 4000, 8000, 16000]
+# the old lookup gets very slow on big trees, so stop timing it after this
+MAX_OLD_SIZE = 2000
+
+
+def atom(i: int) -> CLVMStorage:
+    # atoms long enough to be worth a back reference
+    return CLVMObject(bytes([i]) * 33)
+
+
+def cons(left: CLVMStorage, right: CLVMStorage) -> CLVMStorage:
+    return CLVMObject((left, right))
+
+
+def wide(n: int) -> CLVMStorage:
+    # a list of `n` small programs, made from a handful of repeated parts,
+    # like the spends of a block
+    r: CLVMStorage = CLVMObject(b"")
+    for i in range(n):
+        r = cons(cons(atom(i % 7), cons(atom(100 + i % 5), CLVMObject(i.to_bytes(4, "big")))), r)
+    return r
+
+
+def deep_list(n: int) -> CLVMStorage:
+    # a list nested `n` deep, each level holding a repeated atom
+    r: CLVMStorage = CLVMObject(b"")
+    for i in range(n):
+        r = cons(atom(i % 5), r)
+    return r
+
+
+def deep_left(n: int) -> CLVMStorage:
+    r = atom(255)
+    for i in range(n):
+        r = cons(r, atom(i % 5))
+    return r
+
+
+def deep_mixed(n: int) -> CLVMStorage:
+    # nested on both sides, so repeated atoms end up inside many distinct
+    # cons boxes that have to be searched
+    r = atom(255)
+    for i in range(n):
+        if i % 3:
+            r = cons(atom(10 + i % 5), r)
+        else:
+            r = cons(r, atom(20))
+    return r
+
+
+def encode(obj: CLVMStorage, lookup: Union[ReadCacheLookup, ReadStackIndex]) -> Tuple[int, float]:
+    buf = bytearray()
+    start = time.perf_counter()
+    _write_sexp_with_backrefs(obj, buf, 1 << 40, lookup)
+    return len(buf), time.perf_counter() - start
+
+
+def main() -> None:
+    shapes: List[Tuple[str, Callable[[int], CLVMStorage]]] = [
+        ("wide", wide),
+        ("deep list", deep_list),
+        ("deep left", deep_left),
+        ("deep mixed", deep_mixed),
+    ]
+    print("%-12s %6s %10s %14s %14s" % ("", "n", "bytes", "old ms", "indexed ms"))
+    for name, make in shapes:
+        for n in SIZES:
+            obj = make(n)
+            size, elapsed = encode(obj, ReadStackIndex())
+            if n <= MAX_OLD_SIZE:
+                old_size, old_elapsed = encode(obj, ReadCacheLookup())
+                assert old_size == size
+                old = "%14.1f" % (old_elapsed * 1000)
+            else:
+                old = "%14s" % "-"
+            print("%-12s %6d %10d %s %14.1f" % (name, n, size, old, elapsed * 1000))
+
+    generator = sexp_from_buffer(gzip.GzipFile(GENERATOR).read(), to_clvm_object)[0]
+    size, elapsed = encode(generator, ReadStackIndex())
+    old_size, old_elapsed = encode(generator, ReadCacheLookup())
+    assert old_size == size
+    print("%-12s %6s %10d %14.1f %14.1f" % ("generator", "", size, old_elapsed * 1000, elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Measure how `run_program_batch` scales with the number of worker processes,
+# compared to running the same batch with `run_program` in this process.
+#
+#   $ python benchmarks/batch_bench.py
+
+import os
+import time
+from typing import List, Tuple
+
+from clvm.SExp import SExp
+from clvm.batch import BatchRunner
+from clvm.operators import OPERATOR_LOOKUP
+from clvm.run_program import run_program
+
+from clvm_tools.binutils import assemble
+
+# (sum LIST) as a recursive function
+SUM_LIST = (
+    "(a (q . (a 2 (c 2 (c 5 ()))))"
+    " (c (q . (a (i 5 (q . (+ 9 (a 2 (c 2 (c 13 ()))))) (q . ())) 1)) 1))"
+)
+
+BATCH_SIZE = 64
+
+
+def make_batch() -> List[Tuple[SExp, SExp]]:
+    program = assemble(SUM_LIST)
+    return [(program, SExp.to([list(range(i, i + 200))])) for i in range(BATCH_SIZE)]
+
+
+def main() -> None:
+    items = make_batch()
+
+    start = time.perf_counter()
+    for program, args in items:
+        run_program(program, args, OPERATOR_LOOKUP)
+    serial = time.perf_counter() - start
+    print("%-12s %10s %8s" % ("workers", "ms", "speedup"))
+    print("%-12s %10.1f %8s" % ("in-process", serial * 1000, "1.0x"))
+
+    cpu_count = os.cpu_count() or 1
+    workers = 1
+    while workers <= max(cpu_count, 1):
+        with BatchRunner(max_workers=workers) as runner:
+            # warm up the pool, so process start up isn't measured
+            runner.run(items[:workers])
+            start = time.perf_counter()
+            runner.run(items)
+            elapsed = time.perf_counter() - start
+        print("%-12d %10.1f %7.1fx" % (workers, elapsed * 1000, serial / elapsed))
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Compare `sexp_from_stream` with the buffer-indexed `sexp_from_buffer`,
+# with and without zero-copy atoms, and with parsing a memory mapped file with
+# `sexp_from_file`, on the block generator in `tests`.
+#
+#   $ python benchmarks/deserialize_bench.py
+
+import gzip
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from clvm.SExp import SExp
+from clvm.serialize import sexp_from_buffer, sexp_from_file, sexp_from_stream, to_clvm_object
+
+GENERATOR = "tests/generator.bin.gz"
+
+
+def measure(f: Callable[[], object], repeat: int) -> Tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        f()
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    r = f()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del r
+    return elapsed, peak
+
+
+def read_and_parse(path: str) -> object:
+    with open(path, "rb") as f:
+        return sexp_from_stream(f, to_clvm_object)
+
+
+def main() -> None:
+    blob = gzip.GzipFile(GENERATOR).read()
+    d = tempfile.TemporaryDirectory()
+    path = os.path.join(d.name, "generator.bin")
+    with open(path, "wb") as out:
+        out.write(blob)
+    backrefs_blob = SExp(sexp_from_buffer(blob, to_clvm_object)[0]).as_bin(allow_backrefs=True)
+
+    cases: List[Tuple[str, Callable[[], object]]] = [
+        ("stream", lambda: sexp_from_stream(io.BytesIO(blob), to_clvm_object)),
+        ("buffer", lambda: sexp_from_buffer(blob, to_clvm_object)),
+        ("buffer zero-copy", lambda: sexp_from_buffer(blob, to_clvm_object, zero_copy=True)),
+        (
+            "stream backrefs",
+            lambda: sexp_from_stream(io.BytesIO(backrefs_blob), to_clvm_object, allow_backrefs=True),
+        ),
+        (
+            "buffer backrefs",
+            lambda: sexp_from_buffer(backrefs_blob, to_clvm_object, allow_backrefs=True),
+        ),
+        ("file stream", lambda: read_and_parse(path)),
+        ("file mmap", lambda: sexp_from_file(path, to_clvm_object)),
+        ("file mmap zero-copy", lambda: sexp_from_file(path, to_clvm_object, zero_copy=True)),
+    ]
+
+    print("%d bytes, %d with backrefs" % (len(blob), len(backrefs_blob)))
+    print("%-20s %10s %12s" % ("parser", "ms", "peak KiB"))
+    for name, f in cases:
+        elapsed, peak = measure(f, 10)
+        print("%-20s %10.2f %12.1f" % (name, elapsed * 1000, peak / 1024))
+    d.cleanup()
+
+
+if __name__ == "__main__":
+    main()
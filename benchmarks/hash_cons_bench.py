@@ -0,0 +1,99 @@
+# Compare building the block generator in `tests` as a plain tree and hash
+# consed with a `HashConser`, by time, memory kept alive by the result, and
+# peak traced memory while building it, then compare the time of tree
+# hashing, equality and serialization on the results.
+#
+#   $ python benchmarks/hash_cons_bench.py
+
+import gzip
+import io
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from clvm.SExp import SExp
+from clvm.hash_cons import HashConser
+from clvm.object_cache import ObjectCache, treehash
+from clvm.serialize import sexp_from_buffer, sexp_from_stream, to_clvm_object
+
+GENERATOR = "tests/generator.bin.gz"
+
+
+def measure(f: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def memory(f: Callable[[], object]) -> Tuple[int, int]:
+    # the memory kept alive by the result of `f`, and the peak while it ran
+    tracemalloc.start()
+    r = f()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del r
+    return current, peak
+
+
+def main() -> None:
+    blob = gzip.GzipFile(GENERATOR).read()
+    python_value = SExp(sexp_from_buffer(blob, to_clvm_object)[0]).as_python()
+
+    conser = HashConser()
+    conser.intern(sexp_from_buffer(blob, to_clvm_object)[0])
+    print(
+        "generator: %d bytes, %d nodes, %d distinct, dedup ratio %.1f"
+        % (len(blob), conser.node_count, len(conser), conser.dedup_ratio)
+    )
+
+    # a fresh `HashConser` for each run, so it's included in the memory
+    builds: List[Tuple[str, Callable[[], object], Callable[[], object]]] = [
+        (
+            "sexp_from_stream",
+            lambda: sexp_from_stream(io.BytesIO(blob), to_clvm_object),
+            lambda: sexp_from_stream(io.BytesIO(blob), HashConser()),
+        ),
+        (
+            "sexp_from_buffer",
+            lambda: sexp_from_buffer(blob, to_clvm_object),
+            lambda: sexp_from_buffer(blob, HashConser()),
+        ),
+        (
+            "SExp.to",
+            lambda: SExp.to(python_value),
+            lambda: SExp.to(python_value, hash_cons=HashConser()),
+        ),
+    ]
+    print("%-18s %10s %10s %14s %14s" % ("", "", "ms", "retained KiB", "peak KiB"))
+    for name, plain, consed in builds:
+        for kind, f in (("plain", plain), ("hash consed", consed)):
+            current, peak = memory(f)
+            print("%-18s %10s %10.2f %14.1f %14.1f" % (name, kind, measure(f, 5) * 1e3, current / 1024, peak / 1024))
+
+    plain_obj = SExp(sexp_from_buffer(blob, to_clvm_object)[0])
+    plain_copy = SExp(sexp_from_buffer(blob, to_clvm_object)[0])
+    consed_obj = SExp(sexp_from_buffer(blob, conser)[0])
+    consed_copy = SExp(sexp_from_buffer(blob, conser)[0])
+    uses: List[Tuple[str, Callable[[SExp, SExp], object]]] = [
+        ("tree hash", lambda obj, copy: ObjectCache(treehash).get(obj)),
+        ("equality", lambda obj, copy: obj == copy),
+        ("serialize", lambda obj, copy: obj.as_bin()),
+    ]
+    print()
+    print("%-18s %10s %12s" % ("ms", "plain", "hash consed"))
+    for name, use in uses:
+        print(
+            "%-18s %10.2f %12.2f"
+            % (
+                name,
+                measure(lambda: use(plain_obj, plain_copy), 5) * 1e3,
+                measure(lambda: use(consed_obj, consed_copy), 5) * 1e3,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
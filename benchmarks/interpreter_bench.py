@@ -0,0 +1,54 @@
+# Compare `run_program`, which builds its eval loop on every call, with a
+# reusable `Interpreter` on very small programs.
+#
+#   $ python benchmarks/interpreter_bench.py
+
+import timeit
+from typing import List, Tuple
+
+from clvm.SExp import SExp
+from clvm.operators import OPERATOR_LOOKUP
+from clvm.run_program import Interpreter, run_program
+
+from clvm_tools.binutils import assemble
+
+PROGRAMS: List[Tuple[str, str]] = [
+    ("1", "(100 200)"),
+    ("(q . 1)", "()"),
+    ("(f 1)", "(100 200)"),
+    ("(+ 2 5)", "(100 200)"),
+    ("(c 2 (c 5 ()))", "(100 200)"),
+    ("(a (q . (+ 2 5)) 1)", "(100 200)"),
+]
+
+
+def main() -> None:
+    interpreter = Interpreter(OPERATOR_LOOKUP)
+    print("%-24s %12s %12s %8s" % ("program", "run_program", "Interpreter", "speedup"))
+    for program_text, args_text in PROGRAMS:
+        program = SExp.to(assemble(program_text))
+        args = SExp.to(assemble(args_text))
+        assert run_program(program, args, OPERATOR_LOOKUP) == interpreter.run(program, args)
+
+        number = 2000
+        t_function = min(
+            timeit.repeat(
+                lambda: run_program(program, args, OPERATOR_LOOKUP), number=number, repeat=5
+            )
+        )
+        t_interpreter = min(
+            timeit.repeat(lambda: interpreter.run(program, args), number=number, repeat=5)
+        )
+        print(
+            "%-24s %10.2fus %10.2fus %7.2fx"
+            % (
+                program_text,
+                t_function / number * 1e6,
+                t_interpreter / number * 1e6,
+                t_function / t_interpreter,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
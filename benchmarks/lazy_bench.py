@@ -0,0 +1,63 @@
+# Compare probing a few paths of a block generator after a full
+# `sexp_from_stream` parse and through a `LazyCLVMObject`, by wall time and peak
+# traced memory.
+#
+#   $ python benchmarks/lazy_bench.py
+
+import gzip
+import io
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from clvm.CLVMObject import CLVMStorage
+from clvm.SExp import SExp
+from clvm.lazy import LazyCLVMObject
+from clvm.serialize import sexp_from_stream, to_clvm_object
+
+GENERATOR = "tests/generator.bin.gz"
+
+
+def probe(obj: CLVMStorage) -> Tuple[int, bytes]:
+    # the generator is `(q . (SPENDS...))`. Count the spends, and find the
+    # first atom of the first one
+    spends = SExp(obj).rest()
+    count = spends.list_len()
+    node = spends.first()
+    while node.atom is None:
+        node = node.first()
+    return count, node.atom
+
+
+def measure(f: Callable[[], object], repeat: int) -> Tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        f()
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    f()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    blob = gzip.GzipFile(GENERATOR).read()
+
+    cases: List[Tuple[str, Callable[[], object]]] = [
+        ("full parse, probe", lambda: probe(sexp_from_stream(io.BytesIO(blob), to_clvm_object))),
+        ("lazy, probe", lambda: probe(LazyCLVMObject(blob))),
+        ("full parse, all", lambda: SExp(sexp_from_stream(io.BytesIO(blob), to_clvm_object)).as_bin()),
+        ("lazy, all", lambda: SExp(LazyCLVMObject(blob)).as_bin()),
+    ]
+
+    print("%d bytes" % len(blob))
+    print("%-22s %10s %12s" % ("", "ms", "peak KiB"))
+    for name, f in cases:
+        elapsed, peak = measure(f, 5)
+        print("%-22s %10.2f %12.1f" % (name, elapsed * 1000, peak / 1024))
+
+
+if __name__ == "__main__":
+    main()
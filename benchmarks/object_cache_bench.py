@@ -0,0 +1,77 @@
+# Compare hashing puzzles with a new `ObjectCache` each time, with one shared
+# `ObjectCache`, and with one shared `BoundedObjectCache`, in a loop that
+# looks like a long running node: each round parses the spends of the block
+# generator in `tests` afresh, and hashes each puzzle a few times. Shows
+# the time, and the memory the cache holds on to after all the rounds.
+#
+#   $ python benchmarks/object_cache_bench.py
+
+import gzip
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from clvm.CLVMObject import CLVMStorage
+from clvm.SExp import SExp
+from clvm.object_cache import BoundedObjectCache, ObjectCache, treehash
+from clvm.serialize import sexp_from_buffer, to_clvm_object
+
+GENERATOR = "tests/generator.bin.gz"
+ROUNDS = 5
+HASHES_PER_PUZZLE = 3
+
+
+def puzzles(blob: bytes) -> List[CLVMStorage]:
+    generator = SExp(sexp_from_buffer(blob, to_clvm_object)[0])
+    return [spend.rest().first() for spend in generator.rest().first().as_iter()]
+
+
+def run(blob: bytes, get_cache: Callable[[], ObjectCache[bytes]]) -> float:
+    # return the time taken to hash
+    elapsed = 0.0
+    for _ in range(ROUNDS):
+        items = puzzles(blob)
+        start = time.perf_counter()
+        for _ in range(HASHES_PER_PUZZLE):
+            for item in items:
+                get_cache().get(item)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def held(blob: bytes, get_cache: Callable[[], ObjectCache[bytes]]) -> int:
+    # the memory still held once the rounds are over
+    tracemalloc.start()
+    run(blob, get_cache)
+    r = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return r
+
+
+def per_call() -> Callable[[], ObjectCache[bytes]]:
+    return lambda: ObjectCache(treehash)
+
+
+def shared(cache: ObjectCache[bytes]) -> Callable[[], ObjectCache[bytes]]:
+    return lambda: cache
+
+
+def main() -> None:
+    blob = gzip.GzipFile(GENERATOR).read()
+    # each makes the caches for one run
+    cases: List[Tuple[str, Callable[[], Callable[[], ObjectCache[bytes]]]]] = [
+        ("ObjectCache per call", per_call),
+        ("shared ObjectCache", lambda: shared(ObjectCache(treehash))),
+        ("BoundedObjectCache(100000)", lambda: shared(BoundedObjectCache(treehash, maxsize=100000))),
+    ]
+    print("%d rounds of %d puzzles, hashed %d times each" % (ROUNDS, len(puzzles(blob)), HASHES_PER_PUZZLE))
+    print("%-28s %10s %12s %10s" % ("", "ms", "held KiB", "entries"))
+    for name, setup in cases:
+        get_cache = setup()
+        elapsed = run(blob, get_cache)
+        entries = len(get_cache().lookup)
+        print("%-28s %10.1f %12.1f %10d" % (name, elapsed * 1e3, held(blob, setup()) / 1024, entries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Compare parsing a stream of serialized puzzles and solutions, as they'd
+# arrive from the network, with `sexp_from_stream`, `sexp_from_buffer`, and
+# through a `ParseCache` of a few sizes. The messages are the puzzles and
+# solutions of the block generator in `tests`, which repeat a lot.
+#
+#   $ python benchmarks/parse_cache_bench.py
+
+import gzip
+import io
+import time
+from typing import Callable, List, Optional, Tuple
+
+from clvm.SExp import SExp
+from clvm.parse_cache import ParseCache
+from clvm.serialize import sexp_from_buffer, sexp_from_stream, to_clvm_object
+
+GENERATOR = "tests/generator.bin.gz"
+
+
+def messages() -> List[bytes]:
+    generator = SExp(sexp_from_buffer(gzip.GzipFile(GENERATOR).read(), to_clvm_object)[0])
+    r = []
+    for spend in generator.rest().first().as_iter():
+        # (parent_id puzzle amount solution)
+        r.append(spend.rest().first().as_bin())
+        r.append(spend.rest().rest().rest().first().as_bin())
+    return r
+
+
+def measure(f: Callable[[bytes], object], blobs: List[bytes], repeat: int) -> float:
+    # the best time to parse all of `blobs`
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for blob in blobs:
+            f(blob)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    blobs = messages()
+    total = sum(len(_) for _ in blobs)
+    print("%d messages, %d distinct, %d bytes" % (len(blobs), len(set(blobs)), total))
+    print("%-28s %10s %10s %10s" % ("", "ms", "MB/s", "hit rate"))
+
+    cases: List[Tuple[str, Callable[[bytes], object], Optional[ParseCache]]] = [
+        ("sexp_from_stream", lambda b: sexp_from_stream(io.BytesIO(b), to_clvm_object), None),
+        ("sexp_from_buffer", lambda b: sexp_from_buffer(b, to_clvm_object), None),
+    ]
+    for max_bytes in (2000, 8000, 1 << 20):
+        parse_cache = ParseCache(max_bytes)
+        cases.append(("ParseCache(%d)" % max_bytes, parse_cache.parse, parse_cache))
+
+    for name, f, cache in cases:
+        elapsed = measure(f, blobs, 5)
+        hit_rate = "%10s" % "-"
+        if cache is not None:
+            hit_rate = "%9.1f%%" % (100 * cache.hits / (cache.hits + cache.misses))
+        print("%-28s %10.2f %10.1f %s" % (name, elapsed * 1e3, total / elapsed / 1e6, hit_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Compare a `ProgramStore` with storing raw `as_bin()` blobs in a file (with
+# an index from tree hash to offset, and reading through a memory map), by
+# size on disk and lookup latency. The programs are the puzzles and
+# solutions of the block generator in `tests`, many of which share code.
+#
+#   $ python benchmarks/program_store_bench.py
+
+import gzip
+import mmap
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from clvm.CLVMObject import CLVMStorage
+from clvm.SExp import SExp
+from clvm.object_cache import ObjectCache, treehash
+from clvm.program_store import ProgramStore
+from clvm.serialize import sexp_from_buffer, to_clvm_object
+
+GENERATOR = "tests/generator.bin.gz"
+
+
+def programs() -> List[SExp]:
+    generator = SExp(sexp_from_buffer(gzip.GzipFile(GENERATOR).read(), to_clvm_object)[0])
+    r = []
+    for spend in generator.rest().first().as_iter():
+        # (parent_id puzzle amount solution)
+        r.append(spend.rest().first())
+        r.append(spend.rest().rest().rest().first())
+    return r
+
+
+def write_blobs(path: str, items: List[SExp], dedupe: bool) -> Dict[bytes, int]:
+    index: Dict[bytes, int] = {}
+    with open(path, "wb") as f:
+        for item in items:
+            tree_hash = ObjectCache(treehash).get(item)
+            if dedupe and tree_hash in index:
+                continue
+            index[tree_hash] = f.tell()
+            f.write(item.as_bin())
+    return index
+
+
+def measure(f: Callable[[bytes], object], keys: List[bytes], repeat: int) -> float:
+    # the best mean lookup time over `repeat` passes over `keys`
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for key in keys:
+            f(key)
+        timings.append((time.perf_counter() - start) / len(keys))
+    return min(timings)
+
+
+def main() -> None:
+    items = programs()
+    keys = [ObjectCache(treehash).get(_) for _ in items]
+    total = sum(len(_.as_bin()) for _ in items)
+    print("%d programs, %d distinct, %d bytes serialized" % (len(items), len(set(keys)), total))
+    print("%-22s %12s %14s" % ("", "bytes", "lookup us"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, dedupe in (("raw blobs", False), ("raw blobs, deduped", True)):
+            path = os.path.join(directory, name)
+            index = write_blobs(path, items, dedupe)
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+                def load(key: bytes) -> CLVMStorage:
+                    return sexp_from_buffer(data, to_clvm_object, index[key])[0]
+
+                elapsed = measure(load, keys, 5)
+                data.close()
+            print("%-22s %12d %14.1f" % (name, os.path.getsize(path), elapsed * 1e6))
+
+        path = os.path.join(directory, "store")
+        with ProgramStore(path) as store:
+            for item in items:
+                store.put(item)
+        with ProgramStore(path) as store:
+            for item, key in zip(items, keys):
+                assert SExp.to(store.get(key)).as_bin() == item.as_bin()
+            elapsed = measure(store.get, keys, 5)
+            print("%-22s %12d %14.1f" % ("ProgramStore", store.size, elapsed * 1e6))
+
+
+if __name__ == "__main__":
+    main()
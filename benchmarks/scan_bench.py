@@ -0,0 +1,63 @@
+# Compare computing the tree hash and serialized length of a block generator
+# by parsing it and walking the result, and with `scan_sexp` straight from
+# the bytes, by wall time and peak traced memory.
+#
+#   $ python benchmarks/scan_bench.py
+
+import gzip
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from clvm.SExp import SExp
+from clvm.object_cache import ObjectCache, serialized_length, treehash
+from clvm.scan import scan_sexp
+from clvm.serialize import sexp_from_buffer, to_clvm_object
+
+GENERATOR = "tests/generator.bin.gz"
+
+
+def parse_and_walk(blob: bytes, allow_backrefs: bool) -> Tuple[bytes, int]:
+    obj = sexp_from_buffer(blob, to_clvm_object, allow_backrefs=allow_backrefs)[0]
+    return ObjectCache(treehash).get(obj), ObjectCache(serialized_length).get(obj)
+
+
+def scan(blob: bytes, allow_backrefs: bool) -> Tuple[bytes, int]:
+    r = scan_sexp(blob, allow_backrefs=allow_backrefs)
+    return r.tree_hash, r.serialized_length
+
+
+def measure(f: Callable[[], object], repeat: int) -> Tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        f()
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    f()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    blob = gzip.GzipFile(GENERATOR).read()
+    compressed = SExp(sexp_from_buffer(blob, to_clvm_object)[0]).as_bin(allow_backrefs=True)
+    assert parse_and_walk(blob, False) == scan(blob, False)
+    assert parse_and_walk(compressed, True) == scan(compressed, True)
+
+    cases: List[Tuple[str, Callable[[], object]]] = [
+        ("parse + ObjectCache", lambda: parse_and_walk(blob, False)),
+        ("scan_sexp", lambda: scan(blob, False)),
+        ("parse + ObjectCache, backrefs", lambda: parse_and_walk(compressed, True)),
+        ("scan_sexp, backrefs", lambda: scan(compressed, True)),
+    ]
+    print("generator: %d bytes, %d with backrefs" % (len(blob), len(compressed)))
+    print("%-30s %10s %12s" % ("", "ms", "peak KiB"))
+    for name, f in cases:
+        elapsed, peak = measure(f, 5)
+        print("%-30s %10.2f %12.1f" % (name, elapsed * 1000, peak / 1024))
+
+
+if __name__ == "__main__":
+    main()
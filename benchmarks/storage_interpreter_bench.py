@@ -0,0 +1,120 @@
+# Compare the `SExp` based eval loop of `Interpreter` with the eval loop of
+# `StorageInterpreter`, which works on raw CLVM objects, by wall time, number
+# of `SExp`/`CLVMObject` instances created and peak traced memory.
+#
+#   $ python benchmarks/storage_interpreter_bench.py
+
+import time
+import tracemalloc
+from typing import Callable, List, Tuple, Union
+
+from clvm.CLVMObject import CLVMObject
+from clvm.SExp import SExp
+from clvm.operators import OPERATOR_LOOKUP
+from clvm.run_program import Interpreter
+from clvm.storage_interpreter import StorageInterpreter
+
+from clvm_tools.binutils import assemble
+
+# (sum LIST) as a recursive function
+SUM_LIST = (
+    "(a (q . (a 2 (c 2 (c 5 ()))))"
+    " (c (q . (a (i 5 (q . (+ 9 (a 2 (c 2 (c 13 ()))))) (q . ())) 1)) 1))"
+)
+
+# (sha256 of each element of LIST), built as a new list
+HASH_LIST = (
+    "(a (q . (a 2 (c 2 (c 5 ()))))"
+    " (c (q . (a (i 5 (q . (c (sha256 9) (a 2 (c 2 (c 13 ()))))) (q . ())) 1)) 1))"
+)
+
+BENCHMARKS: List[Tuple[str, str, SExp]] = [
+    ("(+ 2 5)", "(+ 2 5)", SExp.to([100, 200])),
+    ("sum 100", SUM_LIST, SExp.to([list(range(100))])),
+    ("sum 1000", SUM_LIST, SExp.to([list(range(1000))])),
+    ("hash 200", HASH_LIST, SExp.to([list(range(200))])),
+]
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.sexp = 0
+        self.clvm_object = 0
+
+
+def count_allocations(f: Callable[[], object]) -> Counter:
+    counter = Counter()
+    sexp_init = SExp.__init__
+    clvm_object_new = CLVMObject.__new__
+
+    def counting_init(self: SExp, obj: object) -> None:
+        counter.sexp += 1
+        sexp_init(self, obj)  # type: ignore[arg-type]
+
+    def counting_new(class_: type, v: object) -> object:
+        counter.clvm_object += 1
+        return clvm_object_new(class_, v)  # type: ignore[arg-type]
+
+    SExp.__init__ = counting_init  # type: ignore[method-assign]
+    CLVMObject.__new__ = counting_new  # type: ignore[assignment,method-assign]
+    try:
+        f()
+    finally:
+        SExp.__init__ = sexp_init  # type: ignore[method-assign]
+        CLVMObject.__new__ = clvm_object_new  # type: ignore[method-assign]
+    return counter
+
+
+def peak_memory(f: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        f()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def best_time(f: Callable[[], object], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    interpreters: List[Tuple[str, Union[Interpreter, StorageInterpreter]]] = [
+        ("Interpreter", Interpreter(OPERATOR_LOOKUP)),
+        ("StorageInterpreter", StorageInterpreter(OPERATOR_LOOKUP)),
+    ]
+    print(
+        "%-10s %-20s %10s %10s %12s %10s"
+        % ("program", "interpreter", "time", "SExp", "CLVMObject", "peak")
+    )
+    for name, program_text, args in BENCHMARKS:
+        program = SExp.to(assemble(program_text))
+        results = []
+        for interpreter_name, interpreter in interpreters:
+
+            def run() -> Tuple[int, SExp]:
+                return interpreter.run(program, args)
+
+            results.append(run())
+            counter = count_allocations(run)
+            print(
+                "%-10s %-20s %8.2fms %10d %12d %9dk"
+                % (
+                    name,
+                    interpreter_name,
+                    best_time(run) * 1000,
+                    counter.sexp,
+                    counter.clvm_object,
+                    peak_memory(run) // 1024,
+                )
+            )
+        assert results[0] == results[1]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Compare computing tree hashes of a block generator parsed into plain
+# `CLVMObject`s and into `HashedCLVMObject`s, which keep their hash: the
+# first hash, hashing it again, hashing a new pair with the generator as a
+# child, and serializing with back references (which hashes every node).
+#
+#   $ python benchmarks/tree_hash_bench.py
+
+import gzip
+import time
+from typing import Callable, List, Tuple
+
+from clvm.CLVMObject import CLVMObject, CLVMStorage, HashedCLVMObject
+from clvm.object_cache import ObjectCache, treehash
+from clvm.serialize import (
+    ToCLVMStorage,
+    sexp_from_buffer,
+    sexp_to_bytearray,
+    to_clvm_object,
+    to_hashed_clvm_object,
+)
+
+GENERATOR = "tests/generator.bin.gz"
+
+
+def first_hash(blob: bytes, to_sexp: ToCLVMStorage[CLVMStorage], repeat: int) -> float:
+    # the best time to hash a freshly parsed tree
+    timings = []
+    for _ in range(repeat):
+        obj = sexp_from_buffer(blob, to_sexp)[0]
+        start = time.perf_counter()
+        ObjectCache(treehash).get(obj)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(f: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    blob = gzip.GzipFile(GENERATOR).read()
+    plain = sexp_from_buffer(blob, to_clvm_object)[0]
+    hashed = sexp_from_buffer(blob, to_hashed_clvm_object)[0]
+    assert ObjectCache(treehash).get(plain) == ObjectCache(treehash).get(hashed)
+
+    cases: List[Tuple[str, Callable[[], object], Callable[[], object]]] = [
+        (
+            "hash again",
+            lambda: ObjectCache(treehash).get(plain),
+            lambda: ObjectCache(treehash).get(hashed),
+        ),
+        (
+            "cons + hash",
+            lambda: ObjectCache(treehash).get(CLVMObject((CLVMObject(b"new"), plain))),
+            lambda: ObjectCache(treehash).get(HashedCLVMObject((HashedCLVMObject(b"new"), hashed))),
+        ),
+        (
+            "backref serialize",
+            lambda: sexp_to_bytearray(plain, allow_backrefs=True),
+            lambda: sexp_to_bytearray(hashed, allow_backrefs=True),
+        ),
+    ]
+    print("%-20s %12s %18s" % ("ms", "CLVMObject", "HashedCLVMObject"))
+    print(
+        "%-20s %12.3f %18.3f"
+        % ("first hash", first_hash(blob, to_clvm_object, 5) * 1e3, first_hash(blob, to_hashed_clvm_object, 5) * 1e3)
+    )
+    for name, f_plain, f_hashed in cases:
+        print("%-20s %12.3f %18.3f" % (name, measure(f_plain, 5) * 1e3, measure(f_hashed, 5) * 1e3))
+
+
+if __name__ == "__main__":
+    main()
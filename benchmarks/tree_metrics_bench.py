@@ -0,0 +1,141 @@
+# Compare computing per-node metrics of the block generator in `tests` with
+# an `ObjectCache` for each metric and with a single `ObjectCache` of
+# `tree_metrics`, and serializing it with back references using the two
+# caches the serializer used to have and the single cache it has now. A tree
+# of `HashedCLVMObject`s whose hashes are saved is serialized both ways too.
+#
+#   $ python benchmarks/tree_metrics_bench.py
+
+import gzip
+import time
+from typing import Callable, List, Optional, Tuple
+
+from clvm.CLVMObject import CLVMStorage
+from clvm.object_cache import ObjectCache, serialized_length, tree_metrics, treehash
+from clvm.read_cache_lookup import ReadStackIndex
+from clvm.serialize import (
+    BACK_REFERENCE,
+    CONS_BOX_MARKER,
+    MAX_SAFE_BYTES,
+    _write_atom,
+    sexp_from_buffer,
+    sexp_to_bytearray,
+    to_clvm_object,
+    to_hashed_clvm_object,
+)
+
+GENERATOR = "tests/generator.bin.gz"
+
+
+def node_count(cache: ObjectCache[int], obj: CLVMStorage) -> Optional[int]:
+    if obj.pair is None:
+        return 1
+    left, right = obj.pair
+    if cache.contains(left) and cache.contains(right):
+        return 1 + cache.get(left) + cache.get(right)
+    return None
+
+
+def depth(cache: ObjectCache[int], obj: CLVMStorage) -> Optional[int]:
+    if obj.pair is None:
+        return 0
+    left, right = obj.pair
+    if cache.contains(left) and cache.contains(right):
+        return 1 + max(cache.get(left), cache.get(right))
+    return None
+
+
+def atom_bytes(cache: ObjectCache[int], obj: CLVMStorage) -> Optional[int]:
+    if obj.pair is None:
+        assert obj.atom is not None
+        return len(obj.atom)
+    left, right = obj.pair
+    if cache.contains(left) and cache.contains(right):
+        return cache.get(left) + cache.get(right)
+    return None
+
+
+def two_caches(obj: CLVMStorage) -> object:
+    return ObjectCache(treehash).get(obj), ObjectCache(serialized_length).get(obj)
+
+
+def five_caches(obj: CLVMStorage) -> object:
+    return (
+        ObjectCache(treehash).get(obj),
+        ObjectCache(serialized_length).get(obj),
+        ObjectCache(node_count).get(obj),
+        ObjectCache(depth).get(obj),
+        ObjectCache(atom_bytes).get(obj),
+    )
+
+
+def serialize_with_two_caches(sexp: CLVMStorage) -> bytearray:
+    # the backref serializer as it was, with a cache for each metric
+    buf = bytearray()
+    read_op_stack = ["P"]
+    write_stack = [sexp]
+    read_cache_lookup = ReadStackIndex()
+    thc = ObjectCache(treehash)
+    slc = ObjectCache(serialized_length)
+    while write_stack:
+        node_to_write = write_stack.pop()
+        read_op_stack.pop()
+        node_tree_hash = thc.get(node_to_write)
+        path = read_cache_lookup.find_path(node_tree_hash, slc.get(node_to_write))
+        if path:
+            buf.append(BACK_REFERENCE)
+            _write_atom(buf, path, MAX_SAFE_BYTES)
+            read_cache_lookup.push(node_tree_hash)
+        elif node_to_write.pair:
+            left, right = node_to_write.pair
+            buf.append(CONS_BOX_MARKER)
+            write_stack.append(right)
+            write_stack.append(left)
+            read_op_stack.append("C")
+            read_op_stack.append("P")
+            read_op_stack.append("P")
+        else:
+            assert node_to_write.atom is not None
+            _write_atom(buf, node_to_write.atom, MAX_SAFE_BYTES)
+            read_cache_lookup.push(node_tree_hash)
+        while read_op_stack[-1:] == ["C"]:
+            read_op_stack.pop()
+            read_cache_lookup.pop2_and_cons()
+    return buf
+
+
+def measure(f: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    blob = gzip.GzipFile(GENERATOR).read()
+    obj = sexp_from_buffer(blob, to_clvm_object)[0]
+    hashed = sexp_from_buffer(blob, to_hashed_clvm_object)[0]
+    ObjectCache(treehash).get(hashed)
+    metrics = ObjectCache(tree_metrics).get(obj)
+    assert five_caches(obj) == metrics
+    assert serialize_with_two_caches(obj) == sexp_to_bytearray(obj, allow_backrefs=True)
+    print("generator: %d bytes, %d nodes, depth %d" % (metrics[1], metrics[2], metrics[3]))
+
+    cases: List[Tuple[str, Callable[[], object]]] = [
+        ("treehash + serialized_length", lambda: two_caches(obj)),
+        ("five ObjectCaches", lambda: five_caches(obj)),
+        ("tree_metrics", lambda: ObjectCache(tree_metrics).get(obj)),
+        ("backrefs, two caches", lambda: serialize_with_two_caches(obj)),
+        ("backrefs, tree_metrics", lambda: sexp_to_bytearray(obj, allow_backrefs=True)),
+        ("hashed backrefs, two caches", lambda: serialize_with_two_caches(hashed)),
+        ("hashed backrefs, now", lambda: sexp_to_bytearray(hashed, allow_backrefs=True)),
+    ]
+    print("%-30s %10s" % ("", "ms"))
+    for name, f in cases:
+        print("%-30s %10.2f" % (name, measure(f, 5) * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ PairType = typing.Tuple[CLVMStorage, CLVMStorage]
 
 
 _T_CLVMObject = typing.TypeVar("_T_CLVMObject", bound="CLVMObject")
+_T_HashedCLVMObject = typing.TypeVar("_T_HashedCLVMObject", bound="HashedCLVMObject")
 
 
 class CLVMObject:
@@ -53,3 +54,28 @@ class CLVMObject:
             self.atom = narrowed_v
             self.pair = None
         return self
+
+
+class HashedCLVMObject(CLVMObject):
+    """
+    A `CLVMObject` that remembers its tree hash once `ObjectCache(treehash)`
+    has computed it, so hashing a tree built from hashed subtrees only hashes
+    the new pairs, and hashing the same tree again is free.
+
+    `tree_hash` is `None` until it's computed. Like any `CLVMObject` in a
+    hashed tree, these mustn't be changed after they're made.
+    """
+
+    tree_hash: typing.Optional[bytes]
+    __slots__ = ["tree_hash"]
+
+    @staticmethod
+    def __new__(
+        class_: typing.Type[_T_HashedCLVMObject],
+        v: typing.Union[_T_HashedCLVMObject, bytes, PairType],
+    ) -> _T_HashedCLVMObject:
+        if isinstance(v, class_):
+            return v
+        self = CLVMObject.__new__(class_, v)
+        self.tree_hash = None
+        return self
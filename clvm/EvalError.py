@@ -10,3 +10,10 @@ class EvalError(Exception):
     def __init__(self, message: str, sexp: SExp) -> None:
         super().__init__(message)
         self._sexp = sexp
+
+
+class ResourceLimitError(EvalError):
+    """
+    Raised when a run is aborted because it passed its deadline or created an
+    atom larger than allowed, rather than because the program failed.
+    """
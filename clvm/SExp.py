@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import io
 import typing
 
 import typing_extensions
@@ -9,12 +8,13 @@ from .as_python import as_python
 from .CLVMObject import CLVMObject, CLVMStorage
 
 from .EvalError import EvalError
+from .hash_cons import HashConser
 
 from .casts import (
     int_from_bytes,
     int_to_bytes,
 )
-from .serialize import sexp_to_stream, MAX_SAFE_BYTES
+from .serialize import sexp_to_bytearray, MAX_SAFE_BYTES
 
 
 CastableType = typing.Union[
@@ -187,13 +187,20 @@ class SExp:
         return int_from_bytes(self.atom)
 
     def as_bin(self, *, allow_backrefs: bool = False, max_size: int = MAX_SAFE_BYTES) -> bytes:
-        f = io.BytesIO()
-        sexp_to_stream(self, f, allow_backrefs=allow_backrefs, max_size=max_size)
-        return f.getvalue()
+        return bytes(sexp_to_bytearray(self, allow_backrefs=allow_backrefs, max_size=max_size))
 
     # TODO: should be `v: CastableType`
     @classmethod
-    def to(cls: typing.Type[_T_SExp], v: typing.Any) -> _T_SExp:
+    def to(
+        cls: typing.Type[_T_SExp], v: typing.Any, *, hash_cons: typing.Optional[HashConser] = None
+    ) -> _T_SExp:
+        """
+        Convert `v` to an `SExp`. With `hash_cons`, identical subtrees of the
+        result are the same object (see `HashConser`).
+        """
+        if hash_cons is not None:
+            return cls(hash_cons.intern(v if looks_like_clvm_object(v) else to_sexp_type(v)))
+
         if isinstance(v, cls):
             return v
 
@@ -234,6 +241,9 @@ class SExp:
             to_compare_stack = [(self, other)]
             while to_compare_stack:
                 s1, s2 = to_compare_stack.pop()
+                if s1.pair is not None and s1.pair is s2.pair:
+                    # the same subtree, as in hash consed trees
+                    continue
                 p1 = s1.as_pair()
                 if p1:
                     p2 = s2.as_pair()
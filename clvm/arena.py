@@ -0,0 +1,288 @@
+import hashlib
+import mmap
+import typing
+from array import array
+
+from .CLVMObject import CLVMStorage
+from .serialize import (
+    CONS_BOX_MARKER,
+    MAX_SAFE_BYTES,
+    MAX_SINGLE_BYTE,
+    BufferType,
+    _IndexableType,
+    _atom_header,
+    _atom_span,
+    sexp_from_buffer,
+)
+
+# node kinds
+ATOM = 0
+PAIR = 1
+
+# ops used by `Arena.parse`
+_READ = 0
+_CONS = 1
+
+
+class Arena:
+    """
+    `Arena` holds a forest of CLVM objects in a few flat arrays rather than
+    as a Python object per node, which takes a fraction of the memory for
+    big trees. A node is an index into the arrays: `kinds` holds whether it's
+    an atom or a pair, and `lefts` and `rights` hold the indexes of the first
+    and rest of a pair, or the start and end offsets of an atom's bytes in
+    `atom_bytes`, where all the atoms are stored back to back.
+
+    Nodes can't be changed once they're added. `node` returns an `ArenaNode`,
+    a view of a node that implements the CLVM object protocol, so it can be
+    passed to `SExp`, the serializers or `run_program`. `serialize` and
+    `tree_hash` work on the arrays directly, which is much faster than
+    going through views.
+
+    Offsets are stored as 32 bit ints, so an arena can hold up to 4 GiB of
+    atom bytes.
+    """
+
+    def __init__(self) -> None:
+        self.kinds = array("B")
+        self.lefts = array("I")
+        self.rights = array("I")
+        self.atom_bytes = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The size of the arrays holding the nodes and atoms, in bytes.
+        """
+        kinds, lefts, rights = self.kinds, self.lefts, self.rights
+        return (
+            len(kinds) * kinds.itemsize
+            + len(lefts) * lefts.itemsize
+            + len(rights) * rights.itemsize
+            + len(self.atom_bytes)
+        )
+
+    def new_atom(self, atom: bytes) -> int:
+        start = len(self.atom_bytes)
+        self.atom_bytes += atom
+        self.kinds.append(ATOM)
+        self.lefts.append(start)
+        self.rights.append(start + len(atom))
+        return len(self.kinds) - 1
+
+    def new_pair(self, first: int, rest: int) -> int:
+        self.kinds.append(PAIR)
+        self.lefts.append(first)
+        self.rights.append(rest)
+        return len(self.kinds) - 1
+
+    def atom(self, index: int) -> typing.Optional[bytes]:
+        if self.kinds[index] != ATOM:
+            return None
+        return bytes(self.atom_bytes[self.lefts[index]:self.rights[index]])
+
+    def pair(self, index: int) -> typing.Optional[typing.Tuple[int, int]]:
+        if self.kinds[index] != PAIR:
+            return None
+        return self.lefts[index], self.rights[index]
+
+    def node(self, index: int) -> "ArenaNode":
+        return ArenaNode(self, index)
+
+    def add(self, obj: CLVMStorage) -> int:
+        """
+        Copy `obj` into the arena, and return its index. Subtrees that are
+        shared in `obj` are shared in the arena, and views of nodes already
+        in this arena aren't copied.
+        """
+        added: typing.Dict[int, int] = {}
+        todo = [obj]
+        while todo:
+            node = todo[-1]
+            if id(node) in added:
+                todo.pop()
+                continue
+            if isinstance(node, ArenaNode) and node.arena is self:
+                added[id(node)] = node.index
+                todo.pop()
+                continue
+            pair = node.pair
+            if pair is None:
+                assert node.atom is not None
+                added[id(node)] = self.new_atom(node.atom)
+                todo.pop()
+                continue
+            first = added.get(id(pair[0]))
+            rest = added.get(id(pair[1]))
+            if first is None or rest is None:
+                todo.append(pair[1])
+                todo.append(pair[0])
+                continue
+            added[id(node)] = self.new_pair(first, rest)
+            todo.pop()
+        return added[id(obj)]
+
+    def _to_node(
+        self, v: typing.Union[CLVMStorage, bytes, typing.Tuple[CLVMStorage, CLVMStorage]]
+    ) -> "ArenaNode":
+        # a `to_sexp` for the parsers that builds nodes in this arena
+        if isinstance(v, tuple):
+            return ArenaNode(self, self.new_pair(self.add(v[0]), self.add(v[1])))
+        if isinstance(v, bytes):
+            return ArenaNode(self, self.new_atom(v))
+        return ArenaNode(self, self.add(v))
+
+    def parse(
+        self, buf: BufferType, offset: int = 0, *, allow_backrefs: bool = False
+    ) -> typing.Tuple[int, int]:
+        """
+        Parse the serialized object starting at `offset` in `buf` into the
+        arena, and return its index along with the offset just past it.
+        """
+        if allow_backrefs:
+            # back references are resolved by following pairs, so parse
+            # through views
+            node, offset = sexp_from_buffer(buf, self._to_node, offset, allow_backrefs=True)
+            return node.index, offset
+
+        data: _IndexableType
+        if isinstance(buf, (bytes, mmap.mmap)):
+            data = buf
+        else:
+            data = memoryview(buf)
+            if data.format != "B" or data.ndim != 1:
+                data = data.cast("B")
+        end = len(data)
+        kinds, lefts, rights = self.kinds, self.lefts, self.rights
+        atom_bytes = self.atom_bytes
+
+        op_stack = [_READ]
+        values: typing.List[int] = []
+
+        while op_stack:
+            if op_stack.pop() == _CONS:
+                right = values.pop()
+                kinds.append(PAIR)
+                lefts.append(values[-1])
+                rights.append(right)
+                values[-1] = len(kinds) - 1
+                continue
+
+            if offset >= end:
+                raise ValueError("bad encoding")
+            b = data[offset]
+            if b == CONS_BOX_MARKER:
+                offset += 1
+                op_stack.append(_CONS)
+                op_stack.append(_READ)
+                op_stack.append(_READ)
+                continue
+
+            if b == 0x80:
+                start = offset = offset + 1
+            elif b <= MAX_SINGLE_BYTE:
+                start = offset
+                offset += 1
+            else:
+                start, offset = _atom_span(data, offset)
+            atom_start = len(atom_bytes)
+            atom_bytes += data[start:offset]
+            kinds.append(ATOM)
+            lefts.append(atom_start)
+            rights.append(len(atom_bytes))
+            values.append(len(kinds) - 1)
+
+        return values[0], offset
+
+    def serialize(self, index: int, *, max_size: int = MAX_SAFE_BYTES) -> bytes:
+        """
+        Serialize the node at `index`, without back references.
+        """
+        kinds, lefts, rights = self.kinds, self.lefts, self.rights
+        buf = bytearray()
+        with memoryview(self.atom_bytes) as atoms:
+            todo = [index]
+            while todo:
+                i = todo.pop()
+                if kinds[i] == PAIR:
+                    buf.append(CONS_BOX_MARKER)
+                    todo.append(rights[i])
+                    todo.append(lefts[i])
+                    continue
+                start = lefts[i]
+                size = rights[i] - start
+                if size == 0:
+                    buf.append(0x80)
+                elif size == 1 and atoms[start] <= MAX_SINGLE_BYTE:
+                    buf.append(atoms[start])
+                else:
+                    header = _atom_header(size)
+                    if len(buf) + len(header) + size > max_size:
+                        raise ValueError("SExp exceeds maximum size")
+                    buf += header
+                    buf += atoms[start:start + size]
+                if len(buf) > max_size:
+                    raise ValueError("SExp exceeds maximum size")
+        return bytes(buf)
+
+    def tree_hash(self, index: int) -> bytes:
+        """
+        Compute the tree hash of the node at `index`. Nodes shared in the
+        arena are only hashed once.
+        """
+        kinds, lefts, rights = self.kinds, self.lefts, self.rights
+        atom_bytes = self.atom_bytes
+        sha256 = hashlib.sha256
+        hashes: typing.Dict[int, bytes] = {}
+        todo = [index]
+        while todo:
+            i = todo[-1]
+            if i in hashes:
+                todo.pop()
+                continue
+            left = lefts[i]
+            right = rights[i]
+            if kinds[i] == ATOM:
+                hashes[i] = sha256(b"\1" + atom_bytes[left:right]).digest()
+                todo.pop()
+            elif left in hashes and right in hashes:
+                hashes[i] = sha256(b"\2" + hashes[left] + hashes[right]).digest()
+                todo.pop()
+            else:
+                todo.append(right)
+                todo.append(left)
+        return hashes[index]
+
+
+class ArenaNode:
+    """
+    `ArenaNode` is a view of a node in an `Arena` that implements the CLVM
+    object protocol. The node is read from the arena when its `atom` or
+    `pair` is first used, and the views of its children are made then.
+    """
+
+    atom: typing.Optional[bytes]
+    pair: typing.Optional[typing.Tuple[CLVMStorage, CLVMStorage]]
+    # `atom` and `pair` are unset until the node is read, which sends reads
+    # of them to `__getattr__` once
+    __slots__ = ["atom", "pair", "arena", "index"]
+
+    def __init__(self, arena: Arena, index: int) -> None:
+        self.arena = arena
+        self.index = index
+
+    def __getattr__(self, name: str) -> typing.Any:
+        if name not in ("atom", "pair"):
+            raise AttributeError(name)
+        arena = self.arena
+        index = self.index
+        if arena.kinds[index] == PAIR:
+            self.pair = (ArenaNode(arena, arena.lefts[index]), ArenaNode(arena, arena.rights[index]))
+            self.atom = None
+        else:
+            self.atom = bytes(arena.atom_bytes[arena.lefts[index]:arena.rights[index]])
+            self.pair = None
+        return getattr(self, name)
@@ -0,0 +1,123 @@
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+from .CLVMObject import CLVMStorage
+from .EvalError import EvalError
+from .SExp import SExp
+from .operators import OPERATOR_LOOKUP, OperatorDict
+from .serialize import sexp_from_stream, sexp_to_bytearray, to_clvm_object
+from .storage_interpreter import StorageInterpreter
+
+# results are only sent back to the parent process, so they aren't subject to
+# the usual limit on the size of serialized objects
+MAX_RESULT_BYTES = 1 << 34
+
+BatchResult = Union[Tuple[int, SExp], EvalError]
+
+# what a worker sends back for each item: `(True, cost, result)` or
+# `(False, error message, serialized sexp attached to the error)`
+SerializedResult = Tuple[bool, Union[int, str], bytes]
+
+_worker_interpreter: Optional[StorageInterpreter] = None
+
+
+def default_operator_lookup() -> OperatorDict:
+    return OPERATOR_LOOKUP
+
+
+def _init_worker(operator_lookup_factory: Callable[[], OperatorDict]) -> None:
+    global _worker_interpreter
+    _worker_interpreter = StorageInterpreter(operator_lookup_factory())
+
+
+def _serialize(sexp: CLVMStorage) -> bytes:
+    return bytes(sexp_to_bytearray(sexp, max_size=MAX_RESULT_BYTES))
+
+
+def _run_serialized(item: Tuple[bytes, bytes, Optional[int]]) -> SerializedResult:
+    assert _worker_interpreter is not None
+    program_blob, args_blob, max_cost = item
+    program = sexp_from_stream(io.BytesIO(program_blob), to_clvm_object)
+    args = sexp_from_stream(io.BytesIO(args_blob), to_clvm_object)
+    try:
+        cost, r = _worker_interpreter.run(program, args, max_cost)
+    except EvalError as e:
+        # `EvalError` can't be pickled, since its constructor takes the sexp
+        return (False, str(e), _serialize(e._sexp))
+    return (True, cost, _serialize(r))
+
+
+def _deserialize_result(result: SerializedResult) -> BatchResult:
+    ok, v, blob = result
+    sexp = sexp_from_stream(io.BytesIO(blob), SExp.to)
+    if ok:
+        assert isinstance(v, int)
+        return (v, sexp)
+    assert isinstance(v, str)
+    return EvalError(v, sexp)
+
+
+class BatchRunner:
+    """
+    `BatchRunner` runs many independent programs in a pool of worker
+    processes. Programs and arguments are shipped to the workers in
+    serialized form, and each worker keeps an interpreter for the operator
+    table returned by `operator_lookup_factory`, so it's only built once per
+    worker. `operator_lookup_factory` must be picklable, i.e. a module level
+    function.
+
+    The pool is kept around until `close` is called (or the `with` block is
+    left), so it can be reused for many batches.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        operator_lookup_factory: Callable[[], OperatorDict] = default_operator_lookup,
+        chunksize: int = 16,
+    ) -> None:
+        self.chunksize = chunksize
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(operator_lookup_factory,),
+        )
+
+    def run(
+        self,
+        items: Iterable[Tuple[CLVMStorage, CLVMStorage]],
+        max_cost: Optional[int] = None,
+    ) -> List[BatchResult]:
+        """
+        Run each `(program, args)` pair. The results are in the same order as
+        `items`, and each is either `(cost, result)` or the `EvalError`
+        raised by the program. Any other exception is re-raised.
+        """
+        serialized = [(_serialize(program), _serialize(args), max_cost) for program, args in items]
+        results = self.executor.map(_run_serialized, serialized, chunksize=self.chunksize)
+        return [_deserialize_result(_) for _ in results]
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def __enter__(self) -> "BatchRunner":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+def run_program_batch(
+    items: Iterable[Tuple[CLVMStorage, CLVMStorage]],
+    max_cost: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    operator_lookup_factory: Callable[[], OperatorDict] = default_operator_lookup,
+    chunksize: int = 16,
+) -> List[BatchResult]:
+    """
+    Run a batch of independent `(program, args)` pairs across `max_workers`
+    processes. See `BatchRunner.run`.
+    """
+    with BatchRunner(max_workers, operator_lookup_factory, chunksize) as runner:
+        return runner.run(items, max_cost)
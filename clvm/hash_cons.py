@@ -0,0 +1,100 @@
+import typing
+
+from .CLVMObject import CLVMObject, CLVMStorage
+from .serialize import BufferAtom
+
+
+class HashConser:
+    """
+    `HashConser` builds trees in which structurally identical subtrees are
+    the same object ("hash consing"). That saves memory when subtrees repeat,
+    as they do a lot in block generators, and `ObjectCache` visits a shared
+    subtree only once.
+
+    Pass it as the `to_sexp` of the parsers, or as `hash_cons` to `SExp.to`,
+    or dedupe an existing tree with `intern`. Trees built with the same
+    `HashConser` share subtrees with each other.
+
+    Atoms are looked up by value, and pairs by the identity of their
+    children, which are already deduped, so nothing is hashed but atoms.
+    When it's called with a pair directly, both children must have been
+    made by this `HashConser`.
+
+    Every node made is kept alive by the `HashConser`, so drop it (or `clear`
+    it) once no more trees are going to be built with it.
+    """
+
+    def __init__(self) -> None:
+        self._atoms: typing.Dict[bytes, CLVMObject] = {}
+        # keyed by the pair itself. `CLVMObject` hashes and compares by
+        # identity, so this is the identity of the children, and needs no
+        # more memory than the pair already takes
+        self._pairs: typing.Dict[typing.Tuple[CLVMStorage, CLVMStorage], CLVMObject] = {}
+        # the number of nodes asked for, including the repeats
+        self.node_count = 0
+
+    def __len__(self) -> int:
+        """
+        The number of distinct nodes made.
+        """
+        return len(self._atoms) + len(self._pairs)
+
+    @property
+    def dedup_ratio(self) -> float:
+        """
+        The number of nodes asked for over the number of distinct nodes made.
+        """
+        return self.node_count / len(self) if len(self) else 1.0
+
+    def clear(self) -> None:
+        self._atoms.clear()
+        self._pairs.clear()
+        self.node_count = 0
+
+    def __call__(
+        self, v: typing.Union[CLVMStorage, bytes, typing.Tuple[CLVMStorage, CLVMStorage]]
+    ) -> CLVMStorage:
+        if isinstance(v, tuple):
+            self.node_count += 1
+            r = self._pairs.get(v)
+            if r is None:
+                r = self._pairs[v] = CLVMObject(v)
+            return r
+        if isinstance(v, BufferAtom):
+            # atoms parsed with `zero_copy` are deduped like any other
+            assert v.atom is not None
+            v = v.atom
+        if isinstance(v, bytes):
+            self.node_count += 1
+            r = self._atoms.get(v)
+            if r is None:
+                r = self._atoms[v] = CLVMObject(v)
+            return r
+        return v
+
+    def intern(self, obj: CLVMStorage) -> CLVMStorage:
+        """
+        Return a tree equal to `obj` made by this `HashConser`.
+        """
+        interned: typing.Dict[int, CLVMStorage] = {}
+        todo = [obj]
+        while todo:
+            node = todo[-1]
+            if id(node) in interned:
+                todo.pop()
+                continue
+            pair = node.pair
+            if pair is None:
+                assert node.atom is not None
+                interned[id(node)] = self(node.atom)
+                todo.pop()
+                continue
+            left = interned.get(id(pair[0]))
+            right = interned.get(id(pair[1]))
+            if left is None or right is None:
+                todo.append(pair[1])
+                todo.append(pair[0])
+                continue
+            interned[id(node)] = self((left, right))
+            todo.pop()
+        return interned[id(obj)]
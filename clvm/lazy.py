@@ -0,0 +1,86 @@
+import mmap
+import typing
+
+from .CLVMObject import CLVMStorage
+from .serialize import BufferType, CONS_BOX_MARKER, _IndexableType, _atom_span
+
+
+def _skip_sexp(data: _IndexableType, offset: int) -> int:
+    # return the offset just past the object starting at `offset`
+    end = len(data)
+    to_skip = 1
+    while to_skip:
+        if offset >= end:
+            raise ValueError("bad encoding")
+        if data[offset] == CONS_BOX_MARKER:
+            offset += 1
+            to_skip += 1
+        else:
+            offset = _atom_span(data, offset)[1]
+            to_skip -= 1
+    return offset
+
+
+class LazyCLVMObject:
+    """
+    `LazyCLVMObject` implements the CLVM object protocol on top of a
+    serialized object (without back references), and only decodes a node
+    when its `atom` or `pair` is first read. This makes looking at a few
+    paths of a large program or solution much cheaper than parsing all of it.
+
+    Encoding errors are raised as `ValueError` when the broken node is
+    decoded, rather than up front.
+    """
+
+    atom: typing.Optional[bytes]
+    pair: typing.Optional[typing.Tuple[CLVMStorage, CLVMStorage]]
+    # `atom` and `pair` are unset until the node is decoded, which sends reads
+    # of them to `__getattr__` once
+    __slots__ = ["atom", "pair", "_data", "_offset"]
+
+    def __init__(self, buf: BufferType, offset: int = 0) -> None:
+        # indexing and slicing `bytes` (or `mmap`) directly is faster, and its
+        # slices are already `bytes`
+        if isinstance(buf, (bytes, mmap.mmap)):
+            self._data: _IndexableType = buf
+        else:
+            view = memoryview(buf)
+            if view.format != "B" or view.ndim != 1:
+                view = view.cast("B")
+            self._data = view
+        self._offset = offset
+
+    @classmethod
+    def _child(cls, parent: "LazyCLVMObject", offset: int) -> "LazyCLVMObject":
+        self = cls.__new__(cls)
+        self._data = parent._data
+        self._offset = offset
+        return self
+
+    def __getattr__(self, name: str) -> typing.Any:
+        if name not in ("atom", "pair"):
+            raise AttributeError(name)
+        self._decode()
+        return getattr(self, name)
+
+    def _decode(self) -> None:
+        data = self._data
+        offset = self._offset
+        if offset >= len(data):
+            raise ValueError("bad encoding")
+        if data[offset] == CONS_BOX_MARKER:
+            left = self._child(self, offset + 1)
+            right = self._child(self, _skip_sexp(data, offset + 1))
+            self.pair = (left, right)
+            self.atom = None
+        else:
+            start, end = _atom_span(data, offset)
+            atom = data[start:end]
+            self.atom = atom if isinstance(atom, bytes) else bytes(atom)
+            self.pair = None
+
+    def end_offset(self) -> int:
+        """
+        Return the offset just past this object in the buffer.
+        """
+        return _skip_sexp(self._data, self._offset)
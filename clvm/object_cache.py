@@ -1,11 +1,20 @@
+from collections import OrderedDict
 from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar
 
 import hashlib
+import sys
 
-from .CLVMObject import CLVMStorage
+from .CLVMObject import CLVMStorage, HashedCLVMObject
 
 T = TypeVar("T")
 
+# the hashes of short atoms are memoized, as they repeat a lot (small ints,
+# operators, nil). The memo is cleared when it has `ATOM_HASH_MEMO_SIZE`
+# entries, which bounds it at under 1 MiB
+MAX_MEMO_ATOM = 64
+ATOM_HASH_MEMO_SIZE = 4096
+_atom_hashes: Dict[bytes, bytes] = {}
+
 
 class ObjectCache(Generic[T]):
     """
@@ -57,22 +66,185 @@ class ObjectCache(Generic[T]):
         return id(obj) in self.lookup
 
 
+# the memory an entry of a `BoundedObjectCache` takes besides its value: the
+# key, the `(value, node)` tuple and the ordered dict's own entry
+ENTRY_OVERHEAD = 200
+
+
+class BoundedObjectCache(ObjectCache[T]):
+    """
+    `BoundedObjectCache` is an `ObjectCache` that holds at most `maxsize`
+    entries, and at most `max_bytes` of them if that's given, evicting the
+    least recently used ones. It can be kept, and shared by many
+    computations, in a long running process.
+
+    Entries are keyed by `id()`, and, like `ObjectCache`, each one keeps its
+    node alive, so the id can't be reused by another object while the entry
+    is there. Evicting the entry releases the node. `nbytes` estimates the
+    memory the entries take, not counting the nodes.
+
+    Values computed during one `get` are all kept until it returns, whatever
+    the bound, so `f` always finds the values of the children it needs.
+    """
+
+    def __init__(
+        self,
+        f: Callable[["ObjectCache[T]", CLVMStorage], Optional[T]],
+        maxsize: int = 65536,
+        max_bytes: Optional[int] = None,
+    ):
+        super().__init__(f)
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lru: "OrderedDict[int, Tuple[T, CLVMStorage]]" = OrderedDict()
+        self.lookup = self._lru
+        # the values computed by the `get` in progress
+        self._pending: Dict[int, Tuple[T, CLVMStorage]] = {}
+        self._computing = False
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def clear(self) -> None:
+        self._lru.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def cache_info(self) -> Dict[str, int]:
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            maxsize=self.maxsize,
+            currsize=len(self._lru),
+            nbytes=self.nbytes,
+        )
+
+    def contains(self, obj: CLVMStorage) -> bool:
+        obj_id = id(obj)
+        return obj_id in self._pending or obj_id in self._lru
+
+    def get(self, obj: CLVMStorage) -> T:
+        obj_id = id(obj)
+        pending = self._pending
+        lru = self._lru
+        if self._computing:
+            # `f` asking for the value of a child
+            entry = pending.get(obj_id)
+            if entry is None:
+                entry = lru[obj_id]
+            return entry[0]
+
+        entry = lru.get(obj_id)
+        if entry is not None:
+            self.hits += 1
+            lru.move_to_end(obj_id)
+            return entry[0]
+
+        self.misses += 1
+        self._computing = True
+        try:
+            obj_list = [obj]
+            while obj_list:
+                node = obj_list.pop()
+                node_id = id(node)
+                if node_id in pending:
+                    continue
+                if node_id in lru:
+                    lru.move_to_end(node_id)
+                    continue
+                v = self.f(self, node)
+                if v is None:
+                    if node.pair is None:
+                        raise ValueError("f returned None for atom", node)
+                    obj_list.append(node)
+                    obj_list.append(node.pair[0])
+                    obj_list.append(node.pair[1])
+                else:
+                    pending[node_id] = (v, node)
+            r = pending[obj_id][0]
+            for node_id, entry in pending.items():
+                self._add(node_id, entry)
+        finally:
+            pending.clear()
+            self._computing = False
+        return r
+
+    def _add(self, obj_id: int, entry: Tuple[T, CLVMStorage]) -> None:
+        lru = self._lru
+        lru[obj_id] = entry
+        self.nbytes += sys.getsizeof(entry[0]) + ENTRY_OVERHEAD
+        max_bytes = self.max_bytes
+        while len(lru) > self.maxsize or (max_bytes is not None and self.nbytes > max_bytes):
+            value = lru.popitem(last=False)[1][0]
+            self.nbytes -= sys.getsizeof(value) + ENTRY_OVERHEAD
+            self.evictions += 1
+
+
+def atom_hash(atom: bytes) -> bytes:
+    """
+    The sha256 tree hash of an atom.
+    """
+    if len(atom) > MAX_MEMO_ATOM:
+        return hashlib.sha256(b"\1" + atom).digest()
+    r = _atom_hashes.get(atom)
+    if r is None:
+        if len(_atom_hashes) >= ATOM_HASH_MEMO_SIZE:
+            _atom_hashes.clear()
+        r = _atom_hashes[bytes(atom)] = hashlib.sha256(b"\1" + atom).digest()
+    return r
+
+
 def treehash(cache: ObjectCache[bytes], obj: CLVMStorage) -> Optional[bytes]:
     """
     This function can be fed to `ObjectCache` to calculate the sha256 tree
     hash for all objects in a tree.
+
+    The hash of a `HashedCLVMObject` is saved on it, and used without looking
+    at its children from then on.
     """
+    hashed = obj if isinstance(obj, HashedCLVMObject) else None
+    if hashed is not None and hashed.tree_hash is not None:
+        return hashed.tree_hash
     if obj.pair:
         left, right = obj.pair
 
         # ensure both `left` and `right` have cached values
-        if cache.contains(left) and cache.contains(right):
-            left_hash = cache.get(left)
-            right_hash = cache.get(right)
-            return hashlib.sha256(b"\2" + left_hash + right_hash).digest()
-        return None
-    assert obj.atom is not None
-    return hashlib.sha256(b"\1" + obj.atom).digest()
+        if not (cache.contains(left) and cache.contains(right)):
+            return None
+        left_hash = cache.get(left)
+        right_hash = cache.get(right)
+        r = hashlib.sha256(b"\2" + left_hash + right_hash).digest()
+    else:
+        assert obj.atom is not None
+        r = atom_hash(obj.atom)
+    if hashed is not None:
+        hashed.tree_hash = r
+    return r
+
+
+def _serialized_atom_length(size: int, first_byte: int) -> int:
+    # the serialized length of an atom of `size` bytes starting with
+    # `first_byte`, which only matters when `size` is 1
+    if size == 0 or (size == 1 and first_byte < 128):
+        return 1
+    if size < 0x40:
+        return 1 + size
+    if size < 0x2000:
+        return 2 + size
+    if size < 0x100000:
+        return 3 + size
+    if size < 0x8000000:
+        return 4 + size
+    if size < 0x400000000:
+        return 5 + size
+    raise ValueError("atom of size %d too long" % size)
 
 
 def serialized_length(cache: ObjectCache[int], obj: CLVMStorage) -> Optional[int]:
@@ -89,18 +261,54 @@ def serialized_length(cache: ObjectCache[int], obj: CLVMStorage) -> Optional[int
             right_length = cache.get(right)
             return 1 + left_length + right_length
         return None
-    assert obj.atom is not None
-    lb = len(obj.atom)
-    if lb == 0 or (lb == 1 and obj.atom[0] < 128):
-        return 1
-    if lb < 0x40:
-        return 1 + lb
-    if lb < 0x2000:
-        return 2 + lb
-    if lb < 0x100000:
-        return 3 + lb
-    if lb < 0x8000000:
-        return 4 + lb
-    if lb < 0x400000000:
-        return 5 + lb
-    raise ValueError("atom of size %d too long" % lb)
+    atom = obj.atom
+    assert atom is not None
+    return _serialized_atom_length(len(atom), atom[0] if atom else 0)
+
+
+# the metrics computed by `tree_metrics`:
+# (tree hash, serialized length, node count, depth, atom bytes)
+# where the node count includes atoms and pairs, and an atom has depth 0
+TreeMetrics = Tuple[bytes, int, int, int, int]
+
+
+def tree_metrics(cache: ObjectCache[TreeMetrics], obj: CLVMStorage) -> Optional[TreeMetrics]:
+    """
+    This function can be fed to `ObjectCache` to calculate several metrics
+    for all objects in a tree in a single pass, which is cheaper than an
+    `ObjectCache` for each. See `TreeMetrics`.
+
+    Like `treehash`, this saves the hash of a `HashedCLVMObject` on it, and
+    uses it rather than hashing again.
+    """
+    hashed = obj if isinstance(obj, HashedCLVMObject) else None
+    if obj.pair:
+        left, right = obj.pair
+
+        # ensure both `left` and `right` have cached values
+        if not (cache.contains(left) and cache.contains(right)):
+            return None
+        left_metrics = cache.get(left)
+        right_metrics = cache.get(right)
+        if hashed is not None and hashed.tree_hash is not None:
+            tree_hash = hashed.tree_hash
+        else:
+            tree_hash = hashlib.sha256(b"\2" + left_metrics[0] + right_metrics[0]).digest()
+        r = (
+            tree_hash,
+            1 + left_metrics[1] + right_metrics[1],
+            1 + left_metrics[2] + right_metrics[2],
+            1 + max(left_metrics[3], right_metrics[3]),
+            left_metrics[4] + right_metrics[4],
+        )
+    else:
+        atom = obj.atom
+        assert atom is not None
+        if hashed is not None and hashed.tree_hash is not None:
+            tree_hash = hashed.tree_hash
+        else:
+            tree_hash = atom_hash(atom)
+        r = (tree_hash, _serialized_atom_length(len(atom), atom[0] if atom else 0), 1, 0, len(atom))
+    if hashed is not None:
+        hashed.tree_hash = tree_hash
+    return r
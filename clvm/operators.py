@@ -1,6 +1,18 @@
 from __future__ import annotations
 
-from typing import Dict, Iterator, Optional, Protocol, Tuple, Type, TypeVar, overload
+from functools import lru_cache
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+    Type,
+    TypeVar,
+    overload,
+)
 
 from . import core_ops, more_ops
 
@@ -102,11 +114,18 @@ def args_len(op_name: str, args: SExp) -> Iterator[int]:
 # fatal errors if the arguments passed are not atoms.
 
 
-def default_unknown_op(op: bytes, args: SExp) -> Tuple[int, SExp]:
+@lru_cache(maxsize=1024)
+def unknown_op_cost_function(op: bytes) -> Tuple[int, int]:
+    """
+    Decode the cost function and cost multiplier of an unknown opcode. This
+    only depends on the opcode, so it's memoized per opcode.
+
+    Raises `ValueError` if the opcode is reserved or invalid.
+    """
     # any opcode starting with ffff is reserved (i.e. fatal error)
     # opcodes are not allowed to be empty
     if len(op) == 0 or op[:2] == b"\xff\xff":
-        raise EvalError("reserved operator", args.to(op))
+        raise ValueError("reserved operator")
 
     # all other unknown opcodes are no-ops
     # the cost of the no-ops is determined by the opcode number, except the
@@ -116,9 +135,17 @@ def default_unknown_op(op: bytes, args: SExp) -> Tuple[int, SExp]:
     # the multiplier cannot be 0. it starts at 1
 
     if len(op) > 5:
-        raise EvalError("invalid operator", args.to(op))
+        raise ValueError("invalid operator")
 
     cost_multiplier = int.from_bytes(op[:-1], "big", signed=False) + 1
+    return cost_function, cost_multiplier
+
+
+def default_unknown_op(op: bytes, args: SExp) -> Tuple[int, SExp]:
+    try:
+        cost_function, cost_multiplier = unknown_op_cost_function(op)
+    except ValueError as e:
+        raise EvalError(str(e), args.to(op)) from None
 
     # 0 = constant
     # 1 = like op_add/op_sub
@@ -189,6 +216,10 @@ class OperatorDict(Dict[bytes, OperatorProtocol]):
     unknown_op_handler: UnknownOperatorProtocol
     quote_atom: bytes
     apply_atom: bytes
+    # bumped by every method that mutates the dict, so callers that derive
+    # something from its contents can tell when to derive it again
+    version: int
+    _dispatch_table: Optional[List[Optional[OperatorProtocol]]]
 
     @overload
     def __new__(
@@ -236,11 +267,68 @@ class OperatorDict(Dict[bytes, OperatorProtocol]):
             self.apply_atom = apply
 
         self.unknown_op_handler = unknown_op_handler
+        # the dict is filled in by `dict.__init__` after this, so the dispatch
+        # table can't be built yet
+        self._dispatch_table = None
+        self.version = 0
+
+        return self
 
+    def _build_dispatch_table(self) -> List[Optional[OperatorProtocol]]:
+        # most opcodes are single byte atoms, which we look up by index rather
+        # than by hashing the opcode. The table is built on first use and
+        # dropped by every method that mutates the dict
+        table: List[Optional[OperatorProtocol]] = [None] * 256
+        for op, f in self.items():
+            if isinstance(op, bytes) and len(op) == 1:
+                table[op[0]] = f
+        self._dispatch_table = table
+        return table
+
+    def _changed(self) -> None:
+        self._dispatch_table = None
+        self.version += 1
+
+    def __setitem__(self, op: bytes, f: OperatorProtocol) -> None:
+        super().__setitem__(op, f)
+        self._changed()
+
+    def __delitem__(self, op: bytes) -> None:
+        super().__delitem__(op)
+        self._changed()
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def __ior__(self: _T_OperatorDict, other: Any) -> _T_OperatorDict:  # type: ignore[override,misc]
+        self.update(other)
         return self
 
+    def setdefault(self, op: bytes, default: OperatorProtocol) -> OperatorProtocol:
+        self._changed()
+        return super().setdefault(op, default)
+
+    def pop(self, op: bytes, *args: Any) -> Any:
+        self._changed()
+        return super().pop(op, *args)
+
+    def popitem(self) -> Tuple[bytes, OperatorProtocol]:
+        self._changed()
+        return super().popitem()
+
+    def clear(self) -> None:
+        super().clear()
+        self._changed()
+
     def __call__(self, op: bytes, arguments: SExp) -> Tuple[int, SExp]:
-        f = self.get(op)
+        if len(op) == 1:
+            table = self._dispatch_table
+            if table is None:
+                table = self._build_dispatch_table()
+            f = table[op[0]]
+        else:
+            f = self.get(op)
         if f is None:
             return self.unknown_op_handler(op, arguments)
         else:
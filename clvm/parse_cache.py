@@ -0,0 +1,81 @@
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from .CLVMObject import CLVMStorage
+from .serialize import sexp_from_buffer, to_clvm_object
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+class ParseCache:
+    """
+    `ParseCache` parses serialized objects, keeping the parsed trees in an LRU
+    cache keyed by the SHA-256 digest of the serialized bytes, so the same
+    bytes received over and over are only parsed once.
+
+    The cache is bounded by the total length of the serialized objects it
+    holds, `max_bytes`. An object longer than that is parsed but not cached.
+    The parsed trees take several times as much memory as their serialized
+    form, which should be allowed for when choosing `max_bytes`.
+
+    The same tree is returned to every caller that passes the same bytes, so
+    the cache assumes callers never change the trees it returns. Nothing
+    stops them: the `atom` and `pair` of a `CLVMObject` can be assigned. Like
+    `sexp_from_bytes`, anything after the object is ignored, but it's still
+    part of the key.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, *, allow_backrefs: bool = False):
+        self.max_bytes = max_bytes
+        self.allow_backrefs = allow_backrefs
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.currbytes = 0
+        # digest -> (parsed tree, serialized length)
+        self._lru: "OrderedDict[bytes, Tuple[CLVMStorage, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def clear(self) -> None:
+        self._lru.clear()
+        self.currbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def cache_info(self) -> Dict[str, int]:
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            maxbytes=self.max_bytes,
+            currbytes=self.currbytes,
+            currsize=len(self._lru),
+        )
+
+    def parse(self, blob: bytes) -> CLVMStorage:
+        """
+        Return the object serialized in `blob`, parsing it only if the same
+        bytes aren't in the cache.
+        """
+        key = hashlib.sha256(blob).digest()
+        entry = self._lru.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._lru.move_to_end(key)
+            return entry[0]
+
+        self.misses += 1
+        obj = sexp_from_buffer(blob, to_clvm_object, allow_backrefs=self.allow_backrefs)[0]
+        size = len(blob)
+        if size > self.max_bytes:
+            return obj
+        self._lru[key] = (obj, size)
+        self.currbytes += size
+        while self.currbytes > self.max_bytes:
+            self.currbytes -= self._lru.popitem(last=False)[1][1]
+            self.evictions += 1
+        return obj
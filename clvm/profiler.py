@@ -0,0 +1,117 @@
+import time
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from .CLVMObject import CLVMObject, CLVMStorage
+from .EvalError import EvalError
+from .SExp import SExp
+from .object_cache import BoundedObjectCache, treehash
+from .operators import OperatorDict
+from .run_program import Interpreter, OpStackType, ValStackType
+
+# a stack of frames, outermost first. Each frame is the tree hash of a program
+StackType = Tuple[bytes, ...]
+
+
+class Profiler:
+    """
+    `Profiler` runs programs like `run_program` does, and charges the cost and
+    wall time of every step to the stack of programs being evaluated at that
+    point. The program passed to `run_program` is the outermost frame, and
+    every program run by the `a` operator pushes a new frame, so frames
+    correspond to functions (or inline puzzles) of the program.
+
+    Frames are identified by the tree hash of the program, and can be given
+    readable names with `names`. The results can be written in the collapsed
+    stack format read by flame graph tools.
+    """
+
+    def __init__(
+        self,
+        operator_lookup: OperatorDict,
+        names: Optional[Dict[bytes, str]] = None,
+    ) -> None:
+        self.interpreter = Interpreter(operator_lookup)
+        self.names: Dict[bytes, str] = dict(names or {})
+        self.cost: Dict[StackType, int] = {}
+        self.time: Dict[StackType, float] = {}
+        self.hash_cache = BoundedObjectCache(treehash)
+
+    def clear(self) -> None:
+        self.cost.clear()
+        self.time.clear()
+
+    def run_program(
+        self,
+        program: CLVMStorage,
+        args: CLVMStorage,
+        max_cost: Optional[int] = None,
+    ) -> Tuple[int, SExp]:
+        eval_op = self.interpreter.eval_op
+        apply_op = self.interpreter.apply_op
+        apply_atom = self.interpreter.operator_lookup.apply_atom
+        perf_counter = time.perf_counter
+        costs = self.cost
+        times = self.time
+
+        _program = SExp.to(program)
+        stack: StackType = (self.hash_cache.get(_program),)
+
+        def pop_frame(op_stack: OpStackType, value_stack: ValStackType) -> int:
+            nonlocal stack
+            stack = stack[:-1]
+            return 0
+
+        op_stack: OpStackType = [eval_op]
+        value_stack: ValStackType = [SExp(CLVMObject((_program, SExp.to(args))))]
+        cost: int = 0
+
+        while op_stack:
+            f = op_stack.pop()
+            current = stack
+            is_apply = f is apply_op and value_stack[-2].atom == apply_atom
+
+            start = perf_counter()
+            c = f(op_stack, value_stack)
+            elapsed = perf_counter() - start
+
+            costs[current] = costs.get(current, 0) + c
+            times[current] = times.get(current, 0.0) + elapsed
+            cost += c
+
+            if is_apply:
+                # `a` left `(program . args)` on the value stack, and an eval
+                # op on top of the op stack. The frame lasts until that eval
+                # op and everything it pushes are done
+                pair = value_stack[-1].pair
+                assert pair is not None
+                stack = stack + (self.hash_cache.get(pair[0]),)
+                op_stack.insert(len(op_stack) - 1, pop_frame)
+
+            if max_cost and cost > max_cost:
+                raise EvalError("cost exceeded", _program.to(max_cost))
+        return cost, value_stack[-1]
+
+    def frame_name(self, frame: bytes) -> str:
+        return self.names.get(frame, frame.hex())
+
+    def collapsed_stacks(self, metric: str = "cost") -> List[str]:
+        """
+        Return one line per stack, `frame;frame;frame value`, where value is
+        the cost, or the time in microseconds if `metric` is "time".
+        """
+        if metric == "cost":
+            values = dict(self.cost)
+        elif metric == "time":
+            values = {k: round(v * 1e6) for k, v in self.time.items()}
+        else:
+            raise ValueError("unknown metric %r" % metric)
+        return [
+            "%s %d" % (";".join(self.frame_name(_) for _ in stack), value)
+            for stack, value in sorted(values.items())
+            if value > 0
+        ]
+
+    def write_collapsed(self, f: TextIO, metric: str = "cost") -> None:
+        for line in self.collapsed_stacks(metric):
+            f.write(line)
+            f.write("\n")
@@ -0,0 +1,308 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .CLVMObject import CLVMObject, CLVMStorage
+from .EvalError import EvalError
+from .SExp import SExp
+from .object_cache import ObjectCache, treehash
+from .operators import OperatorDict
+from .run_program import msb_mask
+
+from .costs import (
+    APPLY_COST,
+    QUOTE_COST,
+    PATH_LOOKUP_BASE_COST,
+    PATH_LOOKUP_COST_PER_LEG,
+    PATH_LOOKUP_COST_PER_ZERO_BYTE,
+)
+
+# A compiled program is a callable that runs on the same kind of op stack as
+# `run_program`. When it's popped off the op stack, the environment it should
+# be evaluated in is on top of the op stack. It pops the environment and
+# either pushes its result on the value stack, or pushes more ops that will.
+# It returns the cost to charge, just like the ops in `run_program`.
+OpStackType = List[Any]
+ValStackType = List[CLVMStorage]
+CompiledProgram = Callable[[OpStackType, ValStackType], int]
+
+NULL = SExp.null()
+
+
+def path_legs(b: bytes) -> Tuple[int, Optional[Tuple[int, ...]]]:
+    """
+    Decode a path atom into its lookup cost and the sequence of legs to follow
+    from the environment (0 for first, 1 for rest). `None` means the path
+    evaluates to nil. The cost matches `traverse_path` in `run_program`.
+    """
+    cost = PATH_LOOKUP_BASE_COST
+    cost += PATH_LOOKUP_COST_PER_LEG
+    if len(b) == 0:
+        return cost, None
+
+    end_byte_cursor = 0
+    while end_byte_cursor < len(b) and b[end_byte_cursor] == 0:
+        end_byte_cursor += 1
+
+    cost += end_byte_cursor * PATH_LOOKUP_COST_PER_ZERO_BYTE
+    if end_byte_cursor == len(b):
+        return cost, None
+
+    end_bitmask = msb_mask(b[end_byte_cursor])
+
+    legs = []
+    byte_cursor = len(b) - 1
+    bitmask = 0x01
+    while byte_cursor > end_byte_cursor or bitmask < end_bitmask:
+        legs.append(1 if b[byte_cursor] & bitmask else 0)
+        cost += PATH_LOOKUP_COST_PER_LEG
+        bitmask <<= 1
+        if bitmask == 0x100:
+            byte_cursor -= 1
+            bitmask = 0x01
+    return cost, tuple(legs)
+
+
+def cons_op(op_stack: OpStackType, value_stack: ValStackType) -> int:
+    v1 = value_stack.pop()
+    v2 = value_stack.pop()
+    value_stack.append(CLVMObject((v1, v2)))
+    return 0
+
+
+def _compile_path(node: CLVMStorage) -> CompiledProgram:
+    assert node.atom is not None
+    cost, legs = path_legs(node.atom)
+
+    if legs is None:
+
+        def eval_nil(op_stack: OpStackType, value_stack: ValStackType) -> int:
+            op_stack.pop()
+            value_stack.append(NULL)
+            return cost
+
+        return eval_nil
+
+    def eval_path(op_stack: OpStackType, value_stack: ValStackType) -> int:
+        env = op_stack.pop()
+        for leg in legs:
+            pair = env.pair
+            if pair is None:
+                raise EvalError("path into atom", SExp.to(env))
+            env = pair[leg]
+        value_stack.append(env)
+        return cost
+
+    return eval_path
+
+
+def _compile_quote(value: CLVMStorage) -> CompiledProgram:
+    def eval_quote(op_stack: OpStackType, value_stack: ValStackType) -> int:
+        op_stack.pop()
+        value_stack.append(value)
+        return QUOTE_COST
+
+    return eval_quote
+
+
+def _compile_raise(message: str, sexp: CLVMStorage) -> CompiledProgram:
+    # errors in the structure of a program are only reported if the program
+    # is actually evaluated, exactly like `run_program` does
+    def eval_raise(op_stack: OpStackType, value_stack: ValStackType) -> int:
+        raise EvalError(message, SExp.to(sexp))
+
+    return eval_raise
+
+
+class ProgramCache:
+    """
+    `ProgramCache` compiles programs into trees of closures that can be run
+    over and over without re-decoding operators, quotes or paths, and keeps
+    the compiled programs in an LRU cache keyed by tree hash.
+
+    Programs run by `ProgramCache.run_program` produce exactly the same cost,
+    result and errors as `clvm.run_program.run_program` with the same
+    `operator_lookup`. Operators are looked up in `operator_lookup` when they
+    are applied, so changes made to it are honoured, but `quote_atom` and
+    `apply_atom` are resolved when a program is compiled.
+
+    Programs created at run time and passed to the `a` operator are compiled
+    (and cached) as well.
+    """
+
+    def __init__(self, operator_lookup: OperatorDict, maxsize: int = 1024):
+        self.operator_lookup = operator_lookup
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[Tuple[bytes, bytes, bytes], CompiledProgram]" = OrderedDict()
+        # `a` is usually applied to the same program over and over, so also
+        # remember compiled programs by the identity of the underlying pair
+        # tuple (or atom), which survives re-wrapping in `SExp`. This keeps the
+        # object alive, so the id can't be reused.
+        self._by_id: Dict[int, Tuple[object, CompiledProgram]] = {}
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def clear(self) -> None:
+        self._lru.clear()
+        self._by_id.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def cache_info(self) -> Dict[str, int]:
+        return dict(
+            hits=self.hits, misses=self.misses, maxsize=self.maxsize, currsize=len(self._lru)
+        )
+
+    def compile(self, program: CLVMStorage) -> CompiledProgram:
+        identity: object = program.pair if program.pair is not None else program.atom
+        obj_id = id(identity)
+        by_id = self._by_id.get(obj_id)
+        if by_id is not None:
+            self.hits += 1
+            return by_id[1]
+
+        key = (
+            self.operator_lookup.quote_atom,
+            self.operator_lookup.apply_atom,
+            ObjectCache(treehash).get(program),
+        )
+        compiled = self._lru.get(key)
+        if compiled is None:
+            self.misses += 1
+            compiled = self._compile(program)
+            self._lru[key] = compiled
+            if len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+        else:
+            self.hits += 1
+            self._lru.move_to_end(key)
+
+        if len(self._by_id) >= self.maxsize:
+            self._by_id.clear()
+        self._by_id[obj_id] = (identity, compiled)
+        return compiled
+
+    def run_program(
+        self,
+        program: CLVMStorage,
+        args: CLVMStorage,
+        max_cost: Optional[int] = None,
+    ) -> Tuple[int, SExp]:
+        op_stack: OpStackType = [args, self.compile(program)]
+        value_stack: ValStackType = []
+        cost: int = 0
+
+        while op_stack:
+            f = op_stack.pop()
+            cost += f(op_stack, value_stack)
+            if max_cost and cost > max_cost:
+                raise EvalError("cost exceeded", SExp.to(max_cost))
+        return cost, SExp.to(value_stack[-1])
+
+    def _compile(self, program: CLVMStorage) -> CompiledProgram:
+        quote_atom = self.operator_lookup.quote_atom
+
+        # compile every node in an evaluated position, children first
+        compiled: Dict[int, CompiledProgram] = {}
+        todo: List[Tuple[CLVMStorage, bool]] = [(program, False)]
+        while todo:
+            node, children_done = todo.pop()
+            if id(node) in compiled:
+                continue
+            pair = node.pair
+            if pair is None:
+                compiled[id(node)] = _compile_path(node)
+                continue
+            operator, operand_list = pair
+            if operator.pair is not None or operator.atom == quote_atom:
+                compiled[id(node)] = self._compile_call(node, [], compiled)
+                continue
+
+            operands = []
+            while operand_list.pair is not None:
+                operands.append(operand_list.pair[0])
+                operand_list = operand_list.pair[1]
+            if operand_list.atom != b"":
+                compiled[id(node)] = _compile_raise("first of non-cons", operand_list)
+                continue
+
+            if children_done:
+                compiled[id(node)] = self._compile_call(node, operands, compiled)
+                continue
+            todo.append((node, True))
+            for operand in operands:
+                if id(operand) not in compiled:
+                    todo.append((operand, False))
+        return compiled[id(program)]
+
+    def _compile_call(
+        self,
+        node: CLVMStorage,
+        operands: List[CLVMStorage],
+        compiled: Dict[int, CompiledProgram],
+    ) -> CompiledProgram:
+        assert node.pair is not None
+        operator, operand_list = node.pair
+
+        if operator.pair is not None:
+            new_operator, must_be_nil = operator.pair
+            if new_operator.pair is not None or must_be_nil.atom != b"":
+                return _compile_raise("in ((X)...) syntax X must be lone atom", node)
+            assert new_operator.atom is not None
+            apply_op = self._make_apply_op(new_operator.atom)
+            operand_sexp = SExp.to(operand_list)
+
+            def eval_lone_atom(op_stack: OpStackType, value_stack: ValStackType) -> int:
+                op_stack.pop()
+                value_stack.append(operand_sexp)
+                op_stack.append(apply_op)
+                return APPLY_COST
+
+            return eval_lone_atom
+
+        if operator.atom == self.operator_lookup.quote_atom:
+            return _compile_quote(operand_list)
+
+        assert operator.atom is not None
+        apply_op = self._make_apply_op(operator.atom)
+        compiled_operands = [compiled[id(_)] for _ in operands]
+
+        # operands are evaluated last to first, just like in `run_program`
+        def eval_call(op_stack: OpStackType, value_stack: ValStackType) -> int:
+            env = op_stack.pop()
+            op_stack.append(apply_op)
+            value_stack.append(NULL)
+            for compiled_operand in compiled_operands:
+                op_stack.append(cons_op)
+                op_stack.append(env)
+                op_stack.append(compiled_operand)
+            return 1
+
+        return eval_call
+
+    def _make_apply_op(self, op: bytes) -> Callable[[OpStackType, ValStackType], int]:
+        if op == self.operator_lookup.apply_atom:
+
+            def apply_apply(op_stack: OpStackType, value_stack: ValStackType) -> int:
+                operand_list = SExp.to(value_stack.pop())
+                if operand_list.list_len() != 2:
+                    raise EvalError("apply requires exactly 2 parameters", operand_list)
+                assert operand_list.pair is not None
+                new_program, rest = operand_list.pair
+                assert rest.pair is not None
+                op_stack.append(rest.pair[0])
+                op_stack.append(self.compile(new_program))
+                return APPLY_COST
+
+            return apply_apply
+
+        operator_lookup = self.operator_lookup
+
+        def apply_operator(op_stack: OpStackType, value_stack: ValStackType) -> int:
+            additional_cost, r = operator_lookup(op, SExp.to(value_stack.pop()))
+            value_stack.append(r)
+            return additional_cost
+
+        return apply_operator
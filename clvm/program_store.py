@@ -0,0 +1,247 @@
+import mmap
+import os
+from typing import Dict, List, Optional, Tuple
+
+from .CLVMObject import CLVMObject, CLVMStorage
+from .object_cache import ObjectCache, serialized_length, treehash
+from .serialize import CONS_BOX_MARKER, _atom_span, _write_atom
+
+# A `ProgramStore` file is `MAGIC` followed by records. Each record is the tree
+# hash of the object it holds, the length of its body as 4 bytes, and the body,
+# which is the object serialized as usual, except that `REFERENCE` and an
+# 8 byte offset stand in for a subtree stored in the record at that offset
+MAGIC = b"clvmst01"
+HEADER_SIZE = 36
+REFERENCE = 0xFE
+REFERENCE_SIZE = 9
+
+# subtrees at least this big get a record of their own (unless they're on the
+# right spine of a record), so they can be shared
+MIN_RECORD_SIZE = 256
+
+# ops used by `ProgramStore._load`
+_READ = 0
+_CONS = 1
+_END_RECORD = 2
+
+
+class ProgramStore:
+    """
+    `ProgramStore` is a content-addressed store of CLVM objects, keyed by tree
+    hash, in a single append-only file.
+
+    Subtrees are deduplicated: a big subtree of an object gets a record of its
+    own, and any subtree that's already stored is saved as a reference to its
+    record, so objects that share code (like curried puzzles) share records.
+    A subtree of at least `min_record_size` bytes gets its own record if it's
+    the first of a pair. The rests of a list (or the arguments of an
+    operator) stay in the same record as the list, so a long list doesn't
+    become a chain of records, while its big items are shared.
+
+    Objects are read through a memory map of the file, and returned as trees
+    of `CLVMObject`, which can be passed to `run_program`. An index of the
+    records is built when the file is opened. A record left incomplete by a
+    crash is dropped then.
+
+    Records aren't checked against their hashes when they're read, so the
+    file must only be written by `ProgramStore`.
+    """
+
+    def __init__(self, path: str, min_record_size: int = MIN_RECORD_SIZE) -> None:
+        self.path = path
+        self.min_record_size = min_record_size
+        self.index: Dict[bytes, int] = {}
+        self._file = open(path, "a+b")
+        self._map: Optional[mmap.mmap] = None
+        try:
+            self._end = self._load_index()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _load_index(self) -> int:
+        f = self._file
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            f.write(MAGIC)
+            f.flush()
+            return len(MAGIC)
+        f.seek(0)
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("not a program store: %s" % self.path)
+
+        offset = len(MAGIC)
+        while offset + HEADER_SIZE <= size:
+            header = f.read(HEADER_SIZE)
+            body_size = int.from_bytes(header[32:], "big")
+            if offset + HEADER_SIZE + body_size > size:
+                break
+            self.index[header[:32]] = offset
+            offset += HEADER_SIZE + body_size
+            f.seek(offset)
+        if offset < size:
+            # a record was being written when we stopped
+            f.truncate(offset)
+        return offset
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self) -> "ProgramStore":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __contains__(self, tree_hash: object) -> bool:
+        return tree_hash in self.index
+
+    @property
+    def size(self) -> int:
+        """
+        The size of the file, in bytes.
+        """
+        return self._end
+
+    def put(self, obj: CLVMStorage) -> bytes:
+        """
+        Store `obj`, if it's not already stored, and return its tree hash.
+        """
+        hashes = ObjectCache(treehash)
+        lengths = ObjectCache(serialized_length)
+        tree_hash = hashes.get(obj)
+
+        # store records children first, as a record has to refer to records
+        # that are already written. `todo` holds (object, children stored)
+        todo: List[Tuple[CLVMStorage, bool]] = [(obj, False)]
+        while todo:
+            record, children_stored = todo.pop()
+            record_hash = hashes.get(record)
+            if record_hash in self.index:
+                continue
+            if children_stored:
+                self._append(record_hash, self._encode(record, hashes, lengths))
+                continue
+            todo.append((record, True))
+            for child in self._walk_record(record, hashes, lengths):
+                if hashes.get(child) not in self.index:
+                    todo.append((child, False))
+
+        self._file.flush()
+        return tree_hash
+
+    def _is_reference(
+        self, node: CLVMStorage, is_first: bool, hashes: ObjectCache[bytes], lengths: ObjectCache[int]
+    ) -> bool:
+        # whether `node`, inside a record, is stored as a reference rather
+        # than inline
+        length = lengths.get(node)
+        if is_first and length >= self.min_record_size:
+            return True
+        return length > REFERENCE_SIZE and hashes.get(node) in self.index
+
+    def _walk_record(
+        self, record: CLVMStorage, hashes: ObjectCache[bytes], lengths: ObjectCache[int]
+    ) -> List[CLVMStorage]:
+        # return the subtrees of `record` that are stored as references
+        references = []
+        todo = [(record, False)]
+        while todo:
+            node, is_first = todo.pop()
+            if node is not record and self._is_reference(node, is_first, hashes, lengths):
+                references.append(node)
+            elif node.pair is not None:
+                todo.append((node.pair[1], False))
+                todo.append((node.pair[0], True))
+        return references
+
+    def _encode(
+        self, record: CLVMStorage, hashes: ObjectCache[bytes], lengths: ObjectCache[int]
+    ) -> bytearray:
+        body = bytearray()
+        todo = [(record, False)]
+        while todo:
+            node, is_first = todo.pop()
+            if node is not record and self._is_reference(node, is_first, hashes, lengths):
+                body.append(REFERENCE)
+                body += self.index[hashes.get(node)].to_bytes(8, "big")
+            elif node.pair is not None:
+                body.append(CONS_BOX_MARKER)
+                todo.append((node.pair[1], False))
+                todo.append((node.pair[0], True))
+            else:
+                assert node.atom is not None
+                _write_atom(body, node.atom, 1 << 34)
+        return body
+
+    def _append(self, record_hash: bytes, body: bytearray) -> None:
+        self._file.write(record_hash + len(body).to_bytes(4, "big"))
+        self._file.write(body)
+        self.index[record_hash] = self._end
+        self._end += HEADER_SIZE + len(body)
+
+    def _data(self) -> mmap.mmap:
+        # a map of the whole file, remapped if it has grown
+        if self._map is None or len(self._map) < self._end:
+            self._file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def get(self, tree_hash: bytes) -> Optional[CLVMStorage]:
+        """
+        Return the object with the given tree hash, or `None` if it's not
+        stored.
+        """
+        offset = self.index.get(tree_hash)
+        if offset is None:
+            return None
+        return self._load(offset)
+
+    def _load(self, offset: int) -> CLVMStorage:
+        data = self._data()
+        # records referred to more than once are only loaded once, so the
+        # tree shares them like the stored object did
+        loaded: Dict[int, CLVMStorage] = {}
+        # the read position in each record being loaded, innermost last
+        cursors = [offset + HEADER_SIZE]
+        op_stack = [(_END_RECORD, offset), (_READ, 0)]
+        values: List[CLVMStorage] = []
+
+        while op_stack:
+            op, record_offset = op_stack.pop()
+            if op == _CONS:
+                right = values.pop()
+                values[-1] = CLVMObject((values[-1], right))
+                continue
+            if op == _END_RECORD:
+                cursors.pop()
+                loaded[record_offset] = values[-1]
+                continue
+
+            cursor = cursors[-1]
+            b = data[cursor]
+            if b == CONS_BOX_MARKER:
+                cursors[-1] = cursor + 1
+                op_stack.append((_CONS, 0))
+                op_stack.append((_READ, 0))
+                op_stack.append((_READ, 0))
+            elif b == REFERENCE:
+                cursors[-1] = cursor + REFERENCE_SIZE
+                record_offset = int.from_bytes(data[cursor + 1:cursor + REFERENCE_SIZE], "big")
+                if record_offset in loaded:
+                    values.append(loaded[record_offset])
+                else:
+                    cursors.append(record_offset + HEADER_SIZE)
+                    op_stack.append((_END_RECORD, record_offset))
+                    op_stack.append((_READ, 0))
+            else:
+                start, cursors[-1] = _atom_span(data, cursor)
+                values.append(CLVMObject(data[start:cursors[-1]]))
+
+        return values[0]
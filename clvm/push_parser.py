@@ -0,0 +1,132 @@
+import typing
+
+from .serialize import (
+    BACK_REFERENCE,
+    CONS_BOX_MARKER,
+    CS,
+    MAX_SAFE_BYTES,
+    MAX_SINGLE_BYTE,
+    ToCLVMStorage,
+    sexp_from_buffer,
+)
+
+
+def _atom_end(data: bytearray, offset: int) -> typing.Optional[int]:
+    # return the offset just past the atom at `offset`, or `None` if it isn't
+    # all in `data` yet
+    end = len(data)
+    b = data[offset]
+    if b == 0x80 or b <= MAX_SINGLE_BYTE:
+        return offset + 1
+    bit_count = 0
+    bit_mask = 0x80
+    while b & bit_mask:
+        bit_count += 1
+        b &= 0xFF ^ bit_mask
+        bit_mask >>= 1
+    if offset + bit_count > end:
+        return None
+    size = b
+    for i in range(1, bit_count):
+        size = (size << 8) | data[offset + i]
+    if size >= 0x400000000:
+        raise ValueError("blob too large")
+    offset += bit_count + size
+    return offset if offset <= end else None
+
+
+class PushParser(typing.Generic[CS]):
+    """
+    `PushParser` is an incremental parser for a stream of serialized objects
+    that doesn't do any I/O itself. Pass it data as it arrives with `feed`,
+    in chunks of any size, and it returns the objects completed by that
+    chunk (or their serialized form, with `feed_buffers`).
+
+    Only the object currently being received is buffered, and a `ValueError`
+    is raised if it grows past `max_size` bytes. The parser can't be used
+    after it has raised an error.
+    """
+
+    def __init__(
+        self,
+        to_sexp: ToCLVMStorage[CS],
+        *,
+        allow_backrefs: bool = False,
+        max_size: int = MAX_SAFE_BYTES,
+    ) -> None:
+        self.to_sexp = to_sexp
+        self.allow_backrefs = allow_backrefs
+        self.max_size = max_size
+        self._buffer = bytearray()
+        # how far into `_buffer` we've scanned, and how many more objects
+        # have to be read to finish the current one
+        self._offset = 0
+        self._to_read = 1
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of bytes buffered for an object that's not complete yet.
+        """
+        return len(self._buffer)
+
+    def feed_buffers(self, chunk: bytes) -> typing.List[bytes]:
+        """
+        Add `chunk` to the stream, and return the serialized form of each
+        object it completes.
+        """
+        buffer = self._buffer
+        buffer += chunk
+        allow_backrefs = self.allow_backrefs
+        offset = self._offset
+        to_read = self._to_read
+        end = len(buffer)
+        r = []
+
+        while offset < end:
+            b = buffer[offset]
+            if b == CONS_BOX_MARKER:
+                offset += 1
+                to_read += 1
+                continue
+            if allow_backrefs and b == BACK_REFERENCE:
+                if offset + 1 >= end:
+                    break
+                atom_end = _atom_end(buffer, offset + 1)
+            else:
+                atom_end = _atom_end(buffer, offset)
+            if atom_end is None:
+                break
+            offset = atom_end
+            to_read -= 1
+            if to_read == 0:
+                if offset > self.max_size:
+                    raise ValueError("SExp exceeds maximum size")
+                r.append(bytes(buffer[:offset]))
+                del buffer[:offset]
+                end -= offset
+                offset = 0
+                to_read = 1
+
+        if len(buffer) > self.max_size:
+            raise ValueError("SExp exceeds maximum size")
+        self._offset = offset
+        self._to_read = to_read
+        return r
+
+    def feed(self, chunk: bytes) -> typing.List[CS]:
+        """
+        Add `chunk` to the stream, and return each object it completes.
+        """
+        return [
+            sexp_from_buffer(_, self.to_sexp, allow_backrefs=self.allow_backrefs)[0]
+            for _ in self.feed_buffers(chunk)
+        ]
+
+    def close(self) -> None:
+        """
+        Signal the end of the stream. Raises `ValueError` if it ended in the
+        middle of an object.
+        """
+        if self._buffer:
+            raise ValueError("bad encoding")
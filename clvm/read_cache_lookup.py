@@ -145,6 +145,228 @@ class ReadCacheLookup:
         return min(r) if len(r) > 0 else None
 
 
+class ReadStackIndex:
+    """
+    `ReadStackIndex` tracks the same read stack as `ReadCacheLookup`, and
+    finds back-reference paths of the same length, without a search that
+    grows with the size of the stack.
+
+    It keeps an index from tree hash to the positions in the stack of the
+    items with that hash, and of the stack suffixes (the nodes on the spine
+    of the stack as a cons list) with that hash, so the shortest path to an
+    item or suffix is found in constant time: it's the one to the topmost
+    position. A node inside an item is found by a search from both ends,
+    walking up from the node through the cons boxes that contain it (by
+    hash), and down from the root through the children of each node, always
+    extending the side that's cheaper to extend. The search ends as soon as
+    no shorter path is possible.
+
+    As the read stack never loses a node (it only conses items together),
+    neither index of cons boxes ever goes stale. The cons boxes of a stack
+    suffix are only indexed by their children once a back reference pushes
+    the suffix as an item, as until then they can't be reached from below.
+
+    Paths found are as short as those found by `ReadCacheLookup`, so the
+    encoding is the same size, but where several paths are equally short
+    it may pick a different one.
+    """
+
+    def __init__(self) -> None:
+        nil_hash = hashlib.sha256(b"\1").digest()
+        # the hash of each item, bottom first, and of each stack suffix:
+        # `roots[j]` is the hash of the bottom `j` items as a list
+        self.items: List[bytes] = []
+        self.roots: List[bytes] = [nil_hash]
+        self.item_positions: Dict[bytes, List[int]] = {}
+        self.root_positions: Dict[bytes, List[int]] = {nil_hash: [0]}
+        # the children of each cons box (including the stack suffixes), and
+        # the cons boxes each hash is a child of, most recently created last
+        self.children: Dict[bytes, Tuple[bytes, bytes]] = {}
+        self.parents: Dict[bytes, Dict[Tuple[bytes, int], None]] = {}
+        # the cons boxes whose children have been added to `parents`
+        self.linked: Set[bytes] = set()
+
+    @property
+    def root_hash(self) -> bytes:
+        return self.roots[-1]
+
+    def push(self, obj_hash: bytes) -> None:
+        """
+        Note that an object with the given hash has just been pushed to the
+        read stack.
+        """
+        position = len(self.items)
+        old_root_hash = self.roots[-1]
+        root_hash = hashlib.sha256(b"\2" + obj_hash + old_root_hash).digest()
+        self.items.append(obj_hash)
+        self.roots.append(root_hash)
+        self.item_positions.setdefault(obj_hash, []).append(position)
+        self.root_positions.setdefault(root_hash, []).append(position + 1)
+        self.children[root_hash] = (obj_hash, old_root_hash)
+        if obj_hash in self.children and obj_hash not in self.linked:
+            # a back reference to a stack suffix, which isn't a cons box
+            # anywhere else yet, so the edges inside it aren't in `parents`
+            self._link(obj_hash)
+
+    def _link(self, obj_hash: bytes) -> None:
+        todo = [obj_hash]
+        while todo:
+            node = todo.pop()
+            node_children = self.children.get(node)
+            if node_children is None or node in self.linked:
+                continue
+            self.linked.add(node)
+            left, right = node_children
+            self.parents.setdefault(left, {})[(node, LEFT)] = None
+            self.parents.setdefault(right, {})[(node, RIGHT)] = None
+            todo.append(left)
+            todo.append(right)
+
+    def pop(self) -> bytes:
+        """
+        Note that the top object has just been popped from the read stack,
+        and return its hash.
+        """
+        obj_hash = self.items.pop()
+        root_hash = self.roots.pop()
+        # the top item has the highest position of any with its hash, and
+        # likewise for the root
+        self.item_positions[obj_hash].pop()
+        self.root_positions[root_hash].pop()
+        return obj_hash
+
+    def pop2_and_cons(self) -> None:
+        """
+        Note that the top two objects have just been popped, consed together,
+        and the cons pushed.
+        """
+        right = self.pop()
+        left = self.pop()
+        cons_hash = hashlib.sha256(b"\2" + left + right).digest()
+        self.children[cons_hash] = (left, right)
+        self.linked.add(cons_hash)
+        for child, edge in ((left, (cons_hash, LEFT)), (right, (cons_hash, RIGHT))):
+            parents = self.parents.setdefault(child, {})
+            # move the edge to the end, so the most recent (and likely the
+            # nearest) cons boxes are tried first
+            parents.pop(edge, None)
+            parents[edge] = None
+        self.push(cons_hash)
+
+    def find_path(self, obj_hash: bytes, serialized_length: int) -> Optional[bytes]:
+        """
+        Return the shortest path from the root of the read stack to a node
+        with the given hash, or `None` if there's no path short enough to
+        save space over `serialized_length` bytes.
+        """
+        if serialized_length < 3:
+            return None
+        # 1 byte for 0xfe, 1 min byte for savings
+        max_path_length = (serialized_length - 2) * 8 - 1
+        root_hash = self.roots[-1]
+        if obj_hash == root_hash:
+            return bytes([1])
+
+        item_positions = self.item_positions
+        root_positions = self.root_positions
+        children = self.children
+        parents = self.parents
+        item_count = len(self.items)
+        best_length = max_path_length + 1
+        best_path = 0
+
+        # `up` maps each node found walking up from `obj_hash` to the path
+        # from it down to `obj_hash`, with the leading 1 bit. `down` maps each
+        # node found walking down from the root to the path to it (without
+        # the leading 1 bit) and its length
+        up: Dict[bytes, int] = {}
+        down: Dict[bytes, Tuple[int, int]] = {root_hash: (0, 0)}
+        up_frontier: List[Tuple[bytes, int]] = []
+        down_frontier = [root_hash]
+        up_level = 0
+        down_level = 0
+
+        new_up = [(obj_hash, 1)]
+        while True:
+            for node, path in new_up:
+                up[node] = path
+                up_frontier.append((node, path))
+                # an item at position `i` is reached with `item_count - 1 - i`
+                # rests and a first, and a stack suffix `j` with
+                # `item_count - j` rests
+                positions = item_positions.get(node)
+                if positions:
+                    length = up_level + item_count - positions[-1]
+                    if length < best_length:
+                        best_length = length
+                        best_path = (path << (length - up_level)) | ((1 << (length - up_level - 1)) - 1)
+                positions = root_positions.get(node)
+                if positions:
+                    length = up_level + item_count - positions[-1]
+                    if length < best_length:
+                        best_length = length
+                        best_path = (path << (length - up_level)) | ((1 << (length - up_level)) - 1)
+                if node in down:
+                    down_path, down_length = down[node]
+                    if up_level + down_length < best_length:
+                        best_length = up_level + down_length
+                        best_path = (path << down_length) | down_path
+
+            # every path of length `up_level + down_level` or less has been
+            # considered
+            if best_length <= up_level + down_level + 1:
+                break
+            # once one side has found every node it can, the bound is proven
+            # too. With no more cons boxes above, every item containing the
+            # node has been found, and its topmost position tried, and every
+            # path leaves the stack's spine at such an item. With no more
+            # nodes below, the search from the root has met `obj_hash`
+            # itself, at its shortest distance. Extending the other side
+            # would only repeat paths already tried, and takes much longer
+            if not up_frontier or not down_frontier:
+                break
+
+            up_cost = sum(len(parents.get(node, ())) for node, _ in up_frontier)
+            down_cost = 2 * sum(node in children for node in down_frontier)
+            if up_cost <= down_cost:
+                new_up = []
+                for node, path in up_frontier:
+                    for parent, direction in reversed(parents.get(node, {})):
+                        if parent not in up:
+                            # mark it found, so it's only added once
+                            up[parent] = 0
+                            new_up.append((parent, (path << 1) | direction))
+                up_frontier = []
+                up_level += 1
+                continue
+
+            new_down = []
+            down_level += 1
+            for node in down_frontier:
+                node_children = children.get(node)
+                if node_children is None:
+                    continue
+                down_path = down[node][0]
+                for direction, child in enumerate(node_children):
+                    if child in down:
+                        continue
+                    child_path = down_path | (direction << (down_level - 1))
+                    down[child] = (child_path, down_level)
+                    new_down.append(child)
+                    if child in up:
+                        up_path = up[child]
+                        length = up_path.bit_length() - 1 + down_level
+                        if length < best_length:
+                            best_length = length
+                            best_path = (up_path << down_level) | child_path
+            down_frontier = new_down
+            new_up = []
+
+        if best_length > max_path_length:
+            return None
+        return best_path.to_bytes((best_length + 8) >> 3, "big")
+
+
 def reversed_path_to_bytes(path: List[int]) -> bytes:
     """
     Convert a list of 0/1 (for left/right) values to a path expected by clvm.
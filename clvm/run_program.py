@@ -1,9 +1,15 @@
-from typing import Callable, List, Optional, Tuple
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 
-from .CLVMObject import CLVMObject
-from .EvalError import EvalError
+from chia_rs import run_chia_program
+
+from .CLVMObject import CLVMStorage
+from .EvalError import EvalError, ResourceLimitError
 from .SExp import CastableType, SExp
-from .operators import OperatorDict
+from .casts import int_from_bytes
+from .more_ops import op_ash, op_concat, op_lsh, op_multiply
+from .operators import OPERATOR_LOOKUP, OperatorDict
 
 from .costs import (
     APPLY_COST,
@@ -13,6 +19,9 @@ from .costs import (
     PATH_LOOKUP_COST_PER_ZERO_BYTE,
 )
 
+# the largest cost `chia_rs` accepts
+MAX_RUST_COST = 2**64 - 1
+
 OpCallable = Callable[["OpStackType", "ValStackType"], int]
 PreOpCallable = Callable[["OpStackType", "ValStackType"], None]
 PreEvalFunction = Callable[[SExp, SExp], Optional[Callable[[SExp], object]]]
@@ -48,145 +57,606 @@ def msb_mask(byte: int) -> int:
     return (byte + 1) >> 1
 
 
+def traverse_path(sexp: SExp, env: SExp) -> Tuple[int, SExp]:
+    cost = PATH_LOOKUP_BASE_COST
+    cost += PATH_LOOKUP_COST_PER_LEG
+    if sexp.nullp():
+        return cost, sexp.null()
+
+    if sexp.atom is None:
+        raise ValueError("Atom must have a non-None atom attribute")
+    b = sexp.atom
+
+    end_byte_cursor = 0
+    while end_byte_cursor < len(b) and b[end_byte_cursor] == 0:
+        end_byte_cursor += 1
+
+    cost += end_byte_cursor * PATH_LOOKUP_COST_PER_ZERO_BYTE
+    if end_byte_cursor == len(b):
+        return cost, sexp.null()
+
+    # create a bitmask for the most significant *set* bit
+    # in the last non-zero byte
+    end_bitmask = msb_mask(b[end_byte_cursor])
+
+    byte_cursor = len(b) - 1
+    bitmask = 0x01
+    while byte_cursor > end_byte_cursor or bitmask < end_bitmask:
+        if env.pair is None:
+            raise EvalError("path into atom", env)
+        if b[byte_cursor] & bitmask:
+            env = env.rest()
+        else:
+            env = env.first()
+        cost += PATH_LOOKUP_COST_PER_LEG
+        bitmask <<= 1
+        if bitmask == 0x100:
+            byte_cursor -= 1
+            bitmask = 0x01
+    return cost, env
+
+
+def swap_op(op_stack: OpStackType, value_stack: ValStackType) -> int:
+    v2 = value_stack.pop()
+    v1 = value_stack.pop()
+    value_stack.append(v2)
+    value_stack.append(v1)
+    return 0
+
+
+def cons_op(op_stack: OpStackType, value_stack: ValStackType) -> int:
+    v1 = value_stack.pop()
+    v2 = value_stack.pop()
+    value_stack.append(v1.cons(v2))
+    return 0
+
+
+def _concat_size(args: CLVMStorage) -> int:
+    # the length of the concatenation of a list of args
+    size = 0
+    node = args
+    while node.pair is not None:
+        atom = node.pair[0].atom
+        if atom is None:
+            # the op fails on this
+            break
+        size += len(atom)
+        node = node.pair[1]
+    return size
+
+
+def _product_size(args: CLVMStorage) -> int:
+    # a bound on the length of the product of a list of args, from their
+    # values rather than their lengths, so leading sign bytes and small
+    # args don't add to it. It's at most a byte over
+    bits = 0
+    node = args
+    while node.pair is not None:
+        atom = node.pair[0].atom
+        if atom is None:
+            # the op fails on this
+            return 0
+        v = abs(int_from_bytes(atom))
+        if v == 0:
+            return 0
+        # the product grows by at most this many bits
+        bits += (v - 1).bit_length()
+        node = node.pair[1]
+    return (bits + 1) // 8 + 1
+
+
+def _shift_size(args: CLVMStorage, signed: bool) -> int:
+    # a bound on the length of `(ash A S)` or `(lsh A S)`, where `lsh` reads
+    # `A` as unsigned. It's at most a byte over
+    pair = args.pair
+    if pair is None or pair[1].pair is None:
+        return 0
+    atom = pair[0].atom
+    shift_atom = pair[1].pair[0].atom
+    if atom is None or shift_atom is None or len(shift_atom) > 4:
+        return 0
+    shift = int_from_bytes(shift_atom)
+    if abs(shift) > 65535:
+        # the op fails on this
+        return 0
+    v = abs(int_from_bytes(atom)) if signed else int.from_bytes(atom, "big")
+    if v == 0:
+        return 0
+    return max(v.bit_length() + shift, 0) // 8 + 1
+
+
+def _ash_size(args: CLVMStorage) -> int:
+    return _shift_size(args, True)
+
+
+def _lsh_size(args: CLVMStorage) -> int:
+    return _shift_size(args, False)
+
+
+# operators whose result can be much longer than any of their args, with a
+# bound on the length of the result given the args
+OUTPUT_SIZE_BOUNDS: Dict[object, Callable[[CLVMStorage], int]] = {
+    op_concat: _concat_size,
+    op_multiply: _product_size,
+    op_ash: _ash_size,
+    op_lsh: _lsh_size,
+}
+
+
+def _contains_atom(tree: CLVMStorage, atom: bytes) -> bool:
+    # whether `atom` itself (not just an equal atom) is in `tree`
+    seen: Dict[int, object] = {}
+    todo = [tree]
+    while todo:
+        node = todo.pop()
+        pair = node.pair
+        if pair is None:
+            if node.atom is atom:
+                return True
+            continue
+        if id(pair) not in seen:
+            seen[id(pair)] = pair
+            todo.extend(pair)
+    return False
+
+
+class OpStats:
+    """
+    The number of times an op ran, the cost it charged and the wall time (in
+    seconds) it took.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.cost = 0
+        self.time = 0.0
+
+    def __repr__(self) -> str:
+        return "OpStats(count=%d, cost=%d, time=%f)" % (self.count, self.cost, self.time)
+
+
+class RunStats:
+    """
+    Statistics collected by `run_program` when it's passed a `RunStats`.
+
+    `ops` has an `OpStats` for every operator atom that was applied. Its time
+    includes the time spent in the operator itself. `eval` covers evaluating
+    program nodes: quotes, path lookups and pushing operands. `cost` and
+    `time` are for the whole run, and the maximum depths of the op and value
+    stacks are tracked as well.
+
+    A `RunStats` can be passed to several runs to accumulate their stats.
+    """
+
+    def __init__(self) -> None:
+        self.ops: Dict[bytes, OpStats] = {}
+        self.eval = OpStats()
+        self.cost = 0
+        self.time = 0.0
+        self.max_op_stack_depth = 0
+        self.max_value_stack_depth = 0
+
+    def op_stats(self, op: bytes) -> OpStats:
+        r = self.ops.get(op)
+        if r is None:
+            r = self.ops[op] = OpStats()
+        return r
+
+
+class Interpreter:
+    """
+    An `Interpreter` builds the eval and apply ops for an `OperatorDict` (and
+    an optional `pre_eval_f`) once, so they can be reused to run any number of
+    programs. `run_program` builds a new `Interpreter` for every call, which
+    is a measurable share of the run time of very small programs.
+    """
+
+    def __init__(
+        self,
+        operator_lookup: OperatorDict,
+        pre_eval_f: Optional[PreEvalFunction] = None,
+    ) -> None:
+        self.operator_lookup = operator_lookup
+        self.pre_eval_f = pre_eval_f
+        if pre_eval_f is not None:
+            # the values on the stack are built from the program, so they're
+            # already of its class, which `SExp.to` keeps
+            pre_eval_op: Optional[PreOpCallable] = to_pre_eval_op(pre_eval_f, SExp.to)
+        else:
+            pre_eval_op = None
+
+        def eval_op(op_stack: OpStackType, value_stack: ValStackType) -> int:
+            if pre_eval_op:
+                pre_eval_op(op_stack, value_stack)
+
+            pair = value_stack.pop()
+            sexp = pair.first()
+            args = pair.rest()
+
+            # put a bunch of ops on op_stack
+
+            if sexp.pair is None:
+                # sexp is an atom
+                cost, r = traverse_path(sexp, args)
+                value_stack.append(r)
+                return cost
+
+            operator = sexp.first()
+            if operator.pair:
+                from_as_pair = operator.as_pair()
+                assert from_as_pair is not None
+                new_operator, must_be_nil = from_as_pair
+                if new_operator.pair or must_be_nil.atom != b"":
+                    raise EvalError("in ((X)...) syntax X must be lone atom", sexp)
+                new_operand_list = sexp.rest()
+                value_stack.append(new_operator)
+                value_stack.append(new_operand_list)
+                op_stack.append(apply_op)
+                return APPLY_COST
+
+            op = operator.as_atom()
+            operand_list = sexp.rest()
+            if op == operator_lookup.quote_atom:
+                value_stack.append(operand_list)
+                return QUOTE_COST
+
+            op_stack.append(apply_op)
+            value_stack.append(operator)
+            while not operand_list.nullp():
+                _ = operand_list.first()
+                value_stack.append(_.cons(args))
+                op_stack.append(cons_op)
+                op_stack.append(eval_op)
+                op_stack.append(swap_op)
+                operand_list = operand_list.rest()
+            value_stack.append(operator.null())
+            return 1
+
+        def apply_op(op_stack: OpStackType, value_stack: ValStackType) -> int:
+            operand_list = value_stack.pop()
+            operator = value_stack.pop()
+            if operator.pair:
+                raise EvalError("internal error", operator)
+
+            op = operator.as_atom()
+            assert op is not None
+            if op == operator_lookup.apply_atom:
+                if operand_list.list_len() != 2:
+                    raise EvalError("apply requires exactly 2 parameters", operand_list)
+                new_program = operand_list.first()
+                new_args = operand_list.rest().first()
+                value_stack.append(new_program.cons(new_args))
+                op_stack.append(eval_op)
+                return APPLY_COST
+
+            additional_cost, r = operator_lookup(op, operand_list)
+            value_stack.append(r)
+            return additional_cost
+
+        self.eval_op: OpCallable = eval_op
+        self.apply_op: OpCallable = apply_op
+
+    def run(
+        self,
+        program: CLVMStorage,
+        args: CLVMStorage,
+        max_cost: Optional[int] = None,
+    ) -> Tuple[int, SExp]:
+        _program = SExp.to(program)
+        op_stack: OpStackType = [self.eval_op]
+        value_stack: ValStackType = [_program.cons(_program.to(args))]
+        cost: int = 0
+
+        while op_stack:
+            f = op_stack.pop()
+            cost += f(op_stack, value_stack)
+            if max_cost and cost > max_cost:
+                raise EvalError("cost exceeded", _program.to(max_cost))
+        return cost, value_stack[-1]
+
+    def run_with_limits(
+        self,
+        program: CLVMStorage,
+        args: CLVMStorage,
+        max_cost: Optional[int] = None,
+        deadline: Optional[float] = None,
+        max_atom_bytes: Optional[int] = None,
+    ) -> Tuple[int, SExp]:
+        """
+        Like `run`, but also raises `ResourceLimitError` once `time.monotonic()`
+        passes `deadline`, or if an operator creates an atom longer than
+        `max_atom_bytes`, anywhere in its result. Since every atom an operator
+        creates is checked, the inputs to the next operator are bounded too.
+
+        Only atoms an operator creates count: an atom of the program or its
+        args is never refused, whether it's quoted, looked up, or passed
+        through an operator (like `f`) unchanged.
+
+        The operators in `OUTPUT_SIZE_BOUNDS`, which can return atoms much
+        longer than their args (like `concat` with many args), are checked
+        before they run, so the atom is never allocated. The bound is exact
+        for `concat`, and at most a byte over for the others, which can
+        reject a result a byte shorter than `max_atom_bytes`.
+        """
+        apply_op = self.apply_op
+        operator_lookup = self.operator_lookup
+        monotonic = time.monotonic
+
+        _program = SExp.to(program)
+        op_stack: OpStackType = [self.eval_op]
+        value_stack: ValStackType = [_program.cons(_program.to(args))]
+        cost: int = 0
+        # the pairs of results already walked, and the long atoms found to
+        # be passed through from the operands, kept alive so their ids
+        # aren't reused
+        walked: Dict[int, object] = {}
+        passed: Dict[int, bytes] = {}
+        operands: CLVMStorage = _program
+
+        while op_stack:
+            f = op_stack.pop()
+            if max_atom_bytes is not None and f is apply_op:
+                # the operator is below the operand list
+                operands = value_stack[-1]
+                operator = value_stack[-2].atom
+                if operator is not None:
+                    bound = OUTPUT_SIZE_BOUNDS.get(operator_lookup.get(operator))
+                    if bound is not None and bound(operands) > max_atom_bytes:
+                        raise ResourceLimitError("atom too large", _program.to(max_atom_bytes))
+            cost += f(op_stack, value_stack)
+            if max_cost and cost > max_cost:
+                raise EvalError("cost exceeded", _program.to(max_cost))
+            if deadline is not None and monotonic() > deadline:
+                raise ResourceLimitError("deadline exceeded", _program.null())
+            if max_atom_bytes is not None and f is apply_op:
+                todo: List[CLVMStorage] = [value_stack[-1]]
+                while todo:
+                    node = todo.pop()
+                    pair = node.pair
+                    if pair is None:
+                        atom = node.atom
+                        if atom is None or len(atom) <= max_atom_bytes or id(atom) in passed:
+                            continue
+                        # long atoms are rare, so only then is it worth
+                        # looking for the atom among the operands
+                        if not _contains_atom(operands, atom):
+                            raise ResourceLimitError("atom too large", _program.to(max_atom_bytes))
+                        passed[id(atom)] = atom
+                        continue
+                    if id(pair) not in walked:
+                        walked[id(pair)] = pair
+                        todo.extend(pair)
+        return cost, value_stack[-1]
+
+    def start(
+        self,
+        program: CLVMStorage,
+        args: CLVMStorage,
+        max_cost: Optional[int] = None,
+    ) -> "ResumableRun":
+        """
+        Set up a run of `program` that is executed in slices by calling
+        `ResumableRun.resume`.
+        """
+        return ResumableRun(self, program, args, max_cost)
+
+    def run_with_stats(
+        self,
+        program: CLVMStorage,
+        args: CLVMStorage,
+        stats: RunStats,
+        max_cost: Optional[int] = None,
+    ) -> Tuple[int, SExp]:
+        """
+        Like `run`, but records what the program does in `stats`. This is a
+        separate loop so `run` doesn't pay for the bookkeeping.
+        """
+        eval_op = self.eval_op
+        apply_op = self.apply_op
+        perf_counter = time.perf_counter
+        run_start = perf_counter()
+
+        _program = SExp.to(program)
+        op_stack: OpStackType = [eval_op]
+        value_stack: ValStackType = [_program.cons(_program.to(args))]
+        cost: int = 0
+
+        try:
+            while op_stack:
+                f = op_stack.pop()
+                op_stats: Optional[OpStats] = None
+                if f is apply_op:
+                    # the operator is below the operand list
+                    atom = value_stack[-2].atom
+                    if atom is not None:
+                        op_stats = stats.op_stats(atom)
+                elif f is eval_op:
+                    op_stats = stats.eval
+
+                start = perf_counter()
+                c = f(op_stack, value_stack)
+                if op_stats is not None:
+                    op_stats.time += perf_counter() - start
+                    op_stats.count += 1
+                    op_stats.cost += c
+                cost += c
+
+                if len(op_stack) > stats.max_op_stack_depth:
+                    stats.max_op_stack_depth = len(op_stack)
+                if len(value_stack) > stats.max_value_stack_depth:
+                    stats.max_value_stack_depth = len(value_stack)
+
+                if max_cost and cost > max_cost:
+                    raise EvalError("cost exceeded", _program.to(max_cost))
+        finally:
+            stats.cost += cost
+            stats.time += perf_counter() - run_start
+        return cost, value_stack[-1]
+
+
+class ResumableRun:
+    """
+    A run of a program that can be paused and resumed. Each call to `resume`
+    runs until the program finishes or a cost or step budget is used up, so a
+    scheduler can interleave many programs. The final cost, result and errors
+    are the same as for `Interpreter.run`.
+    """
+
+    def __init__(
+        self,
+        interpreter: Interpreter,
+        program: CLVMStorage,
+        args: CLVMStorage,
+        max_cost: Optional[int] = None,
+    ) -> None:
+        self.program = SExp.to(program)
+        self.max_cost = max_cost
+        self.op_stack: OpStackType = [interpreter.eval_op]
+        self.value_stack: ValStackType = [self.program.cons(self.program.to(args))]
+        self.cost: int = 0
+        self.steps: int = 0
+
+    @property
+    def done(self) -> bool:
+        return not self.op_stack
+
+    def resume(
+        self,
+        cost_budget: Optional[int] = None,
+        step_budget: Optional[int] = None,
+    ) -> bool:
+        """
+        Run until the program finishes, at least `cost_budget` cost has been
+        charged or `step_budget` ops have run, whichever comes first. Returns
+        `True` once the program has finished.
+        """
+        op_stack = self.op_stack
+        value_stack = self.value_stack
+        max_cost = self.max_cost
+        cost = self.cost
+        cost_limit = None if cost_budget is None else cost + cost_budget
+        steps = 0
+        try:
+            while op_stack:
+                f = op_stack.pop()
+                cost += f(op_stack, value_stack)
+                steps += 1
+                if max_cost and cost > max_cost:
+                    raise EvalError("cost exceeded", self.program.to(max_cost))
+                if cost_limit is not None and cost >= cost_limit:
+                    break
+                if step_budget is not None and steps >= step_budget:
+                    break
+        finally:
+            self.steps += steps
+            self.cost = cost
+        return not op_stack
+
+    def result(self) -> Tuple[int, SExp]:
+        if self.op_stack:
+            raise ValueError("program hasn't finished")
+        return self.cost, self.value_stack[-1]
+
+
+async def run_program_async(
+    program: CLVMStorage,
+    args: CLVMStorage,
+    operator_lookup: OperatorDict,
+    max_cost: Optional[int] = None,
+    cost_budget: int = 1000000,
+) -> Tuple[int, SExp]:
+    """
+    Run a program on the python backend, giving control back to the event
+    loop every `cost_budget` cost.
+    """
+    run = Interpreter(operator_lookup).start(program, args, max_cost)
+    while not run.resume(cost_budget):
+        await asyncio.sleep(0)
+    return run.result()
+
+
 def run_program(
-    program: CLVMObject,
+    program: CLVMStorage,
     args: SExp,
     operator_lookup: OperatorDict,
     max_cost: Optional[int] = None,
     pre_eval_f: Optional[PreEvalFunction] = None,
+    backend: str = "python",
+    stats: Optional[RunStats] = None,
+    deadline: Optional[float] = None,
+    max_atom_bytes: Optional[int] = None,
+) -> Tuple[int, SExp]:
+    """
+    `backend` selects the interpreter. "python" is the reference
+    implementation. "rust" runs the program in `chia_rs`, which is much
+    faster, but only implements the default `OPERATOR_LOOKUP` and can't call
+    `pre_eval_f`. It isn't a drop-in replacement: some programs get a
+    different cost or result (see `run_program_rust`).
+
+    If `stats` is passed, the python backend records per operator counts,
+    costs and timings in it. See `RunStats`.
+
+    `deadline` (a `time.monotonic()` value) and `max_atom_bytes` limit the
+    wall time and the size of atoms created by the python backend. If either
+    is exceeded, `ResourceLimitError` is raised.
+    """
+    has_limits = deadline is not None or max_atom_bytes is not None
+    if backend == "python":
+        interpreter = Interpreter(operator_lookup, pre_eval_f)
+        if stats is not None:
+            if has_limits:
+                raise ValueError("stats can't be combined with deadline or max_atom_bytes")
+            return interpreter.run_with_stats(program, args, stats, max_cost)
+        if has_limits:
+            return interpreter.run_with_limits(program, args, max_cost, deadline, max_atom_bytes)
+        return interpreter.run(program, args, max_cost)
+    if backend == "rust":
+        if operator_lookup is not OPERATOR_LOOKUP:
+            raise ValueError("the rust backend only supports OPERATOR_LOOKUP")
+        if pre_eval_f is not None:
+            raise ValueError("the rust backend doesn't support pre_eval_f")
+        if stats is not None:
+            raise ValueError("the rust backend doesn't support stats")
+        if has_limits:
+            raise ValueError("the rust backend doesn't support deadline or max_atom_bytes")
+        return run_program_rust(program, args, max_cost)
+    raise ValueError("unknown backend %r" % backend)
+
+
+def run_program_rust(
+    program: CLVMStorage,
+    args: CLVMStorage,
+    max_cost: Optional[int] = None,
 ) -> Tuple[int, SExp]:
+    """
+    Run `program` with the `chia_rs` interpreter. Errors raised by `chia_rs`
+    don't say which node failed, so the `EvalError` carries the message from
+    `chia_rs` and a nil sexp.
+
+    `chia_rs` follows the consensus rules of the chain, which have moved on
+    from this implementation, so it doesn't always give the same cost and
+    result as `run_program`:
+
+    - it implements operators that are unknown here, so they're charged for
+      and return nil here but do something (or fail) there: `coinid` (0x30),
+      the BLS operators (0x31 to 0x3b), `modpow` (0x3c), `%` (0x3d),
+      `secp256k1_verify` (0x13d61f00) and `secp256r1_verify` (0x1c3a8f00),
+      and `keccak256` (0x3e) in versions that enable it
+    - it allows `/` on negative operands, which fails here
+    - it accepts `((X . Y) ...)` with a non-nil `Y`, which fails here
+
+    Programs that can reach any of those (including by building them at run
+    time) must be run on the python backend if its behaviour is what's
+    wanted.
+    """
     _program = SExp.to(program)
-    if pre_eval_f is not None:
-        pre_eval_op = to_pre_eval_op(pre_eval_f, _program.to)
-    else:
-        pre_eval_op = None
-
-    def traverse_path(sexp: SExp, env: SExp) -> Tuple[int, SExp]:
-        cost = PATH_LOOKUP_BASE_COST
-        cost += PATH_LOOKUP_COST_PER_LEG
-        if sexp.nullp():
-            return cost, sexp.null()
-
-        if sexp.atom is None:
-            raise ValueError("Atom must have a non-None atom attribute")
-        b = sexp.atom
-
-        end_byte_cursor = 0
-        while end_byte_cursor < len(b) and b[end_byte_cursor] == 0:
-            end_byte_cursor += 1
-
-        cost += end_byte_cursor * PATH_LOOKUP_COST_PER_ZERO_BYTE
-        if end_byte_cursor == len(b):
-            return cost, sexp.null()
-
-        # create a bitmask for the most significant *set* bit
-        # in the last non-zero byte
-        end_bitmask = msb_mask(b[end_byte_cursor])
-
-        byte_cursor = len(b) - 1
-        bitmask = 0x01
-        while byte_cursor > end_byte_cursor or bitmask < end_bitmask:
-            if env.pair is None:
-                raise EvalError("path into atom", env)
-            if b[byte_cursor] & bitmask:
-                env = env.rest()
-            else:
-                env = env.first()
-            cost += PATH_LOOKUP_COST_PER_LEG
-            bitmask <<= 1
-            if bitmask == 0x100:
-                byte_cursor -= 1
-                bitmask = 0x01
-        return cost, env
-
-    def swap_op(op_stack: OpStackType, value_stack: ValStackType) -> int:
-        v2 = value_stack.pop()
-        v1 = value_stack.pop()
-        value_stack.append(v2)
-        value_stack.append(v1)
-        return 0
-
-    def cons_op(op_stack: OpStackType, value_stack: ValStackType) -> int:
-        v1 = value_stack.pop()
-        v2 = value_stack.pop()
-        value_stack.append(v1.cons(v2))
-        return 0
-
-    def eval_op(op_stack: OpStackType, value_stack: ValStackType) -> int:
-        if pre_eval_op:
-            pre_eval_op(op_stack, value_stack)
-
-        pair = value_stack.pop()
-        sexp = pair.first()
-        args = pair.rest()
-
-        # put a bunch of ops on op_stack
-
-        if sexp.pair is None:
-            # sexp is an atom
-            cost, r = traverse_path(sexp, args)
-            value_stack.append(r)
-            return cost
-
-        operator = sexp.first()
-        if operator.pair:
-            from_as_pair = operator.as_pair()
-            assert from_as_pair is not None
-            new_operator, must_be_nil = from_as_pair
-            if new_operator.pair or must_be_nil.atom != b"":
-                raise EvalError("in ((X)...) syntax X must be lone atom", sexp)
-            new_operand_list = sexp.rest()
-            value_stack.append(new_operator)
-            value_stack.append(new_operand_list)
-            op_stack.append(apply_op)
-            return APPLY_COST
-
-        op = operator.as_atom()
-        operand_list = sexp.rest()
-        if op == operator_lookup.quote_atom:
-            value_stack.append(operand_list)
-            return QUOTE_COST
-
-        op_stack.append(apply_op)
-        value_stack.append(operator)
-        while not operand_list.nullp():
-            _ = operand_list.first()
-            value_stack.append(_.cons(args))
-            op_stack.append(cons_op)
-            op_stack.append(eval_op)
-            op_stack.append(swap_op)
-            operand_list = operand_list.rest()
-        value_stack.append(operator.null())
-        return 1
-
-    def apply_op(op_stack: OpStackType, value_stack: ValStackType) -> int:
-        operand_list = value_stack.pop()
-        operator = value_stack.pop()
-        if operator.pair:
-            raise EvalError("internal error", operator)
-
-        op = operator.as_atom()
-        assert op is not None
-        if op == operator_lookup.apply_atom:
-            if operand_list.list_len() != 2:
-                raise EvalError("apply requires exactly 2 parameters", operand_list)
-            new_program = operand_list.first()
-            new_args = operand_list.rest().first()
-            value_stack.append(new_program.cons(new_args))
-            op_stack.append(eval_op)
-            return APPLY_COST
-
-        additional_cost, r = operator_lookup(op, operand_list)
-        value_stack.append(r)
-        return additional_cost
-
-    op_stack: OpStackType = [eval_op]
-    value_stack: ValStackType = [_program.cons(args)]
-    cost: int = 0
-
-    while op_stack:
-        f = op_stack.pop()
-        cost += f(op_stack, value_stack)
-        if max_cost and cost > max_cost:
-            raise EvalError("cost exceeded", _program.to(max_cost))
-    return cost, value_stack[-1]
+    # `chia_rs` has no "unlimited" cost, but it can't use more than this
+    if not max_cost or max_cost > MAX_RUST_COST:
+        max_cost = MAX_RUST_COST
+    try:
+        cost, r = run_chia_program(
+            bytes(_program.as_bin()), bytes(_program.to(args).as_bin()), max_cost, 0
+        )
+    except ValueError as e:
+        raise EvalError(str(e), _program.null()) from None
+    return cost, _program.to(r)
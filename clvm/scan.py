@@ -0,0 +1,180 @@
+import hashlib
+import mmap
+import typing
+
+from .object_cache import _serialized_atom_length
+from .serialize import (
+    BACK_REFERENCE,
+    CONS_BOX_MARKER,
+    BufferType,
+    _IndexableType,
+    _atom_span,
+)
+
+# the summary of a node, kept on the scan stack:
+# (tree hash, serialized length, pairs, atoms, atom bytes, depth, left, right)
+# `left` and `right` are only kept when back references are allowed, since
+# they're needed to follow a path into a node
+NodeSummary = typing.Tuple[
+    bytes, int, int, int, int, int, typing.Optional[typing.Any], typing.Optional[typing.Any]
+]
+
+
+def _atom_summary(atom: bytes) -> NodeSummary:
+    return (
+        hashlib.sha256(b"\1" + atom).digest(),
+        _serialized_atom_length(len(atom), atom[0] if atom else 0),
+        0,
+        1,
+        len(atom),
+        0,
+        None,
+        None,
+    )
+
+
+def _pair_summary(left: NodeSummary, right: NodeSummary, keep_children: bool) -> NodeSummary:
+    return (
+        hashlib.sha256(b"\2" + left[0] + right[0]).digest(),
+        1 + left[1] + right[1],
+        1 + left[2] + right[2],
+        left[3] + right[3],
+        left[4] + right[4],
+        1 + max(left[5], right[5]),
+        left if keep_children else None,
+        right if keep_children else None,
+    )
+
+
+NIL = _atom_summary(b"")
+
+
+def _follow_backref(stack: typing.List[NodeSummary], path: bytes) -> NodeSummary:
+    # follow `path` into the parse stack, as `traverse_path` does in
+    # `sexp_from_stream`, where the stack is a cons list with the last item
+    # of `stack` first
+    path_as_int = int.from_bytes(path, "big")
+    if path_as_int == 0:
+        return NIL
+
+    index = len(stack)
+    while path_as_int > 1 and path_as_int & 1:
+        if index == 0:
+            raise ValueError("path into atom")
+        index -= 1
+        path_as_int >>= 1
+    if path_as_int == 1:
+        node = NIL
+        for item in stack[:index]:
+            node = _pair_summary(item, node, True)
+        return node
+    if index == 0:
+        raise ValueError("path into atom")
+    node = stack[index - 1]
+    path_as_int >>= 1
+
+    while path_as_int > 1:
+        child: typing.Optional[NodeSummary] = node[7] if path_as_int & 1 else node[6]
+        if child is None:
+            raise ValueError("path into atom")
+        node = child
+        path_as_int >>= 1
+    return node
+
+
+class ScanResult:
+    """
+    The summary of a serialized object computed by `scan_sexp`. The metrics
+    describe the object as a tree, i.e. with back references expanded, so
+    they match what `ObjectCache(treehash)` and `serialized_length` give for
+    the parsed object. The depth of an atom is 0, and each pair adds 1.
+
+    `end` is the offset just past the object in the buffer.
+    """
+
+    def __init__(self, summary: NodeSummary, end: int) -> None:
+        self.tree_hash: bytes = summary[0]
+        self.serialized_length: int = summary[1]
+        self.pair_count: int = summary[2]
+        self.atom_count: int = summary[3]
+        self.atom_bytes: int = summary[4]
+        self.max_depth: int = summary[5]
+        self.end = end
+
+    def __repr__(self) -> str:
+        return (
+            "ScanResult(tree_hash=%s, serialized_length=%d, pair_count=%d, atom_count=%d, "
+            "atom_bytes=%d, max_depth=%d, end=%d)"
+            % (
+                self.tree_hash.hex(),
+                self.serialized_length,
+                self.pair_count,
+                self.atom_count,
+                self.atom_bytes,
+                self.max_depth,
+                self.end,
+            )
+        )
+
+
+# ops on the scan stack
+_READ = 0
+_CONS = 1
+
+
+def scan_sexp(buf: BufferType, offset: int = 0, *, allow_backrefs: bool = False) -> ScanResult:
+    """
+    Compute the tree hash, serialized length, node counts, total atom bytes
+    and depth of the serialized object at `offset` in `buf` in a single pass,
+    without building the object.
+    """
+    data: _IndexableType
+    if isinstance(buf, (bytes, mmap.mmap)):
+        data = buf
+    else:
+        data = memoryview(buf)
+        if data.format != "B" or data.ndim != 1:
+            data = data.cast("B")
+    end = len(data)
+    sha256 = hashlib.sha256
+
+    op_stack = [_READ]
+    stack: typing.List[NodeSummary] = []
+
+    while op_stack:
+        if op_stack.pop() == _CONS:
+            right = stack.pop()
+            stack[-1] = _pair_summary(stack[-1], right, allow_backrefs)
+            continue
+
+        if offset >= end:
+            raise ValueError("bad encoding")
+        b = data[offset]
+        if b == CONS_BOX_MARKER:
+            offset += 1
+            op_stack.append(_CONS)
+            op_stack.append(_READ)
+            op_stack.append(_READ)
+            continue
+        if allow_backrefs and b == BACK_REFERENCE:
+            start, offset = _atom_span(data, offset + 1)
+            stack.append(_follow_backref(stack, bytes(data[start:offset])))
+            continue
+
+        start, offset = _atom_span(data, offset)
+        size = offset - start
+        stack.append(
+            (
+                sha256(b"\1" + data[start:offset]).digest(),
+                # the canonical length, like `serialized_length`
+                _serialized_atom_length(size, data[start] if size else 0),
+                0,
+                1,
+                size,
+                0,
+                None,
+                None,
+            )
+        )
+
+    return ScanResult(stack[0], offset)
@@ -15,12 +15,14 @@
 #   0000 0000 -> 1 byte : zero (b'\x00')
 
 import io
+import mmap
+import os
 import typing
 
-from .read_cache_lookup import ReadCacheLookup
-from .object_cache import ObjectCache, treehash, serialized_length
+from .read_cache_lookup import ReadCacheLookup, ReadStackIndex
+from .object_cache import ObjectCache, TreeMetrics, serialized_length, tree_metrics, treehash
 
-from .CLVMObject import CLVMStorage
+from .CLVMObject import CLVMObject, CLVMStorage, HashedCLVMObject
 
 MAX_SINGLE_BYTE = 0x7F
 BACK_REFERENCE = 0xFE
@@ -46,6 +48,34 @@ OpCallable = typing.Callable[
 
 OpStackType = typing.List[OpCallable[_T_CLVMStorage]]
 
+BufferType = typing.Union[bytes, bytearray, memoryview, mmap.mmap]
+# buffers that are indexed directly by the parsers
+_IndexableType = typing.Union[bytes, memoryview, mmap.mmap]
+
+
+def to_clvm_object(
+    v: typing.Union[CLVMStorage, bytes, typing.Tuple[CLVMStorage, CLVMStorage]]
+) -> CLVMStorage:
+    """
+    A `to_sexp` for the parsers that builds plain `CLVMObject`s, which is much
+    cheaper than `SExp.to`.
+    """
+    if isinstance(v, (bytes, tuple)):
+        return CLVMObject(v)
+    return v
+
+
+def to_hashed_clvm_object(
+    v: typing.Union[CLVMStorage, bytes, typing.Tuple[CLVMStorage, CLVMStorage]]
+) -> CLVMStorage:
+    """
+    A `to_sexp` for the parsers that builds `HashedCLVMObject`s, which keep
+    their tree hash once it's computed.
+    """
+    if isinstance(v, (bytes, tuple)):
+        return HashedCLVMObject(v)
+    return v
+
 
 def sexp_to_byte_iterator(
     sexp: CLVMStorage, *, allow_backrefs: bool = False
@@ -67,6 +97,23 @@ def sexp_to_byte_iterator(
             yield from atom_to_byte_iterator(sexp.atom)
 
 
+def _backref_caches(
+    sexp: CLVMStorage,
+) -> typing.Tuple[
+    typing.Optional[ObjectCache[TreeMetrics]], ObjectCache[bytes], ObjectCache[int]
+]:
+    # the caches of the tree hash and serialized length of each node for the
+    # backref serializers. They're usually computed together, in one pass of
+    # `tree_metrics`. But once a tree of `HashedCLVMObject`s has been hashed,
+    # `treehash` reads the saved hashes without visiting the nodes below, so
+    # only the lengths need a pass, and `metrics_cache` is `None`
+    hash_cache = ObjectCache(treehash)
+    length_cache = ObjectCache(serialized_length)
+    if isinstance(sexp, HashedCLVMObject) and sexp.tree_hash is not None:
+        return None, hash_cache, length_cache
+    return ObjectCache(tree_metrics), hash_cache, length_cache
+
+
 def sexp_to_byte_iterator_with_backrefs(sexp: CLVMStorage) -> typing.Iterator[bytes]:
     # in `read_op_stack`:
     #  "P" = "push"
@@ -76,20 +123,23 @@ def sexp_to_byte_iterator_with_backrefs(sexp: CLVMStorage) -> typing.Iterator[by
 
     write_stack = [sexp]
 
-    read_cache_lookup = ReadCacheLookup()
+    read_cache_lookup = ReadStackIndex()
 
-    thc = ObjectCache(treehash)
-    slc = ObjectCache(serialized_length)
+    metrics_cache, hash_cache, length_cache = _backref_caches(sexp)
 
     while write_stack:
         node_to_write = write_stack.pop()
         op = read_op_stack.pop()
         assert op == "P"
 
-        node_serialized_length = slc.get(node_to_write)
-
-        node_tree_hash = thc.get(node_to_write)
-        path = read_cache_lookup.find_path(node_tree_hash, node_serialized_length)
+        if metrics_cache is None:
+            node_tree_hash = hash_cache.get(node_to_write)
+            node_length = length_cache.get(node_to_write)
+        else:
+            metrics = metrics_cache.get(node_to_write)
+            node_tree_hash = metrics[0]
+            node_length = metrics[1]
+        path = read_cache_lookup.find_path(node_tree_hash, node_length)
         if path:
             yield bytes([BACK_REFERENCE])
             yield from atom_to_byte_iterator(path)
@@ -154,14 +204,146 @@ def atom_to_byte_iterator(as_atom: bytes) -> typing.Iterator[bytes]:
     yield as_atom
 
 
+def _atom_header(size: int) -> bytes:
+    # the size prefix of an atom that isn't written as a single byte
+    if size < 0x40:
+        return bytes([0x80 | size])
+    if size < 0x2000:
+        return bytes([0xC0 | (size >> 8), size & 0xFF])
+    if size < 0x100000:
+        return bytes([0xE0 | (size >> 16)]) + (size & 0xFFFF).to_bytes(2, "big")
+    if size < 0x8000000:
+        return bytes([0xF0 | (size >> 24)]) + (size & 0xFFFFFF).to_bytes(3, "big")
+    if size < 0x400000000:
+        return bytes([0xF8 | (size >> 32)]) + (size & 0xFFFFFFFF).to_bytes(4, "big")
+    raise ValueError("sexp too long")
+
+
+def _write_atom(buf: bytearray, atom: bytes, limit: int) -> None:
+    size = len(atom)
+    if size == 0:
+        buf.append(0x80)
+    elif size == 1 and atom[0] <= MAX_SINGLE_BYTE:
+        buf += atom
+    else:
+        header = _atom_header(size)
+        # check before copying the atom, so an oversized one is never copied
+        if len(buf) + len(header) + size > limit:
+            raise ValueError("SExp exceeds maximum size")
+        buf += header
+        buf += atom
+    if len(buf) > limit:
+        raise ValueError("SExp exceeds maximum size")
+
+
+def _write_sexp(sexp: CLVMStorage, buf: bytearray, limit: int) -> None:
+    todo_stack = [sexp]
+    pop = todo_stack.pop
+    push = todo_stack.append
+    append = buf.append
+    while todo_stack:
+        sexp = pop()
+        pair = sexp.pair
+        if pair:
+            append(CONS_BOX_MARKER)
+            push(pair[1])
+            push(pair[0])
+            continue
+        atom = sexp.atom
+        assert atom is not None
+        # the single byte encodings are by far the most common, so handle
+        # them inline
+        if not atom:
+            append(0x80)
+        elif len(atom) == 1 and atom[0] <= MAX_SINGLE_BYTE:
+            append(atom[0])
+        else:
+            _write_atom(buf, atom, limit)
+            continue
+        if len(buf) > limit:
+            raise ValueError("SExp exceeds maximum size")
+
+
+def _write_sexp_with_backrefs(
+    sexp: CLVMStorage,
+    buf: bytearray,
+    limit: int,
+    read_cache_lookup: typing.Union[ReadCacheLookup, ReadStackIndex],
+) -> None:
+    # the same encoding as `sexp_to_byte_iterator_with_backrefs`, which
+    # `ReadCacheLookup` also gives (more slowly)
+    read_op_stack = ["P"]
+    write_stack = [sexp]
+    metrics_cache, hash_cache, length_cache = _backref_caches(sexp)
+
+    while write_stack:
+        node_to_write = write_stack.pop()
+        read_op_stack.pop()
+
+        if metrics_cache is None:
+            node_tree_hash = hash_cache.get(node_to_write)
+            node_length = length_cache.get(node_to_write)
+        else:
+            metrics = metrics_cache.get(node_to_write)
+            node_tree_hash = metrics[0]
+            node_length = metrics[1]
+        path = read_cache_lookup.find_path(node_tree_hash, node_length)
+        if path:
+            buf.append(BACK_REFERENCE)
+            _write_atom(buf, path, limit)
+            read_cache_lookup.push(node_tree_hash)
+        elif node_to_write.pair:
+            left, right = node_to_write.pair
+            buf.append(CONS_BOX_MARKER)
+            write_stack.append(right)
+            write_stack.append(left)
+            read_op_stack.append("C")
+            read_op_stack.append("P")
+            read_op_stack.append("P")
+        else:
+            atom = node_to_write.atom
+            assert atom is not None
+            _write_atom(buf, atom, limit)
+            read_cache_lookup.push(node_tree_hash)
+
+        while read_op_stack[-1:] == ["C"]:
+            read_op_stack.pop()
+            read_cache_lookup.pop2_and_cons()
+
+
+def sexp_to_bytearray(
+    sexp: CLVMStorage,
+    buf: typing.Optional[bytearray] = None,
+    *,
+    allow_backrefs: bool = False,
+    max_size: int = MAX_SAFE_BYTES,
+) -> bytearray:
+    """
+    Serialize `sexp` by appending to `buf` (a new `bytearray` if it's not
+    given), and return the buffer. The output is the same as that of
+    `sexp_to_byte_iterator`, written in bulk rather than a few bytes at a time.
+
+    Raises `ValueError` if more than `max_size` bytes would be written, in
+    which case `buf` is left as it was.
+    """
+    if buf is None:
+        buf = bytearray()
+    start = len(buf)
+    try:
+        if allow_backrefs:
+            _write_sexp_with_backrefs(sexp, buf, start + max_size, ReadStackIndex())
+        else:
+            _write_sexp(sexp, buf, start + max_size)
+    except ValueError:
+        del buf[start:]
+        raise
+    return buf
+
+
 def sexp_to_stream(
     sexp: CLVMStorage, f: typing.BinaryIO, *, allow_backrefs: bool = False, max_size: int = MAX_SAFE_BYTES
 ) -> None:
-    for b in sexp_to_byte_iterator(sexp, allow_backrefs=allow_backrefs):
-        max_size -= len(b)
-        if max_size < 0:
-            raise ValueError("SExp exceeds maximum size")
-        f.write(b)
+    f.write(sexp_to_bytearray(sexp, allow_backrefs=allow_backrefs, max_size=max_size))
 
 
 def msb_mask(byte: int) -> int:
@@ -187,78 +369,283 @@ def traverse_path(
     return obj
 
 
-def _op_cons(
-    op_stack: OpStackType[CS],
-    val_stack: ValStackType,
-    f: typing.BinaryIO,
-    to_sexp: ToCLVMStorage[CS],
-) -> ValStackType:
-    assert val_stack.pair is not None
-    right, val_stack = val_stack.pair
-    assert val_stack.pair is not None
-    left, val_stack = val_stack.pair
-    new_cons = to_sexp((left, right))
-    return to_sexp((new_cons, val_stack))
-
-
-def _op_read_sexp(
-    op_stack: OpStackType[CS],
-    val_stack: ValStackType,
-    f: typing.BinaryIO,
-    to_sexp: ToCLVMStorage[CS],
-) -> ValStackType:
-    blob = f.read(1)
-    if len(blob) == 0:
-        raise ValueError("bad encoding")
-    b = blob[0]
-    if b == CONS_BOX_MARKER:
-        op_stack.append(_op_cons)
-        op_stack.append(_op_read_sexp)
-        op_stack.append(_op_read_sexp)
-        return val_stack
-    atom_as_sexp = to_sexp(_atom_from_stream(f, b))
-    return to_sexp((atom_as_sexp, val_stack))
-
-
-def _op_read_sexp_allow_backrefs(
-    op_stack: OpStackType[CS],
-    val_stack: ValStackType,
-    f: typing.BinaryIO,
-    to_sexp: ToCLVMStorage[CS],
-) -> CLVMStorage:
-    blob = f.read(1)
-    if len(blob) == 0:
-        raise ValueError("bad encoding")
-    b = blob[0]
-    if b == CONS_BOX_MARKER:
-        op_stack.append(_op_cons)
-        op_stack.append(_op_read_sexp_allow_backrefs)
-        op_stack.append(_op_read_sexp_allow_backrefs)
-        return val_stack
-    if b == BACK_REFERENCE:
-        blob = f.read(1)
-        if len(blob) == 0:
-            raise ValueError("bad encoding")
-        path = _atom_from_stream(f, blob[0])
-        backref = traverse_path(val_stack, path, to_sexp)
-        return to_sexp((backref, val_stack))
-    atom_as_sexp = to_sexp(_atom_from_stream(f, b))
-    return to_sexp((atom_as_sexp, val_stack))
+# ops used by the list based parsers
+_READ = 0
+_CONS = 1
 
 
 def sexp_from_stream(
     f: typing.BinaryIO, to_sexp: ToCLVMStorage[CS], *, allow_backrefs: bool = False
 ) -> CS:
-    op_stack: OpStackType[CS] = [
-        _op_read_sexp_allow_backrefs if allow_backrefs else _op_read_sexp
-    ]
-    val_stack: ValStackType = to_sexp(b"")
+    # the parse stack is kept as a list rather than a cons list, so `to_sexp`
+    # is only called for the nodes of the object, and back references are
+    # resolved by indexing into it with `_traverse_values`
+    op_stack = [_READ]
+    values: typing.List[CS] = []
+
+    while op_stack:
+        if op_stack.pop() == _CONS:
+            right = values.pop()
+            values[-1] = to_sexp((values[-1], right))
+            continue
+
+        blob = f.read(1)
+        if len(blob) == 0:
+            raise ValueError("bad encoding")
+        b = blob[0]
+        if b == CONS_BOX_MARKER:
+            op_stack.append(_CONS)
+            op_stack.append(_READ)
+            op_stack.append(_READ)
+        elif allow_backrefs and b == BACK_REFERENCE:
+            blob = f.read(1)
+            if len(blob) == 0:
+                raise ValueError("bad encoding")
+            path = _atom_from_stream(f, blob[0])
+            values.append(_traverse_values(values, path, to_sexp))  # type: ignore[arg-type]
+        else:
+            values.append(to_sexp(_atom_from_stream(f, b)))
+
+    return to_sexp(values[0])
+
+
+# a `BufferAtom` takes about as much memory as a `bytes` of this length, so
+# shorter atoms are copied even when `zero_copy` is set
+MIN_ZERO_COPY_ATOM = 192
+
+
+class BufferAtom:
+    """
+    `BufferAtom` is an atom that's a slice of a buffer, which implements the
+    CLVM object protocol without copying the slice until `atom` is first
+    read. `atom` is always `bytes`, so it works with everything that takes a
+    CLVM object, and once it's read the buffer is no longer referenced.
+    """
+
+    atom: typing.Optional[bytes]
+    pair: typing.Optional[typing.Tuple[CLVMStorage, CLVMStorage]]
+    # `atom` and `pair` are unset until the atom is read, which sends reads
+    # of them to `__getattr__` once
+    __slots__ = ["atom", "pair", "_view"]
+
+    def __init__(self, view: memoryview) -> None:
+        self._view = view
+
+    def __getattr__(self, name: str) -> typing.Any:
+        if name not in ("atom", "pair"):
+            raise AttributeError(name)
+        self.atom = bytes(self._view)
+        self.pair = None
+        del self._view
+        return getattr(self, name)
+
+
+def _traverse_values(
+    values: typing.List[CS], path: bytes, to_sexp: ToCLVMStorage[CS]
+) -> CLVMStorage:
+    # resolve a back reference against the parse stack, as `traverse_path`
+    # would against the stack as a cons list, i.e. with the last item of
+    # `values` first. Moving down the stack is just moving an index, so this
+    # takes time proportional to the length of the path
+    first = 0
+    while first < len(path) and path[first] == 0:
+        first += 1
+    if first == len(path):
+        return to_sexp(b"")
+
+    index = len(values)
+    obj: typing.Optional[CLVMStorage] = None
+    if len(path) - first <= 2:
+        # most paths are short, and shifting a small int is the fastest way
+        # to step through them
+        path_as_int = int.from_bytes(path, "big")
+        while path_as_int > 1:
+            if obj is not None:
+                if obj.pair is None:
+                    raise ValueError("path into atom", obj)
+                obj = obj.pair[path_as_int & 1]
+            elif index == 0:
+                raise ValueError("path into atom", to_sexp(b""))
+            elif path_as_int & 1:
+                index -= 1
+            else:
+                obj = values[index - 1]
+            path_as_int >>= 1
+    else:
+        # shifting a long int copies it, so read long paths a bit at a time
+        # from their bytes
+        for byte_index in range(len(path) - 1, first - 1, -1):
+            byte = path[byte_index]
+            if byte == 0xFF and obj is None and index >= 8 and byte_index != first:
+                # eight steps down the stack, which is most of a long path
+                index -= 8
+                continue
+            # the leading 1 bit of the path isn't a step
+            for _ in range(byte.bit_length() - 1 if byte_index == first else 8):
+                if obj is not None:
+                    if obj.pair is None:
+                        raise ValueError("path into atom", obj)
+                    obj = obj.pair[byte & 1]
+                elif index == 0:
+                    raise ValueError("path into atom", to_sexp(b""))
+                elif byte & 1:
+                    index -= 1
+                else:
+                    obj = values[index - 1]
+                byte >>= 1
+
+    if obj is None:
+        # the path ends in the stack itself, so build that part of it
+        obj = to_sexp(b"")
+        for v in values[:index]:
+            obj = to_sexp((v, obj))
+    return obj
+
+
+def _atom_span(data: _IndexableType, offset: int) -> typing.Tuple[int, int]:
+    """
+    Decode the header of the atom at `offset`, and return the start and end
+    offsets of its bytes.
+    """
+    end = len(data)
+    if offset >= end:
+        raise ValueError("bad encoding")
+    b = data[offset]
+    offset += 1
+    if b == 0x80:
+        return offset, offset
+    if b <= MAX_SINGLE_BYTE:
+        return offset - 1, offset
+    bit_count = 0
+    bit_mask = 0x80
+    while b & bit_mask:
+        bit_count += 1
+        b &= 0xFF ^ bit_mask
+        bit_mask >>= 1
+    size = b
+    if bit_count > 1:
+        if offset + bit_count - 1 > end:
+            raise ValueError("bad encoding")
+        for _ in range(bit_count - 1):
+            size = (size << 8) | data[offset]
+            offset += 1
+    if size >= 0x400000000:
+        raise ValueError("blob too large")
+    if offset + size > end:
+        raise ValueError("bad encoding")
+    return offset, offset + size
+
+
+def sexp_from_buffer(
+    buf: BufferType,
+    to_sexp: ToCLVMStorage[CS],
+    offset: int = 0,
+    *,
+    allow_backrefs: bool = False,
+    zero_copy: bool = False,
+) -> typing.Tuple[CS, int]:
+    """
+    Parse the serialized object starting at `offset` in `buf`, and return it
+    along with the offset just past it. This produces the same trees as
+    `sexp_from_stream`, but reads the buffer by index rather than with many
+    small reads.
+
+    With `zero_copy`, atoms of at least `MIN_ZERO_COPY_ATOM` bytes are
+    `BufferAtom`s, which are only copied out of `buf` when they're first
+    read, and are passed to `to_sexp` as they are. Smaller atoms are copied,
+    since a `BufferAtom` is bigger than a short `bytes`. Until they're read,
+    they keep `buf` alive, and `buf` must not be changed.
+    """
+    view = memoryview(buf)
+    if view.format != "B" or view.ndim != 1:
+        view = view.cast("B")
+    # indexing and slicing `bytes` (or `mmap`) directly is faster than going
+    # through a `memoryview`, and slices of it are already `bytes`
+    data: _IndexableType = buf if isinstance(buf, (bytes, mmap.mmap)) else view
+    end = len(data)
+
+    op_stack = [_READ]
+    values: typing.List[CS] = []
 
     while op_stack:
-        func = op_stack.pop()
-        val_stack = func(op_stack, val_stack, f, to_sexp)
-    assert val_stack.pair is not None
-    return to_sexp(val_stack.pair[0])
+        if op_stack.pop() == _CONS:
+            right = values.pop()
+            values[-1] = to_sexp((values[-1], right))
+            continue
+
+        if offset >= end:
+            raise ValueError("bad encoding")
+        b = data[offset]
+        offset += 1
+
+        if b == CONS_BOX_MARKER:
+            op_stack.append(_CONS)
+            op_stack.append(_READ)
+            op_stack.append(_READ)
+            continue
+
+        is_backref = allow_backrefs and b == BACK_REFERENCE
+        if is_backref:
+            if offset >= end:
+                raise ValueError("bad encoding")
+            b = data[offset]
+            offset += 1
+
+        if b == 0x80:
+            start = offset
+        elif b <= MAX_SINGLE_BYTE:
+            start = offset - 1
+        else:
+            start, offset = _atom_span(data, offset - 1)
+
+        if zero_copy and offset - start >= MIN_ZERO_COPY_ATOM and not is_backref:
+            values.append(to_sexp(BufferAtom(view[start:offset])))
+            continue
+        sliced = data[start:offset]
+        atom = sliced if isinstance(sliced, bytes) else bytes(sliced)
+
+        if is_backref:
+            values.append(_traverse_values(values, atom, to_sexp))  # type: ignore[arg-type]
+        else:
+            values.append(to_sexp(atom))
+
+    return to_sexp(values[0]), offset
+
+
+def sexp_from_bytes(
+    blob: BufferType, to_sexp: ToCLVMStorage[CS], *, allow_backrefs: bool = False
+) -> CS:
+    """
+    Parse a serialized object from `blob`. Like `sexp_from_stream`, anything
+    after the object is ignored.
+    """
+    return sexp_from_buffer(blob, to_sexp, allow_backrefs=allow_backrefs)[0]
+
+
+def sexp_from_file(
+    path: typing.Union[str, "os.PathLike[str]"],
+    to_sexp: ToCLVMStorage[CS],
+    offset: int = 0,
+    *,
+    allow_backrefs: bool = False,
+    zero_copy: bool = False,
+) -> CS:
+    """
+    Parse the serialized object at `offset` in the file at `path`. The file is
+    memory mapped rather than read, so it isn't copied into the heap.
+
+    With `zero_copy`, long atoms are `BufferAtom`s of the mapping (see
+    `sexp_from_buffer`), and the mapping stays open until they've all been
+    read or are gone.
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # if this raises, the traceback still references a view of the mapping,
+    # so it's left to be closed when it's collected
+    r = sexp_from_buffer(mapping, to_sexp, offset, allow_backrefs=allow_backrefs, zero_copy=zero_copy)[0]
+    if not zero_copy:
+        mapping.close()
+    return r
 
 
 def _op_consume_sexp(f: typing.BinaryIO) -> typing.Tuple[bytes, int]:
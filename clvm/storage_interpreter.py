@@ -0,0 +1,240 @@
+from typing import Dict, List, Optional, Tuple
+
+from . import core_ops
+from .CLVMObject import CLVMObject, CLVMStorage
+from .EvalError import EvalError
+from .SExp import SExp
+from .operators import OperatorDict
+
+from .costs import (
+    APPLY_COST,
+    QUOTE_COST,
+    PATH_LOOKUP_BASE_COST,
+    PATH_LOOKUP_COST_PER_LEG,
+    PATH_LOOKUP_COST_PER_ZERO_BYTE,
+    IF_COST,
+    CONS_COST,
+    FIRST_COST,
+    REST_COST,
+    LISTP_COST,
+)
+
+# ops on the op stack
+EVAL = 0
+APPLY = 1
+CONS = 2
+
+# core operators that are evaluated inline, as long as the `OperatorDict`
+# maps them to the implementations in `core_ops`
+OP_FIRST = 1
+OP_REST = 2
+OP_CONS = 3
+OP_LISTP = 4
+OP_IF = 5
+
+INLINE_CORE_OPS: Dict[int, object] = {
+    OP_FIRST: core_ops.op_first,
+    OP_REST: core_ops.op_rest,
+    OP_CONS: core_ops.op_cons,
+    OP_LISTP: core_ops.op_listp,
+    OP_IF: core_ops.op_if,
+}
+
+NULL = SExp.null()
+TRUE = SExp.true
+
+
+def traverse_path(path: bytes, env: CLVMStorage) -> Tuple[int, CLVMStorage]:
+    """
+    Look up `path` in `env`, returning the cost charged by `run_program` for
+    the lookup and the value found.
+    """
+    path_as_int = int.from_bytes(path, "big")
+    cost = PATH_LOOKUP_BASE_COST + PATH_LOOKUP_COST_PER_LEG
+    if path_as_int == 0:
+        return cost + len(path) * PATH_LOOKUP_COST_PER_ZERO_BYTE, NULL
+
+    bit_length = path_as_int.bit_length()
+    zero_bytes = len(path) - ((bit_length + 7) >> 3)
+    cost += zero_bytes * PATH_LOOKUP_COST_PER_ZERO_BYTE
+    cost += (bit_length - 1) * PATH_LOOKUP_COST_PER_LEG
+    while path_as_int > 1:
+        pair = env.pair
+        if pair is None:
+            raise EvalError("path into atom", SExp.to(env))
+        env = pair[path_as_int & 1]
+        path_as_int >>= 1
+    return cost, env
+
+
+class StorageInterpreter:
+    """
+    `StorageInterpreter` is an alternative to `Interpreter` whose eval loop
+    works directly on objects implementing the CLVM object protocol. It doesn't
+    wrap values in `SExp` (except to pass them to operators) and it doesn't
+    cons each operand with the environment before evaluating it. The core
+    operators `f`, `r`, `c`, `l` and `i` are evaluated inline without wrapping
+    at all.
+
+    The cost, result and errors are the same as for `run_program`.
+    """
+
+    def __init__(self, operator_lookup: OperatorDict) -> None:
+        self.operator_lookup = operator_lookup
+        # `inline_ops` as of the `OperatorDict` and its `version` that it was
+        # computed from
+        self._inline_ops: Dict[bytes, int] = {}
+        self._inline_ops_lookup: Optional[OperatorDict] = None
+        self._inline_ops_version = 0
+
+    def inline_ops(self) -> Dict[bytes, int]:
+        """
+        Return the opcodes that can be evaluated inline, i.e. the ones for
+        which `operator_lookup` still has the stock core operator.
+
+        For an `OperatorDict`, this is only recomputed when its `version`
+        says it has changed. Any other mapping is read every time.
+        """
+        operator_lookup = self.operator_lookup
+        if not isinstance(operator_lookup, OperatorDict):
+            return self._find_inline_ops()
+        if operator_lookup is self._inline_ops_lookup and operator_lookup.version == self._inline_ops_version:
+            return self._inline_ops
+        # read the version first, so a change while computing is noticed
+        version = operator_lookup.version
+        self._inline_ops = self._find_inline_ops()
+        self._inline_ops_lookup = operator_lookup
+        self._inline_ops_version = version
+        return self._inline_ops
+
+    def _find_inline_ops(self) -> Dict[bytes, int]:
+        operator_lookup = self.operator_lookup
+        r = {}
+        for op, f in INLINE_CORE_OPS.items():
+            for atom, g in operator_lookup.items():
+                if g is f:
+                    r[atom] = op
+        return r
+
+    def run(
+        self,
+        program: CLVMStorage,
+        args: CLVMStorage,
+        max_cost: Optional[int] = None,
+    ) -> Tuple[int, SExp]:
+        operator_lookup = self.operator_lookup
+        quote_atom = operator_lookup.quote_atom
+        apply_atom = operator_lookup.apply_atom
+        inline_ops = self.inline_ops()
+        # values go back to the caller as the program's class, as with
+        # `run_program`
+        _program = SExp.to(program)
+
+        op_stack: List[int] = [EVAL]
+        # pairs of (program, env) waiting to be evaluated
+        eval_stack: List[CLVMStorage] = [program, args]
+        value_stack: List[CLVMStorage] = []
+        cost: int = 0
+
+        while op_stack:
+            op = op_stack.pop()
+
+            if op == CONS:
+                v = value_stack.pop()
+                value_stack[-1] = CLVMObject((v, value_stack[-1]))
+                continue
+
+            if op == EVAL:
+                env = eval_stack.pop()
+                sexp = eval_stack.pop()
+                pair = sexp.pair
+                if pair is None:
+                    assert sexp.atom is not None
+                    c, r = traverse_path(sexp.atom, env)
+                    value_stack.append(r)
+                    cost += c
+                else:
+                    operator, operand_list = pair
+                    if operator.pair is not None:
+                        new_operator, must_be_nil = operator.pair
+                        if new_operator.pair is not None or must_be_nil.atom != b"":
+                            raise EvalError(
+                                "in ((X)...) syntax X must be lone atom", _program.to(sexp)
+                            )
+                        value_stack.append(new_operator)
+                        value_stack.append(operand_list)
+                        op_stack.append(APPLY)
+                        cost += APPLY_COST
+                    elif operator.atom == quote_atom:
+                        value_stack.append(operand_list)
+                        cost += QUOTE_COST
+                    else:
+                        # operands are evaluated last to first, and consed
+                        # onto the list of evaluated operands as they finish
+                        op_stack.append(APPLY)
+                        value_stack.append(operator)
+                        value_stack.append(NULL)
+                        while operand_list.pair is not None:
+                            operand, operand_list = operand_list.pair
+                            op_stack.append(CONS)
+                            op_stack.append(EVAL)
+                            eval_stack.append(operand)
+                            eval_stack.append(env)
+                        if operand_list.atom != b"":
+                            raise EvalError("first of non-cons", _program.to(operand_list))
+                        cost += 1
+
+            else:
+                operand_list = value_stack.pop()
+                operator = value_stack.pop()
+                if operator.pair is not None:
+                    raise EvalError("internal error", _program.to(operator))
+                atom = operator.atom
+                assert atom is not None
+                p0 = operand_list.pair
+                p1 = p0[1].pair if p0 is not None else None
+                p2 = p1[1].pair if p1 is not None else None
+                inline_op = inline_ops.get(atom)
+
+                if atom == apply_atom:
+                    if p1 is None or p2 is not None:
+                        raise EvalError(
+                            "apply requires exactly 2 parameters", _program.to(operand_list)
+                        )
+                    assert p0 is not None
+                    eval_stack.append(p0[0])
+                    eval_stack.append(p1[0])
+                    op_stack.append(EVAL)
+                    cost += APPLY_COST
+                # the inline core operators only handle well-formed arguments;
+                # anything else is passed to the operator to raise the error
+                elif inline_op == OP_FIRST and p0 is not None and p1 is None and p0[0].pair is not None:
+                    value_stack.append(p0[0].pair[0])
+                    cost += FIRST_COST
+                elif inline_op == OP_REST and p0 is not None and p1 is None and p0[0].pair is not None:
+                    value_stack.append(p0[0].pair[1])
+                    cost += REST_COST
+                elif inline_op == OP_CONS and p1 is not None and p2 is None:
+                    assert p0 is not None
+                    value_stack.append(CLVMObject((p0[0], p1[0])))
+                    cost += CONS_COST
+                elif inline_op == OP_LISTP and p0 is not None and p1 is None:
+                    value_stack.append(NULL if p0[0].pair is None else TRUE)
+                    cost += LISTP_COST
+                elif inline_op == OP_IF and p2 is not None and p2[1].pair is None:
+                    assert p0 is not None and p1 is not None
+                    condition = p0[0].atom
+                    if condition is not None and len(condition) == 0:
+                        value_stack.append(p2[0])
+                    else:
+                        value_stack.append(p1[0])
+                    cost += IF_COST
+                else:
+                    additional_cost, r = operator_lookup(atom, _program.to(operand_list))
+                    value_stack.append(r)
+                    cost += additional_cost
+
+            if max_cost and cost > max_cost:
+                raise EvalError("cost exceeded", _program.to(max_cost))
+
+        return cost, _program.to(value_stack[-1])
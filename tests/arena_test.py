@@ -0,0 +1,89 @@
+import gzip
+import unittest
+
+from clvm.SExp import SExp
+from clvm.arena import ATOM, PAIR, Arena, ArenaNode
+from clvm.object_cache import ObjectCache, treehash
+from clvm.operators import OPERATOR_LOOKUP
+from clvm.run_program import run_program
+from clvm.serialize import sexp_from_buffer, to_clvm_object
+
+from clvm_tools.binutils import assemble
+
+
+class ArenaTest(unittest.TestCase):
+    def test_generator(self) -> None:
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        expected = SExp(sexp_from_buffer(blob, to_clvm_object)[0])
+        for buf in (blob, bytearray(blob), memoryview(blob)):
+            arena = Arena()
+            index, end = arena.parse(buf)
+            self.assertEqual(end, len(blob))
+            s = SExp.to(arena.node(index))
+            self.assertEqual(s.as_bin(), blob)
+            self.assertEqual(arena.serialize(index), blob)
+            tree_hash = ObjectCache(treehash).get(expected)
+            self.assertEqual(ObjectCache(treehash).get(s), tree_hash)
+            self.assertEqual(arena.tree_hash(index), tree_hash)
+            self.assertLess(arena.nbytes, len(arena) * 9 + len(blob))
+
+    def test_nodes(self) -> None:
+        arena = Arena()
+        one = arena.new_atom(b"\x01")
+        nil = arena.new_atom(b"")
+        pair = arena.new_pair(one, nil)
+        self.assertEqual(len(arena), 3)
+        self.assertEqual(list(arena.kinds), [ATOM, ATOM, PAIR])
+        self.assertEqual(arena.atom(one), b"\x01")
+        self.assertEqual(arena.atom(nil), b"")
+        self.assertIsNone(arena.atom(pair))
+        self.assertEqual(arena.pair(pair), (one, nil))
+        self.assertIsNone(arena.pair(one))
+        self.assertEqual(SExp.to(arena.node(pair)), SExp.to([1]))
+        with self.assertRaises(AttributeError):
+            arena.node(pair).foo
+
+    def test_add(self) -> None:
+        shared = SExp.to([b"foo" * 10, 2])
+        obj = SExp.to([shared, shared, 3])
+        arena = Arena()
+        index = arena.add(obj)
+        self.assertEqual(SExp.to(arena.node(index)), obj)
+        self.assertEqual(arena.serialize(index), obj.as_bin())
+        self.assertEqual(arena.tree_hash(index), ObjectCache(treehash).get(obj))
+        with self.assertRaises(ValueError):
+            arena.serialize(index, max_size=30)
+        # `shared` is only copied once
+        self.assertEqual(len(arena.atom_bytes), 30 + 1 + 1)
+        # a pair of views already in the arena only adds the pair
+        size = len(arena)
+        self.assertEqual(arena.pair(arena.add(SExp.to((arena.node(index), arena.node(index))))), (index, index))
+        self.assertEqual(len(arena), size + 1)
+
+    def test_backrefs(self) -> None:
+        obj = SExp.to([[b"foo" * 20, 1], [b"foo" * 20, 1], b"bar"])
+        blob = obj.as_bin(allow_backrefs=True)
+        self.assertLess(len(blob), len(obj.as_bin()))
+        arena = Arena()
+        index, end = arena.parse(blob, allow_backrefs=True)
+        self.assertEqual(end, len(blob))
+        self.assertEqual(SExp.to(arena.node(index)), obj)
+
+    def test_parse_errors(self) -> None:
+        for blob in (b"", b"\xff\x01", b"\x82\x01"):
+            with self.assertRaises(ValueError):
+                Arena().parse(blob)
+
+    def test_run_program(self) -> None:
+        program = assemble("(c (+ 2 5) (f 11))")
+        args = SExp.to([100, 200, [300, 400]])
+        expected = run_program(program, args, OPERATOR_LOOKUP)
+        arena = Arena()
+        self.assertEqual(
+            run_program(
+                SExp.to(ArenaNode(arena, arena.parse(program.as_bin())[0])),
+                SExp.to(ArenaNode(arena, arena.add(args))),
+                OPERATOR_LOOKUP,
+            ),
+            expected,
+        )
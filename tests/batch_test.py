@@ -0,0 +1,59 @@
+import unittest
+from typing import List, Tuple
+
+from clvm.EvalError import EvalError
+from clvm.SExp import SExp
+from clvm.batch import BatchRunner, run_program_batch
+from clvm.operators import OPERATOR_LOOKUP, OperatorDict
+from clvm.run_program import run_program
+
+from clvm_tools.binutils import assemble
+
+
+def custom_operator_lookup() -> OperatorDict:
+    def op_double(args: SExp) -> Tuple[int, SExp]:
+        return 10, args.to(args.first().as_int() * 2)
+
+    operator_lookup = OperatorDict(OPERATOR_LOOKUP)
+    operator_lookup[b"\x40"] = op_double
+    return operator_lookup
+
+
+ITEMS: List[Tuple[str, str]] = [
+    ("(+ 2 5)", "(100 200)"),
+    ("(c 2 (c 5 ()))", "(100 200)"),
+    ("(f 2)", "(100 200)"),
+    ("(x (q . 1000))", "()"),
+    ("(sha256 2 5)", "(1 2)"),
+    ("(a (q . (* 2 2)) 1)", "(12345)"),
+]
+
+
+class BatchTest(unittest.TestCase):
+    def test_run_program_batch(self) -> None:
+        items = [(assemble(p), assemble(a)) for p, a in ITEMS] * 5
+        results = run_program_batch(items, max_workers=2, chunksize=4)
+        self.assertEqual(len(results), len(items))
+        for (program, args), r in zip(items, results):
+            try:
+                expected_cost, expected_result = run_program(program, args, OPERATOR_LOOKUP)
+            except EvalError as e:
+                assert isinstance(r, EvalError)
+                self.assertEqual(str(r), str(e))
+                self.assertEqual(r._sexp, e._sexp)
+            else:
+                self.assertEqual(r, (expected_cost, expected_result))
+
+    def test_max_cost(self) -> None:
+        items = [(assemble("(+ 2 5)"), assemble("(100 200)"))]
+        cost, _ = run_program_batch(items, max_workers=1)[0]  # type: ignore[misc]
+        self.assertEqual(run_program_batch(items, max_cost=cost, max_workers=1)[0], (cost, SExp.to(300)))
+        r = run_program_batch(items, max_cost=cost - 1, max_workers=1)[0]
+        assert isinstance(r, EvalError)
+        self.assertEqual(str(r), "cost exceeded")
+
+    def test_operator_lookup_factory(self) -> None:
+        with BatchRunner(max_workers=1, operator_lookup_factory=custom_operator_lookup) as runner:
+            for _ in range(2):
+                r = runner.run([(assemble("(64 2)"), assemble("(21)"))])
+                self.assertEqual(r[0][1], SExp.to(42))  # type: ignore[index]
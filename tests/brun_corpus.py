@@ -0,0 +1,78 @@
+import os
+import shlex
+from typing import Callable, List, Optional, Tuple, Union
+
+from clvm.EvalError import EvalError
+from clvm.SExp import SExp
+
+from clvm_tools.binutils import assemble
+
+
+def brun_corpus(*paths: str) -> List[Tuple[str, SExp, SExp, int]]:
+    """
+    Return `(name, program, args, max_cost)` for every `brun` invocation in
+    the `.txt` test cases under `paths`. This lets tests compare alternative
+    interpreters against `run_program` on the same programs `cmds_test` uses.
+    """
+    if not paths:
+        paths = ("brun", "edge-cases", "unknown-op")
+    prefix = os.path.dirname(__file__)
+    cases = []
+    for path in paths:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(prefix, path)):
+            for fn in sorted(filenames):
+                if not fn.endswith(".txt") or fn[0] == ".":
+                    continue
+                p = os.path.join(dirpath, fn)
+                with open(p) as f:
+                    lines = [line for line in f.read().split("\n") if line[:1] != "#"]
+                cmd = ""
+                for line in lines:
+                    if line[-1:] == "\\":
+                        cmd += line[:-1]
+                        continue
+                    cmd += line
+                    break
+                name = os.path.relpath(p, prefix)
+                for idx, c in enumerate(cmd.split(";")):
+                    args = shlex.split(c)
+                    if args[:1] != ["brun"]:
+                        continue
+                    positional = []
+                    max_cost = 11000000000  # the `brun` default
+                    i = 1
+                    while i < len(args):
+                        arg = args[i]
+                        if arg in ("-m", "--max-cost"):
+                            max_cost = int(args[i + 1])
+                            i += 1
+                        elif arg == "--backend":
+                            i += 1
+                        elif arg[:1] != "-" or arg == "-":
+                            positional.append(arg)
+                        i += 1
+                    try:
+                        program = SExp.to(assemble(positional[0]))
+                        env = SExp.to(assemble(positional[1] if len(positional) > 1 else "()"))
+                    except SyntaxError:
+                        # some cases exercise the assembler rather than the VM
+                        continue
+                    cases.append(("%s:%d" % (name, idx), program, env, max_cost))
+    return cases
+
+
+RunFunction = Callable[[SExp, SExp, Optional[int]], Tuple[int, SExp]]
+
+
+def outcome(
+    f: RunFunction, program: SExp, args: SExp, max_cost: Optional[int]
+) -> Union[Tuple[int, bytes], str]:
+    """
+    Run `f` and return `(cost, serialized result)`, or a description of the
+    `EvalError` it raised, so the outcomes of two interpreters can be compared.
+    """
+    try:
+        cost, r = f(program, args, max_cost)
+        return cost, r.as_bin()
+    except EvalError as e:
+        return "%s %s" % (e, e._sexp)
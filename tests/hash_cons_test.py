@@ -0,0 +1,52 @@
+import gzip
+import io
+import unittest
+from typing import Callable, List
+
+from clvm.CLVMObject import CLVMStorage
+from clvm.SExp import SExp
+from clvm.hash_cons import HashConser
+from clvm.object_cache import ObjectCache, treehash
+from clvm.serialize import sexp_from_buffer, sexp_from_stream, to_clvm_object
+
+
+class HashConserTest(unittest.TestCase):
+    def test_generator(self) -> None:
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        expected = SExp(sexp_from_buffer(blob, to_clvm_object)[0])
+        tree_hash = ObjectCache(treehash).get(expected)
+        distinct = HashConser()
+        distinct.intern(expected)
+        self.assertGreater(distinct.dedup_ratio, 20)
+        compressed = expected.as_bin(allow_backrefs=True)
+        parsers: List[Callable[[HashConser], CLVMStorage]] = [
+            lambda h: sexp_from_stream(io.BytesIO(blob), h),
+            lambda h: sexp_from_buffer(blob, h)[0],
+            lambda h: sexp_from_buffer(bytearray(blob), h, zero_copy=True)[0],
+            lambda h: sexp_from_stream(io.BytesIO(compressed), h, allow_backrefs=True),
+            lambda h: h.intern(expected),
+        ]
+        for parse in parsers:
+            conser = HashConser()
+            root = parse(conser)
+            obj = SExp.to(root)
+            self.assertEqual(obj.as_bin(), blob)
+            self.assertEqual(ObjectCache(treehash).get(obj), tree_hash)
+            self.assertEqual(len(conser), len(distinct))
+            # parsing it again makes no new nodes
+            size = len(conser)
+            self.assertIs(parse(conser), root)
+            self.assertEqual(len(conser), size)
+
+    def test_shared(self) -> None:
+        conser = HashConser()
+        obj = SExp.to([[1, b"foo"], [1, b"foo"], [2]], hash_cons=conser)
+        self.assertEqual(obj, SExp.to([[1, b"foo"], [1, b"foo"], [2]]))
+        self.assertIs(obj.first().pair, obj.rest().first().pair)
+        # one list cell and nil for (2), (1 foo) and the list itself
+        self.assertEqual(len(conser), 2 + 4 + 3 + 1)
+        other = SExp.to(SExp.to([9, [1, b"foo"]]), hash_cons=conser)
+        self.assertIs(other.rest().first().pair, obj.first().pair)
+        conser.clear()
+        self.assertEqual(len(conser), 0)
+        self.assertEqual(conser.dedup_ratio, 1.0)
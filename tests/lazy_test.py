@@ -0,0 +1,53 @@
+import gzip
+import io
+import unittest
+
+from clvm.SExp import SExp
+from clvm.lazy import LazyCLVMObject
+from clvm.operators import OPERATOR_LOOKUP
+from clvm.run_program import run_program
+from clvm.serialize import sexp_from_stream, to_clvm_object
+
+from clvm_tools.binutils import assemble
+
+
+class LazyCLVMObjectTest(unittest.TestCase):
+    def test_generator(self) -> None:
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        expected = SExp(sexp_from_stream(io.BytesIO(blob), to_clvm_object))
+        for buf in (blob, bytearray(blob), memoryview(blob)):
+            lazy = LazyCLVMObject(buf)
+            self.assertEqual(lazy.end_offset(), len(blob))
+            s = SExp.to(lazy)
+            self.assertEqual(s.first(), expected.first())
+            self.assertEqual(s.as_bin(), blob)
+
+    def test_decode_on_demand(self) -> None:
+        # the tail of the list is garbage, but it's never decoded
+        blob = SExp.to([1, 2]).as_bin()[:-1] + b"\xff"
+        s = SExp.to(LazyCLVMObject(blob))
+        self.assertEqual(s.first(), SExp.to(1))
+        self.assertEqual(s.rest().first(), SExp.to(2))
+        with self.assertRaises(ValueError):
+            s.rest().rest().rest()
+        with self.assertRaises(ValueError):
+            LazyCLVMObject(b"").atom
+
+    def test_run_program(self) -> None:
+        program = assemble("(c (+ 2 5) (f 11))")
+        args = SExp.to([100, 200, [300, 400]])
+        expected = run_program(program, args, OPERATOR_LOOKUP)
+        self.assertEqual(
+            run_program(
+                SExp.to(LazyCLVMObject(program.as_bin())),
+                SExp.to(LazyCLVMObject(args.as_bin())),
+                OPERATOR_LOOKUP,
+            ),
+            expected,
+        )
+
+    def test_offset(self) -> None:
+        blob = SExp.to(1).as_bin() + SExp.to([2, 3]).as_bin()
+        first = LazyCLVMObject(blob)
+        second = LazyCLVMObject(blob, first.end_offset())
+        self.assertEqual(SExp.to(second), SExp.to([2, 3]))
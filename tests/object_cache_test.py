@@ -1,6 +1,20 @@
+import gzip
+import hashlib
 import unittest
 
-from clvm.object_cache import ObjectCache, treehash, serialized_length
+from clvm.CLVMObject import CLVMObject, HashedCLVMObject
+from clvm.SExp import SExp
+from clvm.object_cache import (
+    ATOM_HASH_MEMO_SIZE,
+    BoundedObjectCache,
+    ObjectCache,
+    _atom_hashes,
+    atom_hash,
+    tree_metrics,
+    treehash,
+    serialized_length,
+)
+from clvm.serialize import sexp_from_buffer, to_clvm_object, to_hashed_clvm_object
 
 from clvm_tools.binutils import assemble
 
@@ -12,6 +26,8 @@ class ObjectCacheTest(unittest.TestCase):
         self.assertEqual(th.get(obj).hex(), expected_hash)
         sl = ObjectCache(serialized_length)
         self.assertEqual(sl.get(obj), expected_length)
+        metrics = ObjectCache(tree_metrics).get(obj)
+        self.assertEqual(metrics[:2], (bytes.fromhex(expected_hash), expected_length))
 
     def test_various(self) -> None:
         self.check(
@@ -39,3 +55,95 @@ class ObjectCacheTest(unittest.TestCase):
             "0a072d7d860d77d8e290ced0fdb29a271198ca3db54d701c45d831e3aae6422c",
             47,
         )
+
+    def test_hashed_objects(self) -> None:
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        expected = ObjectCache(treehash).get(sexp_from_buffer(blob, to_clvm_object)[0])
+        obj = sexp_from_buffer(blob, to_hashed_clvm_object)[0]
+        assert isinstance(obj, HashedCLVMObject)
+        self.assertIsNone(obj.tree_hash)
+        self.assertEqual(ObjectCache(treehash).get(obj), expected)
+        self.assertEqual(obj.tree_hash, expected)
+        self.assertEqual(ObjectCache(treehash).get(obj), expected)
+
+        # the saved hash is used rather than the children
+        child = HashedCLVMObject(b"foo")
+        child.tree_hash = bytes(32)
+        parent = HashedCLVMObject((child, HashedCLVMObject(b"")))
+        self.assertEqual(
+            ObjectCache(treehash).get(parent),
+            hashlib.sha256(b"\2" + bytes(32) + atom_hash(b"")).digest(),
+        )
+        self.assertIs(HashedCLVMObject(parent), parent)
+
+    def test_atom_hash(self) -> None:
+        for atom in (b"", b"\x01", b"foo" * 100):
+            self.assertEqual(atom_hash(atom), hashlib.sha256(b"\1" + atom).digest())
+        self.assertNotIn(b"foo" * 100, _atom_hashes)
+        for i in range(ATOM_HASH_MEMO_SIZE * 2):
+            atom_hash(i.to_bytes(4, "big"))
+            self.assertLessEqual(len(_atom_hashes), ATOM_HASH_MEMO_SIZE)
+
+    def test_bounded(self) -> None:
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        obj = sexp_from_buffer(blob, to_clvm_object)[0]
+        expected_hash = ObjectCache(treehash).get(obj)
+        expected_length = ObjectCache(serialized_length).get(obj)
+        for maxsize in (1, 100, 1000000):
+            th = BoundedObjectCache(treehash, maxsize=maxsize)
+            self.assertEqual(th.get(obj), expected_hash)
+            self.assertLessEqual(len(th), maxsize)
+            sl = BoundedObjectCache(serialized_length, maxsize=maxsize)
+            self.assertEqual(sl.get(obj), expected_length)
+
+        th = BoundedObjectCache(treehash, max_bytes=100000)
+        th.get(obj)
+        self.assertLessEqual(th.nbytes, 100000)
+        self.assertGreater(th.evictions, 0)
+        info = th.cache_info()
+        self.assertEqual(info["nbytes"], th.nbytes)
+        self.assertEqual(info["currsize"], len(th))
+        th.clear()
+        self.assertEqual((len(th), th.nbytes, th.evictions), (0, 0, 0))
+
+    def test_bounded_shared(self) -> None:
+        # one cache shared by many computations only hashes a subtree once
+        th = BoundedObjectCache(treehash)
+        shared = SExp.to([b"foo" * 20, [1, 2, 3]])
+        self.assertEqual(th.get(shared), ObjectCache(treehash).get(shared))
+        self.assertEqual(th.cache_info()["misses"], 1)
+        size = len(th)
+        for i in range(10):
+            parent = CLVMObject((CLVMObject(bytes([i])), shared))
+            self.assertEqual(th.get(parent), ObjectCache(treehash).get(parent))
+            self.assertEqual(th.get(shared), ObjectCache(treehash).get(shared))
+        self.assertEqual(len(th), size + 20)
+        self.assertEqual(th.hits, 10)
+
+    def test_bounded_id_reuse(self) -> None:
+        # evicted objects are released, and their ids often reused right
+        # away, which mustn't return their values for the new objects
+        th = BoundedObjectCache(treehash, maxsize=1)
+        for i in range(1000):
+            obj = CLVMObject(b"%d" % i)
+            self.assertEqual(th.get(obj), atom_hash(b"%d" % i))
+            del obj
+
+    def test_tree_metrics(self) -> None:
+        obj = SExp.to([b"foo", [b"", 1000], b"x" * 100])
+        self.assertEqual(
+            ObjectCache(tree_metrics).get(obj),
+            (ObjectCache(treehash).get(obj), len(obj.as_bin()), 11, 4, 3 + 2 + 100),
+        )
+        self.assertEqual(ObjectCache(tree_metrics).get(SExp.to(b"")), (atom_hash(b""), 1, 1, 0, 0))
+
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        plain = sexp_from_buffer(blob, to_clvm_object)[0]
+        expected = ObjectCache(tree_metrics).get(plain)
+        self.assertEqual(expected[:2], (ObjectCache(treehash).get(plain), len(blob)))
+        self.assertEqual(BoundedObjectCache(tree_metrics, maxsize=10).get(plain), expected)
+        hashed = sexp_from_buffer(blob, to_hashed_clvm_object)[0]
+        assert isinstance(hashed, HashedCLVMObject)
+        self.assertEqual(ObjectCache(tree_metrics).get(hashed), expected)
+        self.assertEqual(hashed.tree_hash, expected[0])
+        self.assertEqual(ObjectCache(tree_metrics).get(hashed), expected)
@@ -1,8 +1,15 @@
 import unittest
 
-from typing import Dict
+from typing import Callable, Dict, List, Tuple
 
-from clvm.operators import OperatorProtocol, OperatorDict
+from clvm.EvalError import EvalError
+from clvm.SExp import SExp
+from clvm.operators import (
+    OperatorProtocol,
+    OperatorDict,
+    default_unknown_op,
+    unknown_op_cost_function,
+)
 
 
 class OperatorDictTest(unittest.TestCase):
@@ -30,3 +37,66 @@ class OperatorDictTest(unittest.TestCase):
         o2 = OperatorDict(o)
         self.assertEqual(o2.apply_atom, b"\01")
         self.assertEqual(o2.quote_atom, b"\02")
+
+    def test_dispatch_table_tracks_mutation(self) -> None:
+        def op_one(args: SExp) -> Tuple[int, SExp]:
+            return 1, args.to(1)
+
+        def op_two(args: SExp) -> Tuple[int, SExp]:
+            return 2, args.to(2)
+
+        def unknown_op(op: bytes, args: SExp) -> Tuple[int, SExp]:
+            return 0, args.to(op)
+
+        o = OperatorDict({b"\x10": op_one}, quote=b"\x01", apply=b"\x02", unknown_op_handler=unknown_op)
+        nil = SExp.null()
+        self.assertEqual(o(b"\x10", nil), (1, SExp.to(1)))
+        self.assertEqual(o(b"\x11", nil), (0, SExp.to(b"\x11")))
+
+        o[b"\x10"] = op_two
+        self.assertEqual(o(b"\x10", nil)[0], 2)
+        o.update({b"\x11": op_one, b"\x11\x11": op_two})
+        self.assertEqual(o(b"\x11", nil)[0], 1)
+        self.assertEqual(o(b"\x11\x11", nil)[0], 2)
+        del o[b"\x11"]
+        self.assertEqual(o(b"\x11", nil)[0], 0)
+        o.setdefault(b"\x12", op_one)
+        self.assertEqual(o(b"\x12", nil)[0], 1)
+        o.pop(b"\x12")
+        self.assertEqual(o(b"\x12", nil)[0], 0)
+        o |= {b"\x13": op_two}
+        self.assertEqual(o(b"\x13", nil)[0], 2)
+        o.clear()
+        self.assertEqual(o(b"\x10", nil)[0], 0)
+        self.assertEqual(o(b"\x13", nil)[0], 0)
+
+    def test_version(self) -> None:
+        def op_one(args: SExp) -> Tuple[int, SExp]:
+            return 1, args.to(1)
+
+        o = OperatorDict({b"\x10": op_one}, quote=b"\x01", apply=b"\x02")
+        versions = [o.version]
+        o(b"\x10", SExp.null())
+        self.assertEqual(o.version, versions[-1])
+        mutations: List[Callable[[], object]] = [
+            lambda: o.__setitem__(b"\x11", op_one),
+            lambda: o.__delitem__(b"\x11"),
+            lambda: o.update({b"\x12": op_one}),
+            lambda: o.__ior__({b"\x13": op_one}),
+            lambda: o.setdefault(b"\x14", op_one),
+            lambda: o.pop(b"\x14"),
+            lambda: o.popitem(),
+            lambda: o.clear(),
+        ]
+        for mutate in mutations:
+            mutate()
+            self.assertGreater(o.version, versions[-1])
+            versions.append(o.version)
+
+    def test_unknown_op_cost_memoized(self) -> None:
+        unknown_op_cost_function.cache_clear()
+        for _ in range(3):
+            self.assertEqual(default_unknown_op(b"\x01\x40", SExp.to([1, 2])), (2 * 745, SExp.null()))
+        self.assertEqual(unknown_op_cost_function.cache_info().hits, 2)
+        with self.assertRaises(EvalError):
+            default_unknown_op(b"\xff\xff\x40", SExp.null())
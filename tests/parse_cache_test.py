@@ -0,0 +1,63 @@
+import gzip
+import unittest
+
+from clvm.SExp import SExp
+from clvm.parse_cache import ParseCache
+
+
+class ParseCacheTest(unittest.TestCase):
+    def test_hits(self) -> None:
+        generator = gzip.GzipFile("tests/generator.bin.gz").read()
+        cache = ParseCache()
+        first = cache.parse(generator)
+        self.assertEqual(SExp.to(first).as_bin(), generator)
+        # equal bytes in a different object give the same tree
+        self.assertIs(cache.parse(bytes(bytearray(generator))), first)
+        self.assertEqual(
+            cache.cache_info(),
+            dict(
+                hits=1,
+                misses=1,
+                evictions=0,
+                maxbytes=cache.max_bytes,
+                currbytes=len(generator),
+                currsize=1,
+            ),
+        )
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.currbytes, 0)
+        self.assertIsNot(cache.parse(generator), first)
+
+    def test_eviction(self) -> None:
+        blobs = [SExp.to([i, b"x" * 90]).as_bin() for i in range(10)]
+        size = len(blobs[0])
+        cache = ParseCache(max_bytes=size * 3)
+        for blob in blobs[:3]:
+            cache.parse(blob)
+        # touch the oldest, so the second is evicted next
+        cache.parse(blobs[0])
+        cache.parse(blobs[3])
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.currbytes, size * 3)
+        misses = cache.misses
+        cache.parse(blobs[0])
+        cache.parse(blobs[2])
+        self.assertEqual(cache.misses, misses)
+        cache.parse(blobs[1])
+        self.assertEqual(cache.misses, misses + 1)
+        self.assertEqual(cache.evictions, 2)
+
+        # objects bigger than the whole cache aren't kept
+        big = SExp.to(b"x" * size * 4).as_bin()
+        self.assertEqual(SExp.to(cache.parse(big)).as_bin(), big)
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.evictions, 2)
+
+    def test_backrefs(self) -> None:
+        obj = SExp.to([b"foo" * 20] * 3)
+        blob = obj.as_bin(allow_backrefs=True)
+        self.assertLess(len(blob), len(obj.as_bin()))
+        self.assertEqual(SExp.to(ParseCache(allow_backrefs=True).parse(blob)), obj)
+        with self.assertRaises(ValueError):
+            ParseCache().parse(blob)
@@ -0,0 +1,55 @@
+import io
+import unittest
+
+from clvm.EvalError import EvalError
+from clvm.SExp import SExp
+from clvm.object_cache import ObjectCache, treehash
+from clvm.operators import OPERATOR_LOOKUP
+from clvm.profiler import Profiler
+from clvm.run_program import run_program
+
+from clvm_tools.binutils import assemble
+
+# count down from the argument with a recursive function
+COUNTDOWN = (
+    "(a (q . (a 2 (c 2 (c 5 ()))))"
+    " (c (q . (a (i 5 (q . (a 2 (c 2 (c (- 5 (q . 1)) ())))) (q . (q . 7))) 1)) 1))"
+)
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_profile(self) -> None:
+        program = assemble(COUNTDOWN)
+        args = assemble("(2)")
+        function = assemble("(a (i 5 (q . (a 2 (c 2 (c (- 5 (q . 1)) ())))) (q . (q . 7))) 1)")
+        root_hash = ObjectCache(treehash).get(program)
+        function_hash = ObjectCache(treehash).get(function)
+
+        profiler = Profiler(OPERATOR_LOOKUP, names={function_hash: "countdown"})
+        expected = run_program(program, args, OPERATOR_LOOKUP)
+        self.assertEqual(profiler.run_program(program, args), expected)
+        self.assertEqual(sum(profiler.cost.values()), expected[0])
+
+        frames = [tuple(line.rsplit(" ", 1)[0].split(";")) for line in profiler.collapsed_stacks()]
+        root = root_hash.hex()
+        self.assertIn((root,), frames)
+        # the countdown recurses three times, and every call is a frame. Each
+        # call also runs the branch chosen by `i` with `a`
+        deepest = max(frames, key=len)
+        self.assertEqual(deepest[0], root)
+        self.assertEqual(deepest[2], "countdown")
+        self.assertEqual(deepest.count("countdown"), 3)
+
+        f = io.StringIO()
+        profiler.write_collapsed(f, metric="time")
+        self.assertTrue(f.getvalue().startswith(root))
+
+        profiler.clear()
+        self.assertEqual(profiler.collapsed_stacks(), [])
+
+    def test_errors(self) -> None:
+        profiler = Profiler(OPERATOR_LOOKUP)
+        with self.assertRaises(EvalError):
+            profiler.run_program(assemble("(+ 2 5)"), SExp.to([1, 2]), max_cost=100)
+        with self.assertRaises(ValueError):
+            profiler.collapsed_stacks("memory")
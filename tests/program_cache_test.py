@@ -0,0 +1,68 @@
+import unittest
+from typing import Optional, Tuple
+
+from clvm.SExp import SExp
+from clvm.operators import OPERATOR_LOOKUP
+from clvm.program_cache import ProgramCache, path_legs
+from clvm.run_program import run_program
+
+from clvm_tools.binutils import assemble
+
+from .brun_corpus import brun_corpus, outcome
+
+
+class ProgramCacheTest(unittest.TestCase):
+    def test_path_legs(self) -> None:
+        self.assertEqual(path_legs(b""), (44, None))
+        self.assertEqual(path_legs(b"\x00"), (48, None))
+        self.assertEqual(path_legs(b"\x01"), (44, ()))
+        self.assertEqual(path_legs(b"\x02"), (48, (0,)))
+        self.assertEqual(path_legs(b"\x05"), (52, (1, 0)))
+        self.assertEqual(path_legs(b"\x00\x01\x00"), (80, (0,) * 8))
+
+    def test_brun_corpus(self) -> None:
+        cache = ProgramCache(OPERATOR_LOOKUP)
+
+        def run_cached(program: SExp, args: SExp, max_cost: Optional[int]) -> Tuple[int, SExp]:
+            return cache.run_program(program, args, max_cost=max_cost)
+
+        def run_reference(program: SExp, args: SExp, max_cost: Optional[int]) -> Tuple[int, SExp]:
+            return run_program(program, args, OPERATOR_LOOKUP, max_cost=max_cost)
+
+        for name, program, args, max_cost in brun_corpus():
+            expected = outcome(run_reference, program, args, max_cost)
+            self.assertEqual(outcome(run_cached, program, args, max_cost), expected, name)
+            if isinstance(expected, tuple):
+                # the cost limit must trip at exactly the same point
+                cost = expected[0]
+                for limit in (cost - 1, cost):
+                    self.assertEqual(
+                        outcome(run_cached, program, args, limit),
+                        outcome(run_reference, program, args, limit),
+                        name,
+                    )
+
+    def test_cache_counters(self) -> None:
+        cache = ProgramCache(OPERATOR_LOOKUP, maxsize=16)
+        # count down from 3 with a recursive function
+        program = assemble(
+            "(a (q . (a 2 (c 2 (c 5 ()))))"
+            " (c (q . (a (i 5 (q . (a 2 (c 2 (c (- 5 (q . 1)) ())))) (q . (q . 7))) 1)) 1))"
+        )
+        args = assemble("(3)")
+        expected = run_program(program, args, OPERATOR_LOOKUP)
+        self.assertEqual(cache.run_program(program, args), expected)
+        self.assertEqual(cache.misses, 5)
+        self.assertTrue(cache.hits > 0)
+
+        # a structurally identical program is found by tree hash
+        self.assertEqual(cache.run_program(SExp.to(program.as_python()), args), expected)
+        self.assertEqual(cache.misses, 5)
+        self.assertEqual(len(cache), 5)
+
+        small_cache = ProgramCache(OPERATOR_LOOKUP, maxsize=2)
+        self.assertEqual(small_cache.run_program(program, args), expected)
+        self.assertEqual(small_cache.cache_info()["currsize"], 2)
+
+        cache.clear()
+        self.assertEqual(cache.cache_info(), dict(hits=0, misses=0, maxsize=16, currsize=0))
@@ -0,0 +1,91 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from clvm.SExp import SExp
+from clvm.object_cache import ObjectCache, treehash
+from clvm.operators import OPERATOR_LOOKUP
+from clvm.program_store import MAGIC, ProgramStore
+from clvm.run_program import run_program
+from clvm.serialize import sexp_from_buffer, to_clvm_object
+
+from clvm_tools.binutils import assemble
+
+
+class ProgramStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "programs")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_round_trip(self) -> None:
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        generator = sexp_from_buffer(blob, to_clvm_object)[0]
+        small = SExp.to([1, b"foo", []])
+        with ProgramStore(self.path) as store:
+            tree_hash = store.put(generator)
+            self.assertEqual(tree_hash, ObjectCache(treehash).get(generator))
+            self.assertIn(tree_hash, store)
+            self.assertEqual(SExp.to(store.get(tree_hash)).as_bin(), blob)
+            # putting it again adds nothing
+            size = store.size
+            self.assertEqual(store.put(generator), tree_hash)
+            self.assertEqual(store.size, size)
+            small_hash = store.put(small)
+            self.assertEqual(SExp.to(store.get(small_hash)), small)
+            self.assertIsNone(store.get(bytes(32)))
+
+        with ProgramStore(self.path) as store:
+            self.assertEqual(SExp.to(store.get(tree_hash)).as_bin(), blob)
+            self.assertEqual(SExp.to(store.get(small_hash)), small)
+
+    def test_shared_subtrees(self) -> None:
+        # two programs that share a big module, with different arguments
+        module = SExp.to([b"module", [bytes([i]) * 40 for i in range(20)]])
+        programs = [SExp.to([b"a", (1, module), [b"c", (1, arg), 1]]) for arg in (b"first", b"second")]
+        with ProgramStore(self.path) as store:
+            store.put(programs[0])
+            size = store.size
+            tree_hash = store.put(programs[1])
+            self.assertLess(store.size - size, 200)
+            self.assertEqual(SExp.to(store.get(tree_hash)), programs[1])
+
+    def test_long_list(self) -> None:
+        items = SExp.to([b"%d" % i * 5 for i in range(2000)])
+        with ProgramStore(self.path) as store:
+            tree_hash = store.put(items)
+            # a long list is one record
+            self.assertEqual(len(store.index), 1)
+            self.assertEqual(SExp.to(store.get(tree_hash)), items)
+
+    def test_run_program(self) -> None:
+        program = assemble("(c (+ 2 5) (f 11))")
+        args = SExp.to([100, 200, [300, 400]])
+        with ProgramStore(self.path) as store:
+            loaded = store.get(store.put(program))
+            assert loaded is not None
+            self.assertEqual(
+                run_program(loaded, args, OPERATOR_LOOKUP),
+                run_program(program, args, OPERATOR_LOOKUP),
+            )
+
+    def test_incomplete_record(self) -> None:
+        with ProgramStore(self.path) as store:
+            tree_hash = store.put(SExp.to([1, 2, 3]))
+            size = store.size
+        # a record header saying there's more than there is
+        with open(self.path, "ab") as f:
+            f.write(bytes(32) + (100).to_bytes(4, "big") + bytes(10))
+        with ProgramStore(self.path) as store:
+            self.assertEqual(store.size, size)
+            self.assertEqual(SExp.to(store.get(tree_hash)), SExp.to([1, 2, 3]))
+        self.assertEqual(os.path.getsize(self.path), size)
+
+    def test_not_a_store(self) -> None:
+        with open(self.path, "wb") as f:
+            f.write(MAGIC[::-1])
+        with self.assertRaises(ValueError):
+            ProgramStore(self.path)
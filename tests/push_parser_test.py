@@ -0,0 +1,79 @@
+import gzip
+import random
+import unittest
+from typing import List
+
+from clvm.SExp import SExp
+from clvm.push_parser import PushParser
+from clvm.serialize import sexp_from_buffer, to_clvm_object
+
+
+def feed_in_chunks(parser: PushParser[SExp], blob: bytes, seed: int) -> List[bytes]:
+    rng = random.Random(seed)
+    r = []
+    offset = 0
+    while offset < len(blob):
+        size = rng.choice([1, 2, 3, 7, 100, 5000])
+        r.extend(parser.feed_buffers(blob[offset:offset + size]))
+        offset += size
+    return r
+
+
+class PushParserTest(unittest.TestCase):
+    def test_chunks(self) -> None:
+        generator = gzip.GzipFile("tests/generator.bin.gz").read()
+        messages = [
+            SExp.to(1).as_bin(),
+            generator,
+            SExp.to([b"", b"\x00", b"foo" * 30, [1, 2]]).as_bin(),
+            SExp.to(b"x" * 0x2001).as_bin(),
+        ]
+        blob = b"".join(messages)
+        for seed in range(3):
+            parser: PushParser[SExp] = PushParser(SExp.to)
+            self.assertEqual(feed_in_chunks(parser, blob, seed), messages)
+            self.assertEqual(parser.pending, 0)
+            parser.close()
+
+        # all at once
+        parser = PushParser(SExp.to)
+        expected = [SExp.to([b"", b"\x00", b"foo" * 30, [1, 2]]), SExp.to(1)]
+        self.assertEqual(parser.feed(messages[2] + messages[0]), expected)
+
+    def test_backrefs(self) -> None:
+        generator = gzip.GzipFile("tests/generator.bin.gz").read()
+        with_backrefs = SExp(sexp_from_buffer(generator, to_clvm_object)[0]).as_bin(allow_backrefs=True)
+        parser: PushParser[SExp] = PushParser(SExp.to, allow_backrefs=True)
+        self.assertEqual(feed_in_chunks(parser, with_backrefs + with_backrefs, 0), [with_backrefs] * 2)
+
+        parser = PushParser(SExp.to, allow_backrefs=True)
+        r = parser.feed(with_backrefs[:100])
+        self.assertEqual(r, [])
+        [s] = parser.feed(with_backrefs[100:])
+        self.assertEqual(s.as_bin(), generator)
+
+    def test_max_size(self) -> None:
+        blob = SExp.to([b"foo" * 30, b"bar" * 30]).as_bin()
+        parser: PushParser[SExp] = PushParser(SExp.to, max_size=len(blob))
+        self.assertEqual(parser.feed_buffers(blob + blob[:10]), [blob])
+        self.assertEqual(parser.pending, 10)
+
+        parser = PushParser(SExp.to, max_size=len(blob) - 1)
+        parser.feed_buffers(blob[:50])
+        with self.assertRaises(ValueError):
+            parser.feed_buffers(blob[50:])
+
+        # the size limit applies before the whole object has arrived
+        parser = PushParser(SExp.to, max_size=100)
+        with self.assertRaises(ValueError):
+            parser.feed_buffers(SExp.to(b"x" * 1000).as_bin()[:200])
+
+    def test_close(self) -> None:
+        parser: PushParser[SExp] = PushParser(SExp.to)
+        parser.feed(b"\xff\x01")
+        with self.assertRaises(ValueError):
+            parser.close()
+
+        parser = PushParser(SExp.to)
+        with self.assertRaises(ValueError):
+            parser.feed(b"\xfe" + b"\xff" * 6)
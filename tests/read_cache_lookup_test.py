@@ -1,8 +1,13 @@
+import random
 import unittest
+from typing import List
 
 from clvm import to_sexp_f
-from clvm.read_cache_lookup import ReadCacheLookup
+from clvm.CLVMObject import CLVMObject, CLVMStorage
+from clvm.SExp import SExp
+from clvm.read_cache_lookup import ReadCacheLookup, ReadStackIndex
 from clvm.object_cache import ObjectCache, treehash
+from clvm.serialize import _write_sexp_with_backrefs, sexp_from_buffer, to_clvm_object
 
 
 class ReadCacheLookupTest(unittest.TestCase):
@@ -103,3 +108,84 @@ class ReadCacheLookupTest(unittest.TestCase):
             rcl.find_paths(foo_hash, serialized_length=20),
             set([bytes([8]), bytes([10]), bytes([12]), bytes([14])]),
         )
+
+    def test_read_stack_index(self) -> None:
+        # the same steps as `test_various`, where the shortest path is unique
+        rsi = ReadStackIndex()
+        treehasher = ObjectCache(treehash)
+        nil_hash = treehasher.get(to_sexp_f(b""))
+        foo_hash = treehasher.get(to_sexp_f(b"foo"))
+        bar_hash = treehasher.get(to_sexp_f(b"bar"))
+        foo_list_hash = treehasher.get(to_sexp_f([b"foo"]))
+        self.assertEqual(rsi.root_hash, nil_hash)
+
+        rsi.push(foo_hash)
+        rsi.push(bar_hash)
+        # rsi = (bar foo)
+        self.assertEqual(rsi.root_hash, treehasher.get(to_sexp_f([b"bar", b"foo"])))
+        self.assertEqual(rsi.find_path(bar_hash, serialized_length=20), bytes([2]))
+        self.assertEqual(rsi.find_path(foo_list_hash, serialized_length=20), bytes([3]))
+        self.assertEqual(rsi.find_path(foo_hash, serialized_length=20), bytes([5]))
+        self.assertEqual(rsi.find_path(nil_hash, serialized_length=20), bytes([7]))
+        self.assertEqual(rsi.find_path(rsi.root_hash, serialized_length=20), bytes([1]))
+        self.assertEqual(rsi.find_path(foo_hash, serialized_length=2), None)
+
+        rsi.pop2_and_cons()
+        # rsi = ((foo . bar))
+        self.assertEqual(rsi.find_path(bar_hash, serialized_length=20), bytes([6]))
+        self.assertEqual(rsi.find_path(foo_list_hash, serialized_length=20), None)
+        self.assertEqual(rsi.find_path(foo_hash, serialized_length=20), bytes([4]))
+        self.assertEqual(rsi.find_path(nil_hash, serialized_length=20), bytes([3]))
+
+        rsi.push(foo_hash)
+        rsi.push(foo_hash)
+        rsi.pop2_and_cons()
+        # rsi = ((foo . foo) (foo . bar))
+        self.assertEqual(rsi.find_path(bar_hash, serialized_length=20), bytes([13]))
+        self.assertEqual(rsi.find_path(nil_hash, serialized_length=20), bytes([7]))
+        self.assertIn(rsi.find_path(foo_hash, serialized_length=20), [bytes([4]), bytes([6])])
+
+    def test_read_stack_index_fuzz(self) -> None:
+        # `ReadStackIndex` finds paths as short as `ReadCacheLookup` does, so
+        # the encodings are the same length, and decode to the same object.
+        # Subtrees are repeated, so there are plenty of back references,
+        # including ones to stack suffixes
+        r = random.Random(1)
+        atoms = [b"", b"\x01", b"foo", b"x" * 40, b"y" * 5]
+
+        def make_tree(depth: int, made: List[CLVMStorage]) -> CLVMStorage:
+            if made and r.random() < 0.3:
+                return r.choice(made)
+            if depth == 0 or r.random() < 0.3:
+                obj = CLVMObject(r.choice(atoms))
+            else:
+                obj = CLVMObject((make_tree(depth - 1, made), make_tree(depth - 1, made)))
+            made.append(obj)
+            return obj
+
+        for _ in range(3000):
+            obj = make_tree(r.randint(1, 9), [])
+            expected = bytearray()
+            _write_sexp_with_backrefs(obj, expected, 1 << 30, ReadCacheLookup())
+            actual = bytearray()
+            _write_sexp_with_backrefs(obj, actual, 1 << 30, ReadStackIndex())
+            self.assertEqual(len(actual), len(expected))
+            decoded = sexp_from_buffer(actual, to_clvm_object, allow_backrefs=True)[0]
+            self.assertEqual(SExp(decoded).as_bin(max_size=1 << 30), SExp(obj).as_bin(max_size=1 << 30))
+
+    def test_read_stack_index_suffix_backref(self) -> None:
+        # a back reference to a stack suffix, which is then consed into
+        # another item: the nodes inside it must still be found from below
+        obj = sexp_from_buffer(
+            bytes.fromhex(
+                "ffff01ffffff857979797979fffe01fe0483666f6ffffffe08fe0dffff01fe0dfffe53"
+                "fffe0d01fffffffe32fe25fffffe3580fe2bfffe30fe25"
+            ),
+            to_clvm_object,
+            allow_backrefs=True,
+        )[0]
+        expected = bytearray()
+        _write_sexp_with_backrefs(obj, expected, 1 << 30, ReadCacheLookup())
+        actual = bytearray()
+        _write_sexp_with_backrefs(obj, actual, 1 << 30, ReadStackIndex())
+        self.assertEqual(len(actual), len(expected))
@@ -1,6 +1,17 @@
+import asyncio
+import time
+import tracemalloc
 import unittest
+from typing import Callable, List, Optional, Tuple
 
-from clvm.run_program import msb_mask
+from clvm.EvalError import EvalError, ResourceLimitError
+from clvm.SExp import SExp
+from clvm.operators import OPERATOR_LOOKUP, OperatorDict
+from clvm.run_program import Interpreter, RunStats, msb_mask, run_program, run_program_async
+
+from clvm_tools.binutils import assemble
+
+from .brun_corpus import brun_corpus
 
 
 class BitTest(unittest.TestCase):
@@ -19,3 +30,345 @@ class BitTest(unittest.TestCase):
         self.assertEqual(msb_mask(0x2A), 0x20)
         self.assertEqual(msb_mask(0xFF), 0x80)
         self.assertEqual(msb_mask(0x0F), 0x08)
+
+
+class InterpreterTest(unittest.TestCase):
+    def test_reuse(self) -> None:
+        interpreter = Interpreter(OPERATOR_LOOKUP)
+        for program_text, args_text in [
+            ("(+ 2 5)", "(100 200)"),
+            ("(c 2 (c 5 ()))", "(100 200)"),
+            ("(a (q . (+ 2 5)) 1)", "(7 8)"),
+            ("(q . 1)", "()"),
+        ]:
+            program = assemble(program_text)
+            args = assemble(args_text)
+            expected = run_program(program, args, OPERATOR_LOOKUP)
+            self.assertEqual(interpreter.run(program, args), expected)
+            self.assertEqual(interpreter.run(program, args, max_cost=expected[0]), expected)
+            with self.assertRaises(EvalError):
+                interpreter.run(program, args, max_cost=expected[0] - 1)
+
+    def test_pre_eval_f(self) -> None:
+        log: List[Tuple[str, str]] = []
+
+        def pre_eval_f(sexp: SExp, args: SExp) -> Callable[[SExp], None]:
+            def post_eval(result: SExp) -> None:
+                log.append((str(sexp), str(result)))
+
+            return post_eval
+
+        interpreter = Interpreter(OPERATOR_LOOKUP, pre_eval_f)
+        program = assemble("(+ 2 (q . 5))")
+        args = assemble("(100 200)")
+        cost, r = interpreter.run(program, args)
+        self.assertEqual(r.as_python(), bytes([105]))
+        self.assertEqual(len(log), 3)
+        self.assertEqual(log[-1], (str(program), str(r)))
+        interpreter.run(program, args)
+        self.assertEqual(len(log), 6)
+
+    def test_sexp_subclass(self) -> None:
+        # values are built from the program's class, as `run_program` always
+        # did, so a subclass is kept in the result and the `pre_eval_f` args
+        class P(SExp):
+            pass
+
+        seen = set()
+
+        def pre_eval_f(sexp: SExp, args: SExp) -> Callable[[SExp], None]:
+            seen.add(type(sexp))
+            seen.add(type(args))
+
+            def post_eval(result: SExp) -> None:
+                seen.add(type(result))
+
+            return post_eval
+
+        program = P.to(assemble("(c (+ 2 (q . 5)) (f 1))"))
+        args = assemble("(100 200)")
+        interpreter = Interpreter(OPERATOR_LOOKUP, pre_eval_f)
+        runs: List[Callable[[], Tuple[int, SExp]]] = [
+            lambda: run_program(program, args, OPERATOR_LOOKUP, pre_eval_f=pre_eval_f),
+            lambda: interpreter.run(program, args),
+            lambda: interpreter.run_with_limits(program, args, deadline=time.monotonic() + 60, max_atom_bytes=100),
+            lambda: interpreter.run_with_stats(program, args, RunStats()),
+        ]
+        for run in runs:
+            seen.clear()
+            cost, r = run()
+            self.assertIs(type(r), P)
+            self.assertEqual(r, SExp.to((105, 100)))
+            self.assertEqual(seen, {P})
+
+        r = asyncio.run(run_program_async(program, args, OPERATOR_LOOKUP))[1]
+        self.assertIs(type(r), P)
+
+
+# cases where `chia_rs` intentionally differs from the python implementation:
+# it allows `/` on negative operands, and it accepts `((X . Y) ...)`
+RUST_DIVERGENCES = {
+    "brun/div-2.txt:0",
+    "brun/div-3.txt:0",
+    "brun/div-7.txt:0",
+    "brun/div-8.txt:0",
+    "brun/div-9.txt:0",
+    "brun/double-cons-3.txt:0",
+    "edge-cases/div-07.txt:0",
+    "edge-cases/div-09.txt:0",
+}
+
+
+class RustBackendTest(unittest.TestCase):
+    def test_brun_corpus(self) -> None:
+        for name, program, args, max_cost in brun_corpus():
+            if name in RUST_DIVERGENCES:
+                continue
+            outcomes: List[Optional[Tuple[int, bytes]]] = []
+            for backend in ("python", "rust"):
+                try:
+                    cost, r = run_program(program, args, OPERATOR_LOOKUP, max_cost, backend=backend)
+                    outcomes.append((cost, r.as_bin()))
+                except EvalError:
+                    outcomes.append(None)
+            self.assertEqual(outcomes[0], outcomes[1], name)
+
+    def test_divergences(self) -> None:
+        # the programs `run_program_rust` documents as running differently
+        # on the two backends
+        programs = [
+            "(0x30 (q . 0x%s) (q . 0x%s) (q . 1))" % ("aa" * 32, "bb" * 32),
+            "(0x31)",
+            "(0x3b)",
+            "(0x3c (q . 1))",
+            "(0x3d (q . 1) (q . 2))",
+            "(0x13d61f00 (q . 1) (q . 2) (q . 3))",
+            "(0x1c3a8f00 (q . 1) (q . 2) (q . 3))",
+            "(/ (q . -7) (q . 2))",
+            "(/ (q . 7) (q . -2))",
+            "((c . 1) (q . 1) (q . 2))",
+        ]
+        for text in programs:
+            program = assemble(text)
+            outcomes: List[Optional[Tuple[int, bytes]]] = []
+            for backend in ("python", "rust"):
+                try:
+                    cost, r = run_program(program, SExp.to(0), OPERATOR_LOOKUP, backend=backend)
+                    outcomes.append((cost, r.as_bin()))
+                except EvalError:
+                    outcomes.append(None)
+            self.assertNotEqual(outcomes[0], outcomes[1], text)
+
+        # while close relatives of them agree: `divmod` on negative operands,
+        # `((X) ...)`, and an operator neither backend implements
+        for text in ["(divmod (q . -7) (q . 2))", "((c) (q . 1) (q . 2))", "(0x7f (q . 1))"]:
+            program = assemble(text)
+            self.assertEqual(
+                run_program(program, SExp.to(0), OPERATOR_LOOKUP, backend="rust"),
+                run_program(program, SExp.to(0), OPERATOR_LOOKUP),
+                text,
+            )
+
+    def test_max_cost(self) -> None:
+        program = assemble("(+ 2 5)")
+        args = assemble("(100 200)")
+        cost, r = run_program(program, args, OPERATOR_LOOKUP, backend="rust")
+        self.assertEqual((cost, r), run_program(program, args, OPERATOR_LOOKUP))
+        self.assertEqual(run_program(program, args, OPERATOR_LOOKUP, cost, backend="rust"), (cost, r))
+        with self.assertRaises(EvalError):
+            run_program(program, args, OPERATOR_LOOKUP, cost - 1, backend="rust")
+
+    def test_unsupported(self) -> None:
+        program = assemble("(+ 2 5)")
+        args = assemble("(100 200)")
+        with self.assertRaises(ValueError):
+            run_program(program, args, OperatorDict(OPERATOR_LOOKUP), backend="rust")
+        with self.assertRaises(ValueError):
+            run_program(program, args, OPERATOR_LOOKUP, pre_eval_f=lambda sexp, args: None, backend="rust")
+        with self.assertRaises(ValueError):
+            run_program(program, args, OPERATOR_LOOKUP, backend="java")
+
+
+class RunStatsTest(unittest.TestCase):
+    def test_stats(self) -> None:
+        program = assemble("(a (q . (+ 2 (f 5) (q . 1))) 1)")
+        args = assemble("(100 (200 300))")
+        stats = RunStats()
+        expected = run_program(program, args, OPERATOR_LOOKUP)
+        self.assertEqual(run_program(program, args, OPERATOR_LOOKUP, stats=stats), expected)
+        self.assertEqual(stats.cost, expected[0])
+        self.assertEqual(stats.eval.cost + sum(_.cost for _ in stats.ops.values()), expected[0])
+        self.assertEqual(sorted(stats.ops.keys()), [b"\x02", b"\x05", b"\x10"])
+        for op_stats in stats.ops.values():
+            self.assertEqual(op_stats.count, 1)
+        # `(a ...)`, `1`, `(q ...)`, `(+ ...)`, `2`, `(f 5)`, `5`, `(q . 1)`
+        self.assertEqual(stats.eval.count, 8)
+        self.assertTrue(stats.max_op_stack_depth > 1)
+        self.assertTrue(stats.max_value_stack_depth > 1)
+
+        # stats accumulate across runs, even when they fail
+        with self.assertRaises(EvalError):
+            run_program(program, args, OPERATOR_LOOKUP, expected[0] - 1, stats=stats)
+        self.assertEqual(stats.ops[b"\x02"].count, 2)
+        self.assertTrue(stats.cost > expected[0])
+
+
+class ResumableRunTest(unittest.TestCase):
+    def test_resume(self) -> None:
+        interpreter = Interpreter(OPERATOR_LOOKUP)
+        program = assemble("(a (q . (c (+ 2 5) (sha256 2 5))) 1)")
+        args = assemble("(100 200)")
+        expected = run_program(program, args, OPERATOR_LOOKUP)
+
+        run = interpreter.start(program, args)
+        with self.assertRaises(ValueError):
+            run.result()
+        slices = 0
+        while not run.resume(step_budget=2):
+            slices += 1
+            self.assertTrue(run.cost < expected[0])
+        self.assertEqual(run.result(), expected)
+        self.assertTrue(slices > 1)
+
+        whole_run = interpreter.start(program, args)
+        self.assertTrue(whole_run.resume())
+        self.assertEqual(whole_run.steps, run.steps)
+        self.assertEqual((run.steps + 1) // 2, slices + 1)
+
+        run = interpreter.start(program, args)
+        while not run.resume(cost_budget=100):
+            pass
+        self.assertEqual(run.result(), expected)
+        # resuming a finished run does nothing
+        self.assertTrue(run.resume())
+        self.assertEqual(run.result(), expected)
+
+        run = interpreter.start(program, args, max_cost=expected[0] - 1)
+        with self.assertRaises(EvalError):
+            while not run.resume(cost_budget=100):
+                pass
+
+    def test_run_program_async(self) -> None:
+        program = assemble("(a (q . (c (+ 2 5) (sha256 2 5))) 1)")
+
+        async def run_all() -> List[Tuple[int, SExp]]:
+            return await asyncio.gather(
+                *[run_program_async(program, SExp.to([n, n]), OPERATOR_LOOKUP, cost_budget=50) for n in range(5)]
+            )
+
+        results = asyncio.run(run_all())
+        for n, r in enumerate(results):
+            self.assertEqual(r, run_program(program, SExp.to([n, n]), OPERATOR_LOOKUP))
+
+
+class ResourceLimitTest(unittest.TestCase):
+    def test_max_atom_bytes(self) -> None:
+        # creates a 32 byte atom
+        program = assemble("(concat 2 2 2 2)")
+        args = assemble("(0x0102030405060708)")
+        expected = run_program(program, args, OPERATOR_LOOKUP)
+        self.assertEqual(run_program(program, args, OPERATOR_LOOKUP, max_atom_bytes=32), expected)
+        with self.assertRaises(ResourceLimitError) as cm:
+            run_program(program, args, OPERATOR_LOOKUP, max_atom_bytes=31)
+        self.assertEqual(str(cm.exception), "atom too large")
+        self.assertEqual(cm.exception._sexp, SExp.to(31))
+
+        # cost is still checked first
+        with self.assertRaises(EvalError) as cm2:
+            run_program(program, args, OPERATOR_LOOKUP, expected[0] - 1, max_atom_bytes=32)
+        self.assertNotIsInstance(cm2.exception, ResourceLimitError)
+
+    def test_max_atom_bytes_before_op(self) -> None:
+        # a concat of many long atoms is refused before the result is built
+        program = assemble("(concat %s)" % " ".join(["2"] * 100))
+        args = SExp.to([b"x" * 65536])
+        tracemalloc.start()
+        with self.assertRaises(ResourceLimitError) as cm:
+            run_program(program, args, OPERATOR_LOOKUP, max_atom_bytes=100000)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertEqual(str(cm.exception), "atom too large")
+        self.assertLess(peak, 1024 * 1024)
+
+        # the bounds of the other ops allow the results they make
+        for text in ["(* 2 5)", "(ash 2 (q . 16))", "(lsh 2 (q . 16))", "(concat 2 5)"]:
+            program = assemble(text)
+            args = SExp.to([0x7FFF, 0x7FFF])
+            cost, r = run_program(program, args, OPERATOR_LOOKUP)
+            assert r.atom is not None
+            self.assertEqual(
+                run_program(program, args, OPERATOR_LOOKUP, max_atom_bytes=len(r.atom) + 1), (cost, r)
+            )
+            with self.assertRaises(ResourceLimitError):
+                run_program(program, args, OPERATOR_LOOKUP, max_atom_bytes=len(r.atom) - 1)
+
+        # the bound of `*` goes by the values of its args, not their lengths
+        for text, max_atom_bytes in [
+            ("(* %s)" % " ".join(["(q . 2)"] * 10), 8),
+            ("(* (q . 0x0000000000000001) (q . 0x0000000000000001))", 10),
+            ("(* (q . 0x0000000000000001) (q . 0x0000000000000000))", 1),
+        ]:
+            program = assemble(text)
+            expected = run_program(program, SExp.to(0), OPERATOR_LOOKUP)
+            self.assertEqual(run_program(program, SExp.to(0), OPERATOR_LOOKUP, max_atom_bytes=max_atom_bytes), expected)
+
+    def test_max_atom_bytes_in_pairs(self) -> None:
+        # the atoms inside a result are checked too: -128 / -1 is 128, which
+        # takes two bytes
+        program = assemble("(divmod (q . -128) (q . -1))")
+        self.assertEqual(run_program(program, SExp.to(0), OPERATOR_LOOKUP)[1], SExp.to((128, 0)))
+        run_program(program, SExp.to(0), OPERATOR_LOOKUP, max_atom_bytes=2)
+        with self.assertRaises(ResourceLimitError):
+            run_program(program, SExp.to(0), OPERATOR_LOOKUP, max_atom_bytes=1)
+
+        # however deep they are
+        def op_nest(args: SExp) -> Tuple[int, SExp]:
+            return 1, args.to([1, [2, b"x" * 100]])
+
+        operator_lookup = OperatorDict(OPERATOR_LOOKUP)
+        operator_lookup[b"\xff\x01"] = op_nest
+        program = assemble("(0xff01)")
+        run_program(program, SExp.to(0), operator_lookup, max_atom_bytes=100)
+        with self.assertRaises(ResourceLimitError):
+            run_program(program, SExp.to(0), operator_lookup, max_atom_bytes=99)
+
+    def test_max_atom_bytes_passed_through(self) -> None:
+        # only the atoms an operator creates count, not those of the program
+        # or its args, quoted, looked up or passed through an operator
+        big = b"x" * 100
+        for program, args in [
+            (assemble("(f 1)"), SExp.to([big])),
+            (SExp.to((1, big)), SExp.to(0)),
+            (assemble("(c 2 (r 1))"), SExp.to([big, big])),
+            (assemble("(i (q . 1) 2 5)"), SExp.to([big, big])),
+        ]:
+            expected = run_program(program, args, OPERATOR_LOOKUP)
+            self.assertEqual(run_program(program, args, OPERATOR_LOOKUP, max_atom_bytes=10), expected)
+
+        # but an equal atom the operator makes does
+        def op_copy(args: SExp) -> Tuple[int, SExp]:
+            atom = args.first().atom
+            assert atom is not None
+            return 1, args.to(bytes(bytearray(atom)))
+
+        operator_lookup = OperatorDict(OPERATOR_LOOKUP)
+        operator_lookup[b"\xff\x01"] = op_copy
+        with self.assertRaises(ResourceLimitError):
+            run_program(assemble("(0xff01 2)"), SExp.to([big]), operator_lookup, max_atom_bytes=10)
+
+    def test_deadline(self) -> None:
+        program = assemble("(+ 2 5)")
+        args = assemble("(1 2)")
+        expected = run_program(program, args, OPERATOR_LOOKUP)
+        self.assertEqual(run_program(program, args, OPERATOR_LOOKUP, deadline=time.monotonic() + 60), expected)
+        with self.assertRaises(ResourceLimitError) as cm:
+            run_program(program, args, OPERATOR_LOOKUP, deadline=time.monotonic() - 1)
+        self.assertEqual(str(cm.exception), "deadline exceeded")
+
+    def test_unsupported(self) -> None:
+        program = assemble("(+ 2 5)")
+        args = assemble("(1 2)")
+        with self.assertRaises(ValueError):
+            run_program(program, args, OPERATOR_LOOKUP, max_atom_bytes=10, stats=RunStats())
+        with self.assertRaises(ValueError):
+            run_program(program, args, OPERATOR_LOOKUP, max_atom_bytes=10, backend="rust")
@@ -0,0 +1,71 @@
+import gzip
+import unittest
+from typing import Tuple
+
+from clvm.CLVMObject import CLVMStorage
+from clvm.SExp import SExp
+from clvm.object_cache import ObjectCache, serialized_length, treehash
+from clvm.scan import scan_sexp
+from clvm.serialize import sexp_from_buffer, to_clvm_object
+
+
+def shape(obj: CLVMStorage) -> Tuple[int, int, int, int]:
+    # pairs, atoms, atom bytes and depth, the slow way
+    pairs = atoms = atom_bytes = max_depth = 0
+    todo = [(obj, 0)]
+    while todo:
+        node, depth = todo.pop()
+        max_depth = max(max_depth, depth)
+        if node.pair is None:
+            assert node.atom is not None
+            atoms += 1
+            atom_bytes += len(node.atom)
+        else:
+            pairs += 1
+            todo.append((node.pair[0], depth + 1))
+            todo.append((node.pair[1], depth + 1))
+    return pairs, atoms, atom_bytes, max_depth
+
+
+class ScanTest(unittest.TestCase):
+    def check_scan(self, obj: CLVMStorage) -> None:
+        expected = (
+            ObjectCache(treehash).get(obj),
+            ObjectCache(serialized_length).get(obj),
+        ) + shape(obj)
+        blob = SExp(obj).as_bin()
+        for allow_backrefs, b in ((False, blob), (True, blob), (True, SExp(obj).as_bin(allow_backrefs=True))):
+            r = scan_sexp(b, allow_backrefs=allow_backrefs)
+            self.assertEqual(
+                (r.tree_hash, r.serialized_length, r.pair_count, r.atom_count, r.atom_bytes, r.max_depth),
+                expected,
+            )
+            self.assertEqual(r.end, len(b))
+
+    def test_small(self) -> None:
+        for v in [b"", b"\x00", b"\x7f", b"\x80", b"foo" * 30, [], [1, 2, 3], ((b"AAA", b"BBB"), (b"CCC", b"AAA"))]:
+            self.check_scan(SExp.to(v))
+
+    def test_generator(self) -> None:
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        obj = sexp_from_buffer(blob, to_clvm_object)[0]
+        self.check_scan(obj)
+        self.assertEqual(scan_sexp(bytearray(blob)).tree_hash, ObjectCache(treehash).get(obj))
+
+    def test_bomb(self) -> None:
+        # the metrics are for the tree with back references expanded
+        bomb = SExp.to(b"foo")
+        for _ in range(40):
+            bomb = SExp.to((bomb, bomb))
+        r = scan_sexp(bomb.as_bin(allow_backrefs=True), allow_backrefs=True)
+        self.assertEqual(r.atom_count, 2**40)
+        self.assertEqual(r.atom_bytes, 3 * 2**40)
+        self.assertEqual(r.max_depth, 40)
+        self.assertEqual(r.tree_hash, ObjectCache(treehash).get(bomb))
+
+    def test_errors(self) -> None:
+        for blob in [b"", b"\xff\x01", b"\xbf   ", b"\xfe" + b"\xff" * 6]:
+            with self.assertRaises(ValueError):
+                scan_sexp(blob)
+        with self.assertRaises(ValueError):
+            scan_sexp(b"\xff\x01\xfe\x04", allow_backrefs=True)
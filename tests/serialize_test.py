@@ -1,5 +1,8 @@
 import gzip
 import io
+import os
+import random
+import tempfile
 import unittest
 from typing import Optional
 
@@ -7,15 +10,33 @@ import pytest
 
 from clvm import to_sexp_f
 from clvm.SExp import CastableType, SExp
+from clvm.object_cache import ObjectCache, treehash
+from clvm.operators import OPERATOR_LOOKUP
+from clvm.run_program import run_program
 from clvm.serialize import (
     MAX_SAFE_BYTES,
+    MIN_ZERO_COPY_ATOM,
+    BufferAtom,
     _atom_from_stream,
+    _backref_caches,
+    _traverse_values,
+    sexp_from_buffer,
+    sexp_from_bytes,
+    sexp_from_file,
     sexp_from_stream,
     sexp_buffer_from_stream,
     atom_to_byte_iterator,
+    sexp_to_byte_iterator,
+    sexp_to_byte_iterator_with_backrefs,
+    sexp_to_bytearray,
     sexp_to_stream,
+    to_clvm_object,
+    to_hashed_clvm_object,
+    traverse_path,
 )
 
+from clvm_tools.binutils import assemble
+
 
 TEXT = b"the quick brown fox jumps over the lazy dogs"
 
@@ -66,6 +87,8 @@ class SerializeTest(unittest.TestCase):
             b = v.as_bin()
             v1 = sexp_from_stream(io.BytesIO(b), to_sexp_f)
         self.assertEqual(v, v1)
+        self.assertEqual(sexp_from_bytes(b, to_sexp_f), v)
+        self.assertEqual(b, b"".join(sexp_to_byte_iterator(v)))
         sexp_to_stream(v1, f)
         length = len(f.getvalue())
         assert f.getbuffer() == b
@@ -78,6 +101,7 @@ class SerializeTest(unittest.TestCase):
         # now turn on backrefs and make sure everything still works
 
         b2 = v.as_bin(allow_backrefs=True)
+        self.assertEqual(b2, b"".join(sexp_to_byte_iterator(v, allow_backrefs=True)))
         self.assertTrue(len(b2) <= len(b))
         if has_backrefs(b2) or len(b2) < len(b):
             # if we have any backrefs, ensure they actually save space
@@ -91,6 +115,7 @@ class SerializeTest(unittest.TestCase):
             io_b2 = io.BytesIO(b2)
             v2 = sexp_from_stream(io_b2, to_sexp_f, allow_backrefs=True)
             self.assertEqual(v2, s)
+            self.assertEqual(sexp_from_bytes(b2, to_sexp_f, allow_backrefs=True), s)
             b3 = v2.as_bin()
             self.assertEqual(b, b3)
         with pytest.raises(ValueError, match="SExp exceeds maximum size"):
@@ -173,6 +198,9 @@ class SerializeTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             sexp_from_stream(io.BytesIO(bytes_in), to_sexp_f)
 
+        with self.assertRaises(ValueError):
+            sexp_from_bytes(bytes_in, to_sexp_f)
+
         with self.assertRaises(ValueError):
             sexp_buffer_from_stream(io.BytesIO(bytes_in))
 
@@ -183,6 +211,9 @@ class SerializeTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             sexp_from_stream(io.BytesIO(bytes_in), to_sexp_f)
 
+        with self.assertRaises(ValueError):
+            sexp_from_bytes(bytes_in, to_sexp_f)
+
         with self.assertRaises(ValueError):
             sexp_buffer_from_stream(io.BytesIO(bytes_in))
 
@@ -194,6 +225,9 @@ class SerializeTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             sexp_from_stream(io.BytesIO(bytes_in), to_sexp_f)
 
+        with self.assertRaises(ValueError):
+            sexp_from_bytes(bytes_in, to_sexp_f)
+
         with self.assertRaises(ValueError):
             sexp_buffer_from_stream(io.BytesIO(bytes_in))
 
@@ -208,6 +242,9 @@ class SerializeTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             sexp_from_stream(InfiniteStream(bytes_in), to_sexp_f)
 
+        with self.assertRaises(ValueError):
+            sexp_from_bytes(bytes_in + b" " * 100, to_sexp_f)
+
         with self.assertRaises(ValueError):
             sexp_buffer_from_stream(InfiniteStream(bytes_in))
 
@@ -217,6 +254,160 @@ class SerializeTest(unittest.TestCase):
         b = self.check_serde(s)
         assert len(b) == 19124
 
+    def test_sexp_from_buffer(self) -> None:
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        for buf in (blob, bytearray(blob), memoryview(blob)):
+            for zero_copy in (False, True):
+                s, end = sexp_from_buffer(buf, to_clvm_object, zero_copy=zero_copy)
+                self.assertEqual(end, len(blob))
+                self.assertEqual(SExp(s).as_bin(), blob)
+
+        # only long atoms are kept as views
+        short_atom = TEXT
+        long_atom = TEXT * 10
+        blob = to_sexp_f([short_atom, long_atom]).as_bin()
+        for zero_copy in (False, True):
+            s, end = sexp_from_buffer(blob, to_clvm_object, zero_copy=zero_copy)
+            assert s.pair is not None and s.pair[1].pair is not None
+            self.assertNotIsInstance(s.pair[0], BufferAtom)
+            self.assertEqual(isinstance(s.pair[1].pair[0], BufferAtom), zero_copy)
+            items = [_.atom for _ in SExp(s).as_iter()]
+            self.assertEqual(items, [short_atom, long_atom])
+            self.assertIsInstance(items[0], bytes)
+            self.assertIsInstance(items[1], bytes)
+        self.assertTrue(len(short_atom) < MIN_ZERO_COPY_ATOM <= len(long_atom))
+
+        # several objects in one buffer
+        buf = to_sexp_f(1).as_bin() + to_sexp_f([2, 3]).as_bin() + to_sexp_f(b"").as_bin()
+        offset = 0
+        objects = []
+        while offset < len(buf):
+            obj, offset = sexp_from_buffer(buf, to_sexp_f, offset)
+            objects.append(obj)
+        self.assertEqual(objects, [to_sexp_f(1), to_sexp_f([2, 3]), to_sexp_f(b"")])
+
+    def test_sexp_from_file(self) -> None:
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        s = SExp(sexp_from_buffer(blob, to_clvm_object)[0])
+        long_atom = to_sexp_f(TEXT * 10)
+        backrefs_blob = s.as_bin(allow_backrefs=True)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "generator.bin")
+            with open(path, "wb") as f:
+                f.write(blob)
+                f.write(backrefs_blob)
+                f.write(long_atom.as_bin())
+
+            for zero_copy in (False, True):
+                r = sexp_from_file(path, to_clvm_object, zero_copy=zero_copy)
+                self.assertEqual(SExp(r).as_bin(), blob)
+                r = sexp_from_file(path, to_clvm_object, len(blob), allow_backrefs=True, zero_copy=zero_copy)
+                self.assertEqual(SExp(r).as_bin(), blob)
+                r = sexp_from_file(path, to_clvm_object, len(blob) + len(backrefs_blob), zero_copy=zero_copy)
+                self.assertEqual(isinstance(r, BufferAtom), zero_copy)
+                self.assertEqual(r.atom, long_atom.atom)
+                self.assertIsInstance(r.atom, bytes)
+                r = sexp_from_file(path, SExp.to, len(blob) + len(backrefs_blob), zero_copy=zero_copy)
+                self.assertEqual(r, long_atom)
+
+            with self.assertRaises(ValueError):
+                sexp_from_file(path, to_clvm_object, len(blob))
+
+    def test_zero_copy_operators(self) -> None:
+        # atoms parsed with `zero_copy` work anywhere other atoms do
+        long_atom = TEXT * 10
+        other_atom = TEXT.upper() * 10
+        program = assemble("(c (>s 2 5) (c (substr 2 (q . 4) (q . 9)) (c (strlen 5) (c (sha256 2 5) (concat 2 5)))))")
+        args = SExp.to([long_atom, other_atom])
+        expected = run_program(program, args, OPERATOR_LOOKUP)
+        self.assertEqual(expected[1].as_python()[0], b"\x01")
+
+        raw = sexp_from_buffer(args.as_bin(), to_clvm_object, zero_copy=True)[0]
+        assert raw.pair is not None
+        self.assertIsInstance(raw.pair[0], BufferAtom)
+        for buf in (args.as_bin(), bytearray(args.as_bin())):
+            for to_sexp in (to_clvm_object, SExp.to):
+                parsed = SExp.to(sexp_from_buffer(buf, to_sexp, zero_copy=True)[0])
+                self.assertEqual(run_program(program, parsed, OPERATOR_LOOKUP), expected)
+                self.assertEqual(parsed.as_python(), [long_atom, other_atom])
+                self.assertIsInstance(parsed.as_python()[0], bytes)
+
+        # and as quoted atoms in the program itself
+        quoted = assemble("(>s (q . %s) (q . %s))" % ("0x" + long_atom.hex(), "0x" + other_atom.hex()))
+        parsed = SExp.to(sexp_from_buffer(quoted.as_bin(), to_clvm_object, zero_copy=True)[0])
+        expected = run_program(quoted, SExp.to(0), OPERATOR_LOOKUP)
+        self.assertEqual(run_program(parsed, SExp.to(0), OPERATOR_LOOKUP), expected)
+
+    def test_traverse_values(self) -> None:
+        values = [to_sexp_f([1, 2]), to_sexp_f(3), to_sexp_f((4, 5))]
+        stack = to_sexp_f(b"")
+        for v in values:
+            stack = to_sexp_f((v, stack))
+        for path in range(64):
+            path_blob = bytes([path])
+            try:
+                expected = traverse_path(stack, path_blob, to_sexp_f)
+            except ValueError:
+                with self.assertRaises(ValueError):
+                    _traverse_values(values, path_blob, to_sexp_f)
+                continue
+            self.assertEqual(to_sexp_f(_traverse_values(values, path_blob, to_sexp_f)), expected)
+
+        # long paths are read a bit at a time
+        values = [to_sexp_f([i, (i, i)]) for i in range(40)]
+        stack = to_sexp_f(b"")
+        for v in values:
+            stack = to_sexp_f((v, stack))
+        r = random.Random(0)
+        for _ in range(200):
+            path_blob = bytes([0] * r.randint(0, 2)) + r.randint(1, 1 << 48).to_bytes(6, "big")
+            try:
+                expected = traverse_path(stack, path_blob, to_sexp_f)
+            except ValueError:
+                with self.assertRaises(ValueError):
+                    _traverse_values(values, path_blob, to_sexp_f)
+                continue
+            self.assertEqual(to_sexp_f(_traverse_values(values, path_blob, to_sexp_f)), expected)
+        # the 40 rests lead to the end of the stack
+        self.assertEqual(_traverse_values(values, ((1 << 41) - 1).to_bytes(6, "big"), to_sexp_f), to_sexp_f(b""))
+
+    def test_deserialize_long_backrefs(self) -> None:
+        # a long list, with back references to its first items at the end,
+        # which are big enough to be worth a path of hundreds of bytes
+        big = [bytes([i]) * 1000 for i in range(20)]
+        s = to_sexp_f(big + [b"%d" % i for i in range(3000)] + big)
+        blob = s.as_bin(allow_backrefs=True)
+        self.assertTrue(has_backrefs(blob))
+        self.assertEqual(sexp_from_stream(io.BytesIO(blob), to_sexp_f, allow_backrefs=True), s)
+        self.assertEqual(sexp_from_bytes(blob, to_sexp_f, allow_backrefs=True), s)
+
+    def test_sexp_to_bytearray(self) -> None:
+        s = to_sexp_f([b"foo" * 30, [1, 2], b"foo" * 30])
+        for allow_backrefs in (False, True):
+            blob = b"".join(sexp_to_byte_iterator(s, allow_backrefs=allow_backrefs))
+            buf = bytearray(b"prefix")
+            self.assertIs(sexp_to_bytearray(s, buf, allow_backrefs=allow_backrefs), buf)
+            self.assertEqual(buf, b"prefix" + blob)
+
+            # the limit is on the bytes written by the call, and a failed
+            # call leaves the buffer alone
+            sexp_to_bytearray(s, buf, allow_backrefs=allow_backrefs, max_size=len(blob))
+            self.assertEqual(buf, b"prefix" + blob + blob)
+            with self.assertRaises(ValueError):
+                sexp_to_bytearray(s, buf, allow_backrefs=allow_backrefs, max_size=len(blob) - 1)
+            self.assertEqual(buf, b"prefix" + blob + blob)
+
+    def test_backrefs_hashed_tree(self) -> None:
+        # a hashed tree is serialized from its saved hashes, to the same bytes
+        blob = gzip.GzipFile("tests/generator.bin.gz").read()
+        expected = SExp(sexp_from_buffer(blob, to_clvm_object)[0]).as_bin(allow_backrefs=True)
+        hashed = sexp_from_buffer(blob, to_hashed_clvm_object)[0]
+        self.assertIsNotNone(_backref_caches(hashed)[0])
+        ObjectCache(treehash).get(hashed)
+        self.assertIsNone(_backref_caches(hashed)[0])
+        self.assertEqual(sexp_to_bytearray(hashed, allow_backrefs=True), expected)
+        self.assertEqual(b"".join(sexp_to_byte_iterator_with_backrefs(hashed)), expected)
+
     def test_deserialize_bomb(self) -> None:
         def make_bomb(depth: int) -> SExp:
             bomb = to_sexp_f(TEXT)
@@ -0,0 +1,116 @@
+import unittest
+from typing import Optional, Tuple
+
+from clvm.EvalError import EvalError
+from clvm.SExp import SExp
+from clvm.operators import OPERATOR_LOOKUP, KEYWORD_TO_ATOM, OperatorDict
+from clvm.run_program import run_program
+from clvm.storage_interpreter import StorageInterpreter, traverse_path
+
+from clvm_tools.binutils import assemble
+
+from .brun_corpus import brun_corpus, outcome
+
+
+class StorageInterpreterTest(unittest.TestCase):
+    def test_traverse_path(self) -> None:
+        env = SExp.to([10, 20, 30])
+        self.assertEqual(traverse_path(b"", env), (44, SExp.null()))
+        self.assertEqual(traverse_path(b"\x00\x00", env), (52, SExp.null()))
+        self.assertEqual(traverse_path(b"\x01", env)[0], 44)
+        self.assertEqual(SExp.to(traverse_path(b"\x05", env)[1]).as_int(), 20)
+        self.assertEqual(traverse_path(b"\x00\x05", env)[0], 56)
+        with self.assertRaises(EvalError):
+            traverse_path(b"\x04", env)
+
+    def test_brun_corpus(self) -> None:
+        interpreter = StorageInterpreter(OPERATOR_LOOKUP)
+
+        def run_storage(program: SExp, args: SExp, max_cost: Optional[int]) -> Tuple[int, SExp]:
+            return interpreter.run(program, args, max_cost=max_cost)
+
+        def run_reference(program: SExp, args: SExp, max_cost: Optional[int]) -> Tuple[int, SExp]:
+            return run_program(program, args, OPERATOR_LOOKUP, max_cost=max_cost)
+
+        for name, program, args, max_cost in brun_corpus():
+            expected = outcome(run_reference, program, args, max_cost)
+            self.assertEqual(outcome(run_storage, program, args, max_cost), expected, name)
+            if isinstance(expected, tuple):
+                cost = expected[0]
+                self.assertEqual(
+                    outcome(run_storage, program, args, cost - 1),
+                    outcome(run_reference, program, args, cost - 1),
+                    name,
+                )
+
+    def test_sexp_subclass(self) -> None:
+        # the result, the args to operators and the value of a cost error
+        # are of the program's class, as with `run_program`
+        class P(SExp):
+            pass
+
+        seen = set()
+
+        def op_seen(args: SExp) -> Tuple[int, SExp]:
+            seen.add(type(args))
+            return 1, args.to(0)
+
+        operator_lookup = OperatorDict(OPERATOR_LOOKUP)
+        operator_lookup[b"\xff\x01"] = op_seen
+        interpreter = StorageInterpreter(operator_lookup)
+        program = P.to(assemble("(c (0xff01 2) (f 1))"))
+        args = assemble("(100 200)")
+        cost, r = interpreter.run(program, args)
+        self.assertEqual((cost, r), run_program(program, args, operator_lookup))
+        self.assertIs(type(r), P)
+        self.assertEqual(seen, {P})
+
+        with self.assertRaises(EvalError) as cm:
+            interpreter.run(program, args, max_cost=cost - 1)
+        self.assertIs(type(cm.exception._sexp), P)
+
+    def test_overridden_core_op(self) -> None:
+        def op_first(args: SExp) -> Tuple[int, SExp]:
+            return 1, args.to(b"overridden")
+
+        operator_lookup = OperatorDict(OPERATOR_LOOKUP)
+        interpreter = StorageInterpreter(operator_lookup)
+        inline_ops = interpreter.inline_ops()
+        self.assertIn(KEYWORD_TO_ATOM["f"], inline_ops)
+        # it's only recomputed when the dict changes
+        self.assertIs(interpreter.inline_ops(), inline_ops)
+
+        operator_lookup[KEYWORD_TO_ATOM["f"]] = op_first
+        self.assertNotIn(KEYWORD_TO_ATOM["f"], interpreter.inline_ops())
+        self.assertIs(interpreter.inline_ops(), interpreter.inline_ops())
+        program = assemble("(f 1)")
+        args = assemble("(100 200)")
+        self.assertEqual(
+            interpreter.run(program, args),
+            run_program(program, args, operator_lookup),
+        )
+
+        # every way of changing the dict is noticed
+        del operator_lookup[KEYWORD_TO_ATOM["f"]]
+        operator_lookup.update({KEYWORD_TO_ATOM["f"]: OPERATOR_LOOKUP[KEYWORD_TO_ATOM["f"]]})
+        self.assertIn(KEYWORD_TO_ATOM["f"], interpreter.inline_ops())
+        operator_lookup.pop(KEYWORD_TO_ATOM["f"])
+        self.assertNotIn(KEYWORD_TO_ATOM["f"], interpreter.inline_ops())
+        self.assertEqual(
+            interpreter.run(program, args),
+            run_program(program, args, operator_lookup),
+        )
+
+        # and so is a different dict, even at the same version
+        interpreter.operator_lookup = OperatorDict(OPERATOR_LOOKUP)
+        self.assertIn(KEYWORD_TO_ATOM["f"], interpreter.inline_ops())
+
+    def test_inline_ops_of_plain_dict(self) -> None:
+        # a lookup that isn't an `OperatorDict` has no version, so it's read
+        # every time
+        operator_lookup = dict(OPERATOR_LOOKUP)
+        interpreter = StorageInterpreter(OPERATOR_LOOKUP)
+        interpreter.operator_lookup = operator_lookup  # type: ignore[assignment]
+        self.assertIn(KEYWORD_TO_ATOM["f"], interpreter.inline_ops())
+        del operator_lookup[KEYWORD_TO_ATOM["f"]]
+        self.assertNotIn(KEYWORD_TO_ATOM["f"], interpreter.inline_ops())